@@ -0,0 +1 @@
+"""Offline benchmark harness with a mock LLM server and mock search."""
@@ -0,0 +1,206 @@
+"""OpenAI-compatible stand-in server for offline benchmarks.
+
+Serves ``POST /v1/chat/completions`` (streaming and non-streaming, including
+``json_schema`` response formats) with configurable latency, token rate and
+injected errors, so the pipeline can be measured without network access.
+
+Usage:
+    python -m benchmarks.mock_llm_server --port 8901 --latency 0.3 --tokens-per-second 150
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Header labels the agents look for when structured output is disabled
+SECTION_LABELS = (
+    "Market Analysis", "Financial Metrics", "Risk Assessment", "Recommendations",
+    "Ranked Companies", "Investment Rationale", "Risk Evaluation", "Growth Potential",
+    "Allocation Strategy", "Investment Thesis", "Risk Management", "Final Recommendations"
+)
+
+WORDS = (
+    "revenue", "margin", "growth", "guidance", "valuation", "momentum", "cash", "flow",
+    "earnings", "sector", "demand", "risk", "exposure", "upside", "dividend", "outlook"
+)
+
+
+class MockConfig:
+    """Behaviour of the mock server."""
+    
+    def __init__(
+        self,
+        latency: float = 0.2,
+        tokens_per_second: float = 200.0,
+        completion_tokens: int = 300,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0
+    ):
+        """Initialize the simulated latency, generation speed and error mix."""
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+
+
+def _words(count: int, rng: random.Random) -> List[str]:
+    """Return ``count`` pseudo-random words, one per simulated token."""
+    return [rng.choice(WORDS) for _ in range(count)]
+
+
+def _completion_text(body: Dict[str, Any], tokens: int, rng: random.Random) -> str:
+    """Build a reply shaped like the agents expect: JSON for a schema, sections otherwise."""
+    response_format = body.get("response_format") or {}
+    schema = (response_format.get("json_schema") or {}).get("schema") or {}
+    fields = list((schema.get("properties") or {}).keys())
+    labels = fields or list(SECTION_LABELS)
+    per_field = max(tokens // len(labels), 1)
+    if fields:
+        return json.dumps({field: " ".join(_words(per_field, rng)) for field in fields})
+    return "\n".join(f"{label}: {' '.join(_words(per_field, rng))}" for label in labels)
+
+
+def _prompt_tokens(body: Dict[str, Any]) -> int:
+    """Approximate the prompt size the way the client-side estimate does."""
+    return sum(len(str(message.get("content", ""))) for message in body.get("messages", [])) // 4
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    """Build the mock API application."""
+    app = FastAPI(title="Mock OpenAI API")
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+    
+    @app.get("/stats")
+    async def get_stats() -> Dict[str, int]:
+        return stats
+    
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        rng = config.random
+        
+        draw = rng.random()
+        if draw < config.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": "1"},
+                content={"error": {"message": "Rate limit reached (mock)", "type": "requests"}}
+            )
+        if draw < config.rate_limit_rate + config.error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(config.latency)
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "Injected server error (mock)", "type": "server_error"}}
+            )
+        
+        tokens = min(config.completion_tokens, body.get("max_tokens") or config.completion_tokens)
+        text = _completion_text(body, tokens, rng)
+        prompt_tokens = _prompt_tokens(body)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": tokens,
+            "total_tokens": prompt_tokens + tokens
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get("model", "mock")
+        
+        if not body.get("stream"):
+            await asyncio.sleep(config.latency + tokens / config.tokens_per_second)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+        
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        
+        async def events() -> AsyncIterator[str]:
+            await asyncio.sleep(config.latency)
+            # Deltas of about five tokens, paced at the configured token rate
+            step = max(len(text) * 5 // max(tokens, 1), 1)
+            for start in range(0, len(text), step):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"content": text[start:start + step]},
+                        "finish_reason": None
+                    }]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(5 / config.tokens_per_second)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            if include_usage:
+                usage_chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage
+                }
+                yield f"data: {json.dumps(usage_chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+        
+        return StreamingResponse(events(), media_type="text/event-stream")
+    
+    return app
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the server options."""
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=300, help="Tokens per reply (capped by max_tokens)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    config = MockConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,329 @@
+"""Offline benchmarks of the analysis pipeline.
+
+Starts the mock OpenAI-compatible server in a subprocess, switches web search
+to the offline mock backend and runs the selected scenarios in a scratch
+directory. Each scenario reports throughput, p50/p95/p99 latency and peak
+memory, and is compared against a stored baseline.
+
+Usage:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --scenario burst --burst-requests 100
+    python -m benchmarks.run_benchmarks --save-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+# The API server's shutdown releases shared executors, so "burst" always runs last
+SCENARIOS = ("single", "large", "burst")
+
+# Portfolios cycled through by the burst scenario
+PORTFOLIOS = (
+    "AAPL, MSFT, GOOGL",
+    "NVDA, AMD, INTC",
+    "TSLA, F, GM",
+    "JPM, BAC, GS",
+    "AMZN, WMT, TGT",
+    "PFE, JNJ, MRNA"
+)
+
+# Symbols drawn from for the large-portfolio scenario
+LARGE_UNIVERSE = (
+    "AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "AMD", "INTC", "ORCL",
+    "CRM", "ADBE", "NFLX", "JPM", "BAC", "GS", "MS", "WFC", "C", "V",
+    "MA", "PFE", "JNJ", "MRNA", "UNH", "XOM", "CVX", "BP", "WMT", "TGT",
+    "COST", "HD", "NKE", "DIS", "KO", "PEP", "MCD", "BA", "CAT", "GE"
+)
+
+
+def configure_environment(args: argparse.Namespace, workdir: str) -> None:
+    """Point the application at the mock services before any of it is imported."""
+    os.environ["OPENAI_API_KEY"] = "mock-key"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/v1"
+    os.environ["SEARCH_BACKEND"] = "mock"
+    # Measure the pipeline itself: no reuse between runs and no client-side throttling
+    for name, value in {
+        "LLM_CACHE_ENABLED": "false",
+        "SEARCH_CACHE_ENABLED": "false",
+        "TICKER_STORE_ENABLED": "false",
+        "LLM_REQUESTS_PER_MINUTE": "1000000",
+        "LLM_TOKENS_PER_MINUTE": "1000000000",
+        "SEARCH_MOCK_LATENCY": str(args.search_latency)
+    }.items():
+        os.environ.setdefault(name, value)
+    # Stores, caches and reports use relative paths, so they land in the scratch directory
+    os.chdir(workdir)
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def start_mock_server(args: argparse.Namespace) -> subprocess.Popen:
+    """Launch the mock LLM server and wait until it accepts connections."""
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.mock_llm_server",
+            "--port", str(args.mock_port),
+            "--latency", str(args.latency),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--completion-tokens", str(args.completion_tokens),
+            "--error-rate", str(args.error_rate),
+            "--rate-limit-rate", str(args.rate_limit_rate)
+        ],
+        cwd=str(PROJECT_ROOT)
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", args.mock_port), timeout=0.5):
+                return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Mock LLM server did not start")
+
+
+def percentile(values: List[float], quantile: float) -> Optional[float]:
+    """Return the nearest-rank percentile of ``values``."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(max(int(round(quantile * len(ordered) + 0.5)) - 1, 0), len(ordered) - 1)
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(
+    scenario: str,
+    latencies: List[float],
+    elapsed: float,
+    failed: int,
+    rejected: int = 0
+) -> Dict[str, Any]:
+    """Build the result row of one scenario."""
+    completed = len(latencies)
+    
+    def rounded(value: Optional[float]) -> Optional[float]:
+        return round(value, 4) if value is not None else None
+    
+    return {
+        "scenario": scenario,
+        "completed": completed,
+        "failed": failed,
+        "rejected": rejected,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(completed / elapsed, 3) if elapsed else 0.0,
+        "p50_s": rounded(percentile(latencies, 0.50)),
+        "p95_s": rounded(percentile(latencies, 0.95)),
+        "p99_s": rounded(percentile(latencies, 0.99)),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+async def run_single(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run analyses one after another through the workflow."""
+    from src.utils.workflow import InvestmentWorkflow
+    
+    workflow = InvestmentWorkflow()
+    latencies, failed = [], 0
+    started = time.perf_counter()
+    for index in range(args.single_runs):
+        run_started = time.perf_counter()
+        result = await workflow.execute_analysis(PORTFOLIOS[0], message=f"Benchmark run {index}")
+        if result["status"] == "completed":
+            latencies.append(time.perf_counter() - run_started)
+        else:
+            failed += 1
+    return summarize("single", latencies, time.perf_counter() - started, failed)
+
+
+async def run_burst(args: argparse.Namespace) -> Dict[str, Any]:
+    """POST a burst of analyses to a live API server and wait for each to finish."""
+    import httpx
+    import uvicorn
+    
+    from src.api.main import app
+    
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.api_port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.05)
+    
+    async def analyze(client: httpx.AsyncClient, index: int) -> Optional[Any]:
+        request_started = time.perf_counter()
+        response = await client.post("/api/v1/analyze", json={
+            "companies": PORTFOLIOS[index % len(PORTFOLIOS)],
+            "message": f"Burst request {index}"
+        })
+        if response.status_code != 200:
+            return None
+        analysis_id = response.json()["analysis_id"]
+        while True:
+            record = (await client.get(f"/api/v1/analysis/{analysis_id}")).json()
+            if record["status"] in ("completed", "failed"):
+                return record["status"], time.perf_counter() - request_started
+            await asyncio.sleep(args.poll_interval)
+    
+    try:
+        limits = httpx.Limits(max_connections=args.burst_requests + 10)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.api_port}", limits=limits, timeout=600
+        ) as client:
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(*(analyze(client, index) for index in range(args.burst_requests)))
+            elapsed = time.perf_counter() - started
+    finally:
+        server.should_exit = True
+        await serving
+    
+    latencies = [outcome[1] for outcome in outcomes if outcome and outcome[0] == "completed"]
+    failed = sum(1 for outcome in outcomes if outcome and outcome[0] != "completed")
+    rejected = sum(1 for outcome in outcomes if outcome is None)
+    return summarize("burst", latencies, elapsed, failed, rejected)
+
+
+async def run_large(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run per-ticker analyses of one large portfolio."""
+    from src.utils.workflow import InvestmentWorkflow
+    
+    workflow = InvestmentWorkflow()
+    companies = ", ".join(LARGE_UNIVERSE[:args.large_tickers])
+    latencies, failed = [], 0
+    started = time.perf_counter()
+    for index in range(args.large_runs):
+        run_started = time.perf_counter()
+        result = await workflow.execute_analysis(
+            companies, message=f"Large portfolio run {index}", per_ticker=True
+        )
+        if result["status"] == "completed":
+            latencies.append(time.perf_counter() - run_started)
+        else:
+            failed += 1
+    return summarize("large", latencies, time.perf_counter() - started, failed)
+
+
+RUNNERS = {"single": run_single, "burst": run_burst, "large": run_large}
+
+
+async def run_scenarios(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Run the selected scenarios in order and release shared clients afterwards."""
+    from src.utils.llm_client import llm_client
+    
+    results = []
+    try:
+        for scenario in sorted(set(args.scenario or SCENARIOS), key=SCENARIOS.index):
+            print(f"Running scenario: {scenario}")
+            results.append(await RUNNERS[scenario](args))
+    finally:
+        await llm_client.shutdown()
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print each scenario next to its baseline; return the regressions found."""
+    regressions = []
+    for result in results:
+        base = baseline.get(result["scenario"])
+        if not base:
+            continue
+        for metric, worse_when_higher in (("p95_s", True), ("throughput_per_s", False), ("peak_rss_mb", True)):
+            current, previous = result.get(metric), base.get(metric)
+            if not current or not previous:
+                continue
+            change = (current - previous) / previous
+            print(f"  {result['scenario']:<8} {metric:<18} {previous:>10} -> {current:<10} ({change:+.1%})")
+            if (change > tolerance) if worse_when_higher else (change < -tolerance):
+                regressions.append(f"{result['scenario']} {metric} {change:+.1%}")
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    """Print the results as an aligned table."""
+    columns = ("scenario", "completed", "failed", "rejected", "throughput_per_s", "p50_s", "p95_s", "p99_s", "peak_rss_mb")
+    print("  ".join(f"{column:>16}" for column in columns))
+    for result in results:
+        print("  ".join(f"{str(result.get(column)):>16}" for column in columns))
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the benchmark options."""
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the investment analysis pipeline")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenario to run (repeatable; default all)")
+    parser.add_argument("--single-runs", type=int, default=5)
+    parser.add_argument("--burst-requests", type=int, default=20)
+    parser.add_argument("--large-tickers", type=int, default=30)
+    parser.add_argument("--large-runs", type=int, default=2)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--mock-port", type=int, default=8901)
+    parser.add_argument("--api-port", type=int, default=8902)
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock LLM seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Mock LLM generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=300, help="Mock LLM tokens per reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock LLM replies that are 500s")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of mock LLM replies that are 429s")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Mock search seconds per query")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression before failing")
+    parser.add_argument("--output", type=Path, help="Also write the results as JSON to this file")
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Run the benchmarks and return the process exit code."""
+    args = parse_args()
+    mock_server = start_mock_server(args)
+    try:
+        with tempfile.TemporaryDirectory(prefix="investor-bench-") as workdir:
+            configure_environment(args, workdir)
+            results = asyncio.run(run_scenarios(args))
+            os.chdir(str(PROJECT_ROOT))
+    finally:
+        mock_server.terminate()
+        mock_server.wait(timeout=10)
+    
+    print()
+    print_table(results)
+    
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    
+    regressions = []
+    if args.baseline.exists() and not args.save_baseline:
+        print(f"\nCompared with {args.baseline}:")
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+    
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update({result["scenario"]: result for result in results})
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"\nBaseline saved to {args.baseline}")
+    
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,40 @@
-"""Run the FastAPI backend server."""
+"""Run the FastAPI backend server.
+
+Usage:
+    python run_api.py               # one worker process (API_WORKERS)
+    python run_api.py --workers 4   # one worker per core, sharing state through SQLite
+"""
+
+import argparse
+import os
+import sys
 
 import uvicorn
-from src.config.settings import settings
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the server options."""
+    parser = argparse.ArgumentParser(description="Run the investment analysis API")
+    parser.add_argument("--workers", type=int, default=None, help="Server processes (defaults to API_WORKERS)")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.workers is not None:
+        # Worker processes import the settings afresh, so the count travels in the environment
+        os.environ["API_WORKERS"] = str(max(args.workers, 1))
+    
+    from src.config.settings import settings
+    
+    try:
+        settings.validate_workers()
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    
     print(f"Starting {settings.APP_NAME} API Server")
     print(f"Host: {settings.API_HOST}:{settings.API_PORT}")
+    print(f"Workers: {settings.API_WORKERS}")
     print(f"Debug: {settings.DEBUG}")
     print("API Documentation: http://localhost:8000/docs")
     print("Health Check: http://localhost:8000/api/v1/health")
@@ -14,5 +43,7 @@ if __name__ == "__main__":
         "src.api.main:app",
         host=settings.API_HOST,
         port=settings.API_PORT,
-        reload=settings.DEBUG
+        # Auto-reload only supports a single process
+        reload=settings.DEBUG and settings.API_WORKERS == 1,
+        workers=settings.API_WORKERS
     )
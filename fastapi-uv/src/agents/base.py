@@ -0,0 +1,322 @@
+"""Shared agent implementation used by all investment agents."""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Type
+
+import openai
+
+from .sections import SectionMap, SectionParser
+from .structured import (
+    ModelT,
+    StructuredOutputError,
+    json_response_format,
+    parse_structured,
+    repair_prompt
+)
+from ..config.settings import settings
+from ..utils.cache import LLMResponseCache, llm_cache as default_llm_cache
+from ..utils.coalesce import SingleFlight, llm_flight as default_llm_flight
+from ..utils.llm_client import LLMClientManager, llm_client as default_llm_client
+from ..utils.metrics import record_llm_call
+from ..utils.rate_limiter import (
+    RateLimiter,
+    RateLimitExceededError,
+    rate_limiter as default_rate_limiter
+)
+from ..utils.resilience import Resilience, llm_resilience as default_llm_resilience
+
+logger = logging.getLogger(__name__)
+
+# Callback receiving each text delta of a streamed response
+DeltaCallback = Callable[[str], None]
+
+
+# Custom Agent implementation for investment analysis
+class Agent:
+    def __init__(self, **kwargs):
+        self.name = kwargs.get('name', 'Agent')
+        self.model = kwargs.get('model', 'gpt-4o-mini')
+        self.phase = kwargs.get('phase')
+        self.max_tokens = kwargs.get('max_tokens', 2000)
+        self.llm_client: LLMClientManager = kwargs.get('llm_client') or default_llm_client
+        self.cache: LLMResponseCache = kwargs.get('cache') or default_llm_cache
+        self.rate_limiter: RateLimiter = kwargs.get('rate_limiter') or default_rate_limiter
+        self.resilience: Resilience = kwargs.get('resilience') or default_llm_resilience
+        self.flight: SingleFlight = kwargs.get('flight') or default_llm_flight
+    
+    def _params(self, response_format: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Return the completion parameters, which are also part of the cache key."""
+        params: Dict[str, Any] = {"max_tokens": self.max_tokens}
+        if response_format is not None:
+            params["response_format"] = response_format
+        return params
+    
+    async def run(
+        self,
+        prompt,
+        on_delta: Optional[DeltaCallback] = None,
+        response_format: Optional[Dict[str, Any]] = None
+    ):
+        """Return the full response; with ``on_delta``, stream it and report each delta.
+        
+        Transient failures are retried; a call that still fails raises, so the
+        analysis fails instead of reporting an error message as its result.
+        """
+        if on_delta is not None:
+            parts = []
+            async for delta in self.stream(prompt, response_format=response_format):
+                parts.append(delta)
+                on_delta(delta)
+            return "".join(parts)
+        
+        # Serve repeated prompts from the response cache
+        params = self._params(response_format)
+        cache_key = None
+        if settings.LLM_CACHE_ENABLED:
+            cache_key = self.cache.make_key(self.model, prompt, params)
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                record_llm_call(self.phase, self.model, 0.0, cached=True)
+                return cached
+        
+        # Identical prompts already in flight share one request
+        flight_key = cache_key or self.cache.make_key(self.model, prompt, params)
+        if self.flight.in_flight(flight_key):
+            record_llm_call(self.phase, self.model, 0.0, cached=True)
+        return await self.flight.do(flight_key, lambda: self._complete(prompt, params, cache_key))
+    
+    async def _complete(self, prompt, params: Dict[str, Any], cache_key: Optional[str]) -> str:
+        """Request a full completion and cache it."""
+        # OpenAI API call for analysis through the shared pooled client
+        client = self.llm_client.get()
+        estimated = self.rate_limiter.estimate_tokens(prompt, self.max_tokens)
+        started = time.perf_counter()
+        response = await self.resilience.call(
+            lambda: self._request(client, prompt, estimated, params),
+            key=self.model,
+            hedge=self._can_hedge()
+        )
+        usage = getattr(response, "usage", None)
+        self._reconcile(estimated, usage)
+        record_llm_call(self.phase, self.model, time.perf_counter() - started, usage)
+        content = response.choices[0].message.content
+        
+        if cache_key is not None and content:
+            await self.cache.aset(cache_key, content, self.cache.ttl_for(self.phase))
+        return content
+    
+    async def run_sections(
+        self,
+        prompt,
+        sections: SectionMap,
+        on_delta: Optional[DeltaCallback] = None
+    ) -> Dict[str, str]:
+        """Run the prompt and split the response into sections, parsing while it streams."""
+        parser = SectionParser(sections)
+        
+        def handle(delta: str) -> None:
+            parser.feed(delta)
+            on_delta(delta)
+        
+        response = str(await self.run(prompt, on_delta=handle if on_delta is not None else None))
+        if parser.text != response:
+            # The response was not streamed
+            parser = SectionParser(sections)
+            parser.feed(response)
+        return parser.close()
+    
+    async def run_structured(
+        self,
+        prompt,
+        result_type: Type[ModelT],
+        sections: SectionMap,
+        on_delta: Optional[DeltaCallback] = None,
+        **fields: Any
+    ) -> ModelT:
+        """Request schema-constrained JSON for ``result_type`` and validate it.
+        
+        ``fields`` are set by the caller instead of generated. JSON wrapped in code
+        fences or surrounded by text is accepted; otherwise invalid output is sent
+        back for repair up to STRUCTURED_OUTPUT_REPAIR_ATTEMPTS times, after which
+        StructuredOutputError is raised. When structured output is disabled, the
+        text is split into ``sections`` instead.
+        """
+        if not settings.STRUCTURED_OUTPUT:
+            return result_type(**fields, **await self.run_sections(prompt, sections, on_delta=on_delta))
+        
+        response_format = json_response_format(result_type, exclude=fields)
+        attempt_prompt = prompt
+        error: Optional[Exception] = None
+        for _ in range(settings.STRUCTURED_OUTPUT_REPAIR_ATTEMPTS + 1):
+            response = str(await self.run(attempt_prompt, on_delta=on_delta, response_format=response_format))
+            try:
+                return parse_structured(response, result_type, **fields)
+            except (ValueError, TypeError) as e:
+                error = e
+                # Never serve the invalid response again from the cache
+                await self.cache.adelete(self.cache.make_key(self.model, attempt_prompt, self._params(response_format)))
+                logger.warning("%s returned invalid structured output: %s", self.name, str(e).splitlines()[0])
+                attempt_prompt = repair_prompt(prompt, response, e)
+        
+        raise StructuredOutputError(
+            f"{self.name} did not return a valid {result_type.__name__}: {str(error).splitlines()[0]}"
+        ) from error
+    
+    async def stream(
+        self,
+        prompt,
+        response_format: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Yield the response text as it is generated; cached responses arrive as one delta."""
+        params = self._params(response_format)
+        cache_key = None
+        if settings.LLM_CACHE_ENABLED:
+            cache_key = self.cache.make_key(self.model, prompt, params)
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                record_llm_call(self.phase, self.model, 0.0, cached=True)
+                yield cached
+                return
+        
+        # Joiners of an identical stream replay the deltas produced so far, then follow live
+        flight_key = f"{cache_key or self.cache.make_key(self.model, prompt, params)}:stream"
+        if self.flight.in_flight(flight_key):
+            record_llm_call(self.phase, self.model, 0.0, cached=True)
+        async for delta in self.flight.stream(flight_key, lambda: self._stream_response(prompt, params, cache_key)):
+            yield delta
+    
+    async def _stream_response(
+        self,
+        prompt,
+        params: Dict[str, Any],
+        cache_key: Optional[str]
+    ) -> AsyncIterator[str]:
+        """Stream a completion from the API and cache it once complete."""
+        client = self.llm_client.get()
+        estimated = self.rate_limiter.estimate_tokens(prompt, self.max_tokens)
+        parts = []
+        usage = None
+        started = time.perf_counter()
+        
+        # Opening the stream is retried; text already yielded cannot be taken back, so the rest is not
+        response = await self.resilience.call(
+            lambda: self._request(client, prompt, estimated, params, stream=True),
+            key=f"{self.model}:stream",
+            hedge=False
+        )
+        # Waiting for admission, a slot or retries does not count against reading the stream
+        opened = asyncio.get_running_loop().time()
+        
+        try:
+            iterator = response.__aiter__()
+            while True:
+                # The per-call deadline covers the whole stream
+                remaining = opened + self.resilience.deadline - asyncio.get_running_loop().time()
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=max(remaining, 0))
+                except StopAsyncIteration:
+                    break
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            # The request slot taken when the stream opened is held until it is fully read
+            self.llm_client.request_slot().release()
+            close = getattr(response, "close", None)
+            if close is not None:
+                await close()
+        self._reconcile(estimated, usage)
+        record_llm_call(self.phase, self.model, time.perf_counter() - started, usage)
+        
+        # Only complete responses are cached, so an interrupted stream is retried in full
+        content = "".join(parts)
+        if cache_key is not None and content:
+            await self.cache.aset(cache_key, content, self.cache.ttl_for(self.phase))
+    
+    async def _request(
+        self,
+        client,
+        prompt,
+        estimated: int,
+        params: Dict[str, Any],
+        stream: bool = False
+    ):
+        """Make one chat completion request under the deadline, pacing 429s.
+        
+        The concurrency slot is only taken once the rate limiter admits the call.
+        A stream keeps its slot when it opens; the caller releases it once the
+        stream is read.
+        """
+        extra: Dict[str, Any] = {}
+        if stream:
+            extra = {"stream": True, "stream_options": {"include_usage": True}}
+        # Stream openings are counted apart so they do not skew full-call statistics
+        key = f"{self.model}:stream" if stream else self.model
+        
+        def create():
+            return client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                **params,
+                **extra
+            )
+        
+        attempt = 0
+        while True:
+            await self._admit(estimated)
+            try:
+                if stream:
+                    slot = self.llm_client.request_slot()
+                    await slot.acquire()
+                    try:
+                        return await self.resilience.timed(create(), key=key)
+                    except BaseException:
+                        slot.release()
+                        raise
+                async with self.llm_client.request_slot():
+                    return await self.resilience.timed(create(), key=key)
+            except openai.RateLimitError as e:
+                await self._back_off(e, estimated, attempt)
+                attempt += 1
+    
+    def _can_hedge(self) -> bool:
+        """Only hedge while the model's rate budget has room for the extra request."""
+        if not settings.LLM_RATE_LIMIT_ENABLED:
+            return True
+        return self.rate_limiter.for_model(self.model).saturation() < 1.0
+    
+    async def _admit(self, estimated: int) -> None:
+        """Wait for this model's request and token budgets."""
+        if settings.LLM_RATE_LIMIT_ENABLED:
+            await self.rate_limiter.for_model(self.model).acquire(estimated)
+    
+    def _reconcile(self, estimated: int, usage: Any) -> None:
+        """Charge the token budget for what the call actually used."""
+        total = getattr(usage, "total_tokens", None)
+        if settings.LLM_RATE_LIMIT_ENABLED and total is not None:
+            self.rate_limiter.for_model(self.model).reconcile(estimated, total)
+    
+    async def _back_off(self, error: "openai.RateLimitError", estimated: int, attempt: int) -> None:
+        """Pause the model's budget after a 429; give up once the retries are spent."""
+        retry_after = settings.LLM_RATE_LIMIT_BACKOFF
+        response = getattr(error, "response", None)
+        try:
+            retry_after = float(response.headers.get("retry-after", retry_after))
+        except (AttributeError, TypeError, ValueError):
+            pass
+        
+        if settings.LLM_RATE_LIMIT_ENABLED:
+            limiter = self.rate_limiter.for_model(self.model)
+            # The rejected call was not charged by the provider
+            limiter.reconcile(estimated, 0)
+            limiter.pause(retry_after)
+        if attempt >= settings.LLM_RATE_LIMIT_RETRIES:
+            raise RateLimitExceededError(f"{self.model} rate limit exceeded: {str(error)}") from error
+        if not settings.LLM_RATE_LIMIT_ENABLED:
+            await asyncio.sleep(retry_after)
@@ -1,37 +1,29 @@
 """Investment Lead Agent - Portfolio allocation and strategy."""
 
-import os
-from typing import Dict, Any
-
-# Custom Agent implementation for investment analysis
-class Agent:
-    def __init__(self, **kwargs):
-        self.name = kwargs.get('name', 'Agent')
-        self.model = kwargs.get('model', 'gpt-4o-mini')
-        self.api_key = kwargs.get('api_key')
-    
-    async def run(self, prompt):
-        # OpenAI API call for analysis
-        try:
-            from openai import AsyncOpenAI
-            client = AsyncOpenAI(api_key=self.api_key)
-            
-            response = await client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=2000
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Analysis error: {str(e)}"
+import asyncio
+from typing import Optional
 
+from .base import Agent, DeltaCallback
+from .sections import SectionMap
+from ..utils.portfolio import parse_symbols
+from ..utils.context_budget import ContextBudget
+from ..utils.llm_client import LLMClientManager
+from ..config.settings import settings
 from ..api.models.schemas import PortfolioAllocation, InvestmentRanking
 
+# Response headers of each PortfolioAllocation field
+PORTFOLIO_ALLOCATION_SECTIONS: SectionMap = {
+    "allocation_strategy": "Allocation Strategy",
+    "investment_thesis": "Investment Thesis",
+    "risk_management": "Risk Management",
+    "final_recommendations": "Final Recommendations"
+}
+
 
 class InvestmentLeadAgent:
     """Investment Lead Agent for portfolio strategy and allocation."""
     
-    def __init__(self):
+    def __init__(self, llm_client: Optional[LLMClientManager] = None):
         """Initialize the Investment Lead Agent."""
         self.name = "Investment Lead"
         self.description = """
@@ -65,28 +57,55 @@ class InvestmentLeadAgent:
         self.agent = Agent(
             name=self.name,
             model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY")
+            phase="portfolio_allocation",
+            llm_client=llm_client
         )
+        self.context_budget = ContextBudget(settings.PHASE3_CONTEXT_TOKENS, model=self.agent.model)
     
-    async def analyze(self, investment_ranking: InvestmentRanking) -> PortfolioAllocation:
-        """Develop portfolio allocation strategy."""
+    async def analyze(
+        self,
+        investment_ranking: InvestmentRanking,
+        on_delta: Optional[DeltaCallback] = None,
+        company_symbols: Optional[str] = None
+    ) -> PortfolioAllocation:
+        """Develop portfolio allocation strategy.
+        
+        ``company_symbols`` lets the context budget keep facts for every ticker.
+        """
+        
+        # Fit the ranking into the prompt budget
+        context = await asyncio.to_thread(
+            self.context_budget.compact,
+            {
+                "ranked_companies": investment_ranking.ranked_companies,
+                "investment_rationale": investment_ranking.investment_rationale,
+                "risk_evaluation": investment_ranking.risk_evaluation,
+                "growth_potential": investment_ranking.growth_potential
+            },
+            symbols=parse_symbols(company_symbols),
+            label="Portfolio allocation"
+        )
         
         # Prepare portfolio strategy prompt
         prompt = f"""
         Based on the investment ranking and analysis below, create a strategic portfolio allocation.
         
         INVESTMENT RANKING:
-        - Company Rankings: {investment_ranking.ranked_companies}
-        - Investment Rationale: {investment_ranking.investment_rationale}
-        - Risk Evaluation: {investment_ranking.risk_evaluation}
-        - Growth Potential: {investment_ranking.growth_potential}
+        - Company Rankings: {context["ranked_companies"]}
+        - Investment Rationale: {context["investment_rationale"]}
+        - Risk Evaluation: {context["risk_evaluation"]}
+        - Growth Potential: {context["growth_potential"]}
         
         Please provide:
         1. Specific allocation percentages for each company
         2. Investment thesis and strategic rationale
         3. Risk management approach
         4. Final actionable recommendations
+        """
         
+        # Section headers are only needed when the reply is scraped as text
+        if not settings.STRUCTURED_OUTPUT:
+            prompt += """
         Structure your response with these sections:
         - Allocation Strategy: [Specific percentage allocations and reasoning]
         - Investment Thesis: [Overall investment thesis and strategy]
@@ -95,47 +114,4 @@ class InvestmentLeadAgent:
         """
         
         # Get analysis from Upsonic agent
-        response = await self.agent.run(prompt)
-        
-        # Parse response into structured format
-        response_text = str(response)
-        sections = self._parse_response(response_text)
-        
-        return PortfolioAllocation(
-            allocation_strategy=sections.get("allocation_strategy", response_text[:500]),
-            investment_thesis=sections.get("investment_thesis", response_text[500:1000]),
-            risk_management=sections.get("risk_management", response_text[1000:1500]),
-            final_recommendations=sections.get("final_recommendations", response_text[1500:2000])
-        )
-    
-    def _parse_response(self, response: str) -> Dict[str, str]:
-        """Parse agent response into structured sections."""
-        sections = {}
-        
-        # Simple parsing logic
-        if "Allocation Strategy:" in response:
-            start = response.find("Allocation Strategy:") + len("Allocation Strategy:")
-            end = response.find("Investment Thesis:", start)
-            if end == -1:
-                end = len(response)
-            sections["allocation_strategy"] = response[start:end].strip()
-        
-        if "Investment Thesis:" in response:
-            start = response.find("Investment Thesis:") + len("Investment Thesis:")
-            end = response.find("Risk Management:", start)
-            if end == -1:
-                end = len(response)
-            sections["investment_thesis"] = response[start:end].strip()
-        
-        if "Risk Management:" in response:
-            start = response.find("Risk Management:") + len("Risk Management:")
-            end = response.find("Final Recommendations:", start)
-            if end == -1:
-                end = len(response)
-            sections["risk_management"] = response[start:end].strip()
-        
-        if "Final Recommendations:" in response:
-            start = response.find("Final Recommendations:") + len("Final Recommendations:")
-            sections["final_recommendations"] = response[start:].strip()
-        
-        return sections
+        return await self.agent.run_structured(prompt, PortfolioAllocation, PORTFOLIO_ALLOCATION_SECTIONS, on_delta=on_delta)
@@ -1,37 +1,29 @@
 """Research Analyst Agent - Investment ranking and evaluation."""
 
-import os
-from typing import Dict, Any
-
-# Custom Agent implementation for investment analysis
-class Agent:
-    def __init__(self, **kwargs):
-        self.name = kwargs.get('name', 'Agent')
-        self.model = kwargs.get('model', 'gpt-4o-mini')
-        self.api_key = kwargs.get('api_key')
-    
-    async def run(self, prompt):
-        # OpenAI API call for analysis
-        try:
-            from openai import AsyncOpenAI
-            client = AsyncOpenAI(api_key=self.api_key)
-            
-            response = await client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=2000
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Analysis error: {str(e)}"
+import asyncio
+from typing import Optional
 
+from .base import Agent, DeltaCallback
+from .sections import SectionMap
+from ..utils.portfolio import parse_symbols
+from ..utils.context_budget import ContextBudget
+from ..utils.llm_client import LLMClientManager
+from ..config.settings import settings
 from ..api.models.schemas import InvestmentRanking, StockAnalysisResult
 
+# Response headers of each InvestmentRanking field
+INVESTMENT_RANKING_SECTIONS: SectionMap = {
+    "ranked_companies": "Ranked Companies",
+    "investment_rationale": "Investment Rationale",
+    "risk_evaluation": "Risk Evaluation",
+    "growth_potential": "Growth Potential"
+}
+
 
 class ResearchAnalystAgent:
     """Research Analyst Agent for investment evaluation and ranking."""
     
-    def __init__(self):
+    def __init__(self, llm_client: Optional[LLMClientManager] = None):
         """Initialize the Research Analyst Agent."""
         self.name = "Research Analyst"
         self.description = """
@@ -65,29 +57,52 @@ class ResearchAnalystAgent:
         self.agent = Agent(
             name=self.name,
             model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY")
+            phase="investment_ranking",
+            llm_client=llm_client
         )
+        self.context_budget = ContextBudget(settings.PHASE2_CONTEXT_TOKENS, model=self.agent.model)
     
-    async def analyze(self, stock_analysis: StockAnalysisResult) -> InvestmentRanking:
+    async def analyze(
+        self,
+        stock_analysis: StockAnalysisResult,
+        on_delta: Optional[DeltaCallback] = None
+    ) -> InvestmentRanking:
         """Perform investment ranking and evaluation."""
         
+        # Fit the Phase 1 results into the prompt budget, keeping facts for every ticker
+        context = await asyncio.to_thread(
+            self.context_budget.compact,
+            {
+                "market_analysis": stock_analysis.market_analysis,
+                "financial_metrics": stock_analysis.financial_metrics,
+                "risk_assessment": stock_analysis.risk_assessment,
+                "recommendations": stock_analysis.recommendations
+            },
+            symbols=parse_symbols(stock_analysis.company_symbols),
+            label="Investment ranking"
+        )
+        
         # Prepare ranking prompt
         prompt = f"""
         Based on the comprehensive stock analysis below, please rank these companies by investment potential.
         
         STOCK ANALYSIS:
         - Companies: {stock_analysis.company_symbols}
-        - Market Analysis: {stock_analysis.market_analysis}
-        - Financial Metrics: {stock_analysis.financial_metrics}
-        - Risk Assessment: {stock_analysis.risk_assessment}
-        - Initial Recommendations: {stock_analysis.recommendations}
+        - Market Analysis: {context["market_analysis"]}
+        - Financial Metrics: {context["financial_metrics"]}
+        - Risk Assessment: {context["risk_assessment"]}
+        - Initial Recommendations: {context["recommendations"]}
         
         Please provide:
         1. Detailed ranking of companies from best to worst investment potential
         2. Investment rationale for each company
         3. Risk evaluation and mitigation strategies
         4. Growth potential assessment
+        """
         
+        # Section headers are only needed when the reply is scraped as text
+        if not settings.STRUCTURED_OUTPUT:
+            prompt += """
         Structure your response with these sections:
         - Ranked Companies: [Company ranking with explanations]
         - Investment Rationale: [Detailed rationale for each company]
@@ -96,47 +111,4 @@ class ResearchAnalystAgent:
         """
         
         # Get analysis from Upsonic agent
-        response = await self.agent.run(prompt)
-        
-        # Parse response into structured format
-        response_text = str(response)
-        sections = self._parse_response(response_text)
-        
-        return InvestmentRanking(
-            ranked_companies=sections.get("ranked_companies", response_text[:500]),
-            investment_rationale=sections.get("investment_rationale", response_text[500:1000]),
-            risk_evaluation=sections.get("risk_evaluation", response_text[1000:1500]),
-            growth_potential=sections.get("growth_potential", response_text[1500:2000])
-        )
-    
-    def _parse_response(self, response: str) -> Dict[str, str]:
-        """Parse agent response into structured sections."""
-        sections = {}
-        
-        # Simple parsing logic
-        if "Ranked Companies:" in response:
-            start = response.find("Ranked Companies:") + len("Ranked Companies:")
-            end = response.find("Investment Rationale:", start)
-            if end == -1:
-                end = len(response)
-            sections["ranked_companies"] = response[start:end].strip()
-        
-        if "Investment Rationale:" in response:
-            start = response.find("Investment Rationale:") + len("Investment Rationale:")
-            end = response.find("Risk Evaluation:", start)
-            if end == -1:
-                end = len(response)
-            sections["investment_rationale"] = response[start:end].strip()
-        
-        if "Risk Evaluation:" in response:
-            start = response.find("Risk Evaluation:") + len("Risk Evaluation:")
-            end = response.find("Growth Potential:", start)
-            if end == -1:
-                end = len(response)
-            sections["risk_evaluation"] = response[start:end].strip()
-        
-        if "Growth Potential:" in response:
-            start = response.find("Growth Potential:") + len("Growth Potential:")
-            sections["growth_potential"] = response[start:].strip()
-        
-        return sections
+        return await self.agent.run_structured(prompt, InvestmentRanking, INVESTMENT_RANKING_SECTIONS, on_delta=on_delta)
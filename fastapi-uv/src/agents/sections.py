@@ -0,0 +1,100 @@
+"""Single-pass parser that splits agent responses into named sections."""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Header map: model field name -> header label the prompt asks the model to write
+SectionMap = Dict[str, str]
+
+# Markdown decoration models commonly wrap headers in ("- **Market Analysis:**")
+_DECORATION = r"[ \t]*(?:[-*#>]+[ \t]*)*(?:\*\*|__)?"
+
+
+class SectionParser:
+    """Incrementally splits streamed text into sections at known headers.
+    
+    Text is scanned once as deltas arrive; a section is complete as soon as the
+    next header is seen, and the last one when the stream is closed.
+    """
+    
+    def __init__(self, sections: SectionMap):
+        """Initialize the parser for one response."""
+        self.sections = sections
+        self._field_by_header = {label.lower(): field for field, label in sections.items()}
+        # Longest labels first so "Final Recommendations" wins over "Recommendations"
+        labels = sorted(sections.values(), key=len, reverse=True)
+        self._pattern = re.compile(
+            _DECORATION
+            + r"(?<![A-Za-z])(" + "|".join(re.escape(label) for label in labels) + r")"
+            + r"(?:\*\*|__)?[ \t]*:(?:\*\*|__)?",
+            re.IGNORECASE
+        )
+        # A header split across deltas is at most this long, decoration included
+        self._overlap = max((len(label) for label in labels), default=0) + 16
+        self._buffer = ""
+        self._scanned = 0
+        self._current: Optional[Tuple[str, int]] = None
+        self._completed: Dict[str, str] = {}
+    
+    @property
+    def text(self) -> str:
+        """Return all text fed so far."""
+        return self._buffer
+    
+    def feed(self, delta: str) -> List[str]:
+        """Consume a delta and return the fields whose sections just completed."""
+        if not delta:
+            return []
+        self._buffer += delta
+        return self._scan(final=False)
+    
+    def close(self) -> Dict[str, str]:
+        """Finish the last section and return the text of every section by field.
+        
+        A response without any known header is kept whole in the first field;
+        fields whose header never appeared are empty.
+        """
+        self._scan(final=True)
+        if self._current is not None:
+            self._finish(len(self._buffer))
+        elif self._buffer.strip() and self.sections:
+            self._completed[next(iter(self.sections))] = self._buffer.strip()
+        return {field: self._completed.get(field, "") for field in self.sections}
+    
+    def _scan(self, final: bool) -> List[str]:
+        """Find headers in the unscanned tail and return the fields they completed."""
+        # Rescan a short tail so headers split across deltas are still found
+        start = max(self._scanned - self._overlap, self._current[1] if self._current else 0)
+        self._scanned = len(self._buffer)
+        finished = []
+        for match in self._pattern.finditer(self._buffer, start):
+            if self._current is not None and match.start() < self._current[1]:
+                continue
+            if len(self._buffer) - match.end() < 2 and not final:
+                # Closing decoration may still be on its way; decide on the next delta
+                self._scanned = min(self._scanned, match.start() + self._overlap)
+                break
+            if self._current is not None:
+                finished.append(self._finish(match.start()))
+            field = self._field_by_header[match.group(1).lower()]
+            self._current = (field, match.end())
+        return finished
+    
+    def _finish(self, end: int) -> str:
+        """Store the current section's text up to ``end`` and return its field."""
+        field, start = self._current
+        text = self._buffer[start:end].strip()
+        # A repeated header continues its section instead of replacing it
+        previous = self._completed.get(field)
+        if previous:
+            text = f"{previous}\n\n{text}" if text else previous
+        self._completed[field] = text
+        self._current = None
+        return field
+
+
+def parse_sections(text: str, sections: SectionMap) -> Dict[str, str]:
+    """Split a complete response into sections in one pass."""
+    parser = SectionParser(sections)
+    parser.feed(text)
+    return parser.close()
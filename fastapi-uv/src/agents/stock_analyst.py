@@ -1,39 +1,42 @@
 """Stock Analyst Agent - Market research and financial analysis."""
 
-import os
-from typing import Dict, Any
+import asyncio
+import re
+from typing import Callable, Dict, Any, List, Optional
 
-# Custom Agent implementation for investment analysis
-class Agent:
-    def __init__(self, **kwargs):
-        self.name = kwargs.get('name', 'Agent')
-        self.model = kwargs.get('model', 'gpt-4o-mini')
-        self.api_key = kwargs.get('api_key')
-    
-    async def run(self, prompt):
-        # OpenAI API call for analysis
-        try:
-            from openai import AsyncOpenAI
-            client = AsyncOpenAI(api_key=self.api_key)
-            
-            response = await client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=2000
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Analysis error: {str(e)}"
+from .base import Agent, DeltaCallback
+from .sections import SectionMap
+from ..utils.llm_client import LLMClientManager
+from ..utils.portfolio import parse_symbols
+from ..utils.search import WebSearch, web_search as default_web_search
+from ..utils.snippets import SnippetProcessor, snippet_processor as default_snippet_processor
+from ..api.models.schemas import StockAnalysisResult
+from ..config.settings import settings
 
-from duckduckgo_search import DDGS
+# Callback receiving (symbol, delta) while per-ticker responses stream
+TickerDeltaCallback = Callable[[str, str], None]
 
-from ..api.models.schemas import StockAnalysisResult
+# Response headers of each StockAnalysisResult field
+STOCK_ANALYSIS_SECTIONS: SectionMap = {
+    "market_analysis": "Market Analysis",
+    "financial_metrics": "Financial Metrics",
+    "risk_assessment": "Risk Assessment",
+    "recommendations": "Recommendations"
+}
+
+# Heading that opens one company's part of a section in a multi-company response
+_TICKER_HEADING = re.compile(r"^#{1,6}\s*\$?([A-Za-z][A-Za-z0-9.\-]{0,9})\s*:?\s*$", re.MULTILINE)
 
 
 class StockAnalystAgent:
     """Stock Analyst Agent for comprehensive market analysis."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        llm_client: Optional[LLMClientManager] = None,
+        search: Optional[WebSearch] = None,
+        snippets: Optional[SnippetProcessor] = None
+    ):
         """Initialize the Stock Analyst Agent."""
         self.name = "Stock Analyst"
         self.description = """
@@ -69,59 +72,206 @@ class StockAnalystAgent:
         self.agent = Agent(
             name=self.name,
             model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY")
+            phase="stock_analysis",
+            llm_client=llm_client
         )
+        self.search = search or default_web_search
+        self.snippets = snippets or default_snippet_processor
     
-    def search_company_info(self, company_symbols: str) -> str:
-        """Search for company information using DuckDuckGo."""
+    async def search_company_info(self, company_symbols: str) -> str:
+        """Search for company information concurrently using DuckDuckGo."""
         try:
-            ddgs = DDGS()
-            search_results = []
-            
-            companies = [symbol.strip() for symbol in company_symbols.split(",")]
-            
-            for company in companies:
-                # Search for recent news and financial information
-                query = f"{company} stock analysis financial metrics 2024"
-                results = ddgs.text(query, max_results=3)
-                
-                company_info = f"\n--- {company} Information ---\n"
-                for result in results:
-                    company_info += f"Title: {result.get('title', 'N/A')}\n"
-                    company_info += f"Summary: {result.get('body', 'N/A')}\n"
-                    company_info += f"Source: {result.get('href', 'N/A')}\n\n"
-                
-                search_results.append(company_info)
+            companies = self.split_symbols(company_symbols)
             
-            return "\n".join(search_results)
+            # Search for recent news and financial information, one query per ticker
+            results_by_company = await self.search.search_companies(companies)
             
+            return self._format_market_data(companies, results_by_company)
+        
         except Exception as e:
             return f"Error searching for company information: {str(e)}"
     
-    async def analyze(self, companies: str, message: str) -> StockAnalysisResult:
-        """Perform comprehensive stock analysis."""
+    @staticmethod
+    def split_symbols(company_symbols: str) -> List[str]:
+        """Split a comma-separated symbol list into unique upper-cased symbols."""
+        return parse_symbols(company_symbols)
+    
+    def _format_market_data(
+        self,
+        companies: List[str],
+        results_by_company: Dict[str, List[Dict[str, str]]]
+    ) -> str:
+        """Render the deduplicated, best-ranked search results as the market data block of the prompt."""
+        search_results = []
+        for company in companies:
+            company_info = f"\n--- {company} Information ---\n"
+            raw = results_by_company.get(company) or []
+            results = self.snippets.process(company, raw)
+            if raw:
+                print(
+                    f"Snippets for {company}: {len(raw)} -> {len(results)} results, "
+                    f"{sum(map(self.snippets.size, raw))} -> {sum(map(self.snippets.size, results))} chars"
+                )
+            if not results:
+                company_info += "No search results available.\n"
+            for result in results:
+                company_info += f"Title: {result.get('title', 'N/A')}\n"
+                company_info += f"Summary: {result.get('body', 'N/A')}\n"
+                company_info += f"Source: {result.get('href', 'N/A')}\n\n"
+            
+            search_results.append(company_info)
+        
+        return "\n".join(search_results)
+    
+    async def analyze(
+        self,
+        companies: str,
+        message: str,
+        per_ticker: Optional[bool] = None,
+        on_delta: Optional[DeltaCallback] = None,
+        on_ticker_delta: Optional[TickerDeltaCallback] = None
+    ) -> StockAnalysisResult:
+        """Perform comprehensive stock analysis.
+        
+        ``on_delta`` receives the streamed response. A per-ticker analysis reports
+        ``(symbol, delta)`` to ``on_ticker_delta`` instead when it is given;
+        otherwise the deltas of its concurrent calls reach ``on_delta`` interleaved.
+        """
+        
+        if per_ticker is None:
+            per_ticker = self.should_fan_out(companies)
+        if per_ticker:
+            if on_ticker_delta is None and on_delta is not None:
+                on_ticker_delta = lambda symbol, delta: on_delta(delta)
+            return await self.analyze_per_ticker(companies, message, on_delta=on_ticker_delta)
         
         # Get market data through web search
-        market_data = self.search_company_info(companies)
+        market_data = await self.search_company_info(companies)
+        
+        return await self._analyze_with_data(companies, message, market_data, on_delta=on_delta)
+    
+    async def analyze_per_ticker(
+        self,
+        companies: str,
+        message: str,
+        on_delta: Optional[TickerDeltaCallback] = None
+    ) -> StockAnalysisResult:
+        """Analyze each ticker in its own concurrent LLM call and merge the results."""
+        symbols = self.split_symbols(companies)
+        results = await self.analyze_tickers(symbols, message, on_delta=on_delta)
+        return self.merge_results([results[symbol] for symbol in symbols])
+    
+    async def analyze_tickers(
+        self,
+        symbols: List[str],
+        message: str,
+        on_delta: Optional[TickerDeltaCallback] = None
+    ) -> Dict[str, StockAnalysisResult]:
+        """Analyze each symbol in its own concurrent LLM call and return results by symbol."""
+        results_by_company = await self.search.search_companies(symbols)
+        
+        # Bound the number of simultaneous Phase 1 calls for this analysis
+        semaphore = asyncio.Semaphore(settings.PHASE1_CONCURRENCY)
+        
+        async def analyze_symbol(symbol: str) -> StockAnalysisResult:
+            market_data = self._format_market_data([symbol], results_by_company)
+            symbol_delta = None
+            if on_delta is not None:
+                symbol_delta = lambda delta: on_delta(symbol, delta)
+            async with semaphore:
+                return await self._analyze_with_data(symbol, message, market_data, on_delta=symbol_delta)
+        
+        results = await asyncio.gather(*(analyze_symbol(symbol) for symbol in symbols))
+        return dict(zip(symbols, results))
+    
+    @staticmethod
+    def merge_results(results: List[StockAnalysisResult]) -> StockAnalysisResult:
+        """Merge per-ticker analyses into one portfolio-level result."""
+        if len(results) == 1:
+            return results[0]
+        
+        def merge_field(field: str) -> str:
+            return "\n\n".join(
+                f"### {result.company_symbols}\n{getattr(result, field)}" for result in results
+            )
+        
+        return StockAnalysisResult(
+            company_symbols=", ".join(result.company_symbols for result in results),
+            market_analysis=merge_field("market_analysis"),
+            financial_metrics=merge_field("financial_metrics"),
+            risk_assessment=merge_field("risk_assessment"),
+            recommendations=merge_field("recommendations")
+        )
+    
+    @staticmethod
+    def split_result(result: StockAnalysisResult, symbols: List[str]) -> Dict[str, StockAnalysisResult]:
+        """Split a multi-company result into per-ticker results along its "### SYMBOL" headings.
+        
+        Returns an empty dict unless every section has a part for every symbol.
+        """
+        parts: Dict[str, Dict[str, str]] = {symbol: {} for symbol in symbols}
+        for field in STOCK_ANALYSIS_SECTIONS:
+            text = getattr(result, field) or ""
+            headings = list(_TICKER_HEADING.finditer(text))
+            for index, heading in enumerate(headings):
+                symbol = heading.group(1).upper()
+                end = headings[index + 1].start() if index + 1 < len(headings) else len(text)
+                if symbol in parts and text[heading.end():end].strip():
+                    parts[symbol][field] = text[heading.end():end].strip()
+        
+        if any(len(fields) < len(STOCK_ANALYSIS_SECTIONS) for fields in parts.values()):
+            return {}
+        return {
+            symbol: StockAnalysisResult(company_symbols=symbol, **fields)
+            for symbol, fields in parts.items()
+        }
+    
+    def should_fan_out(self, companies: str) -> bool:
+        """Decide whether to use per-ticker Phase 1 calls for this portfolio."""
+        mode = settings.PHASE1_MODE
+        if mode == "per_ticker":
+            return True
+        if mode == "auto":
+            return len(self.split_symbols(companies)) >= settings.PHASE1_FAN_OUT_MIN_TICKERS
+        return False
+    
+    async def _analyze_with_data(
+        self,
+        companies: str,
+        message: str,
+        market_data: str,
+        on_delta: Optional[DeltaCallback] = None
+    ) -> StockAnalysisResult:
+        """Run one Phase 1 LLM call over the given market data."""
         
         # Prepare analysis prompt
         prompt = f"""
         {message}
-
+        
         Please conduct a comprehensive analysis of the following companies: {companies}
-
+        
         Market Data Available:
         {market_data}
-
+        
         For each company, provide:
         1. Current market position and financial metrics
         2. Recent performance and analyst recommendations
         3. Industry trends and competitive landscape
         4. Risk factors and growth potential
         5. News impact and market sentiment
-
+        
         Companies to analyze: {companies}
+        """
         
+        # Lets the result be split per ticker and stored for reuse by other portfolios
+        if len(self.split_symbols(companies)) > 1:
+            prompt += """
+        In every section, start each company's part with a heading line of the form "### SYMBOL".
+        """
+        
+        # Section headers are only needed when the reply is scraped as text
+        if not settings.STRUCTURED_OUTPUT:
+            prompt += f"""
         Please structure your response with the following sections:
         - Company Symbols: {companies}
         - Market Analysis: [Detailed market analysis]
@@ -131,51 +281,10 @@ class StockAnalystAgent:
         """
         
         # Get analysis from Upsonic agent
-        response = await self.agent.run(prompt)
-        
-        # Parse response into structured format
-        # For now, we'll use the full response and structure it
-        response_text = str(response)
-        
-        # Extract sections (simplified parsing)
-        sections = self._parse_response(response_text)
-        
-        return StockAnalysisResult(
-            company_symbols=companies,
-            market_analysis=sections.get("market_analysis", response_text[:500]),
-            financial_metrics=sections.get("financial_metrics", response_text[500:1000]),
-            risk_assessment=sections.get("risk_assessment", response_text[1000:1500]),
-            recommendations=sections.get("recommendations", response_text[1500:2000])
+        return await self.agent.run_structured(
+            prompt,
+            StockAnalysisResult,
+            STOCK_ANALYSIS_SECTIONS,
+            on_delta=on_delta,
+            company_symbols=companies
         )
-    
-    def _parse_response(self, response: str) -> Dict[str, str]:
-        """Parse agent response into structured sections."""
-        sections = {}
-        
-        # Simple parsing logic - in production, this would be more sophisticated
-        if "Market Analysis:" in response:
-            start = response.find("Market Analysis:") + len("Market Analysis:")
-            end = response.find("Financial Metrics:", start)
-            if end == -1:
-                end = len(response)
-            sections["market_analysis"] = response[start:end].strip()
-        
-        if "Financial Metrics:" in response:
-            start = response.find("Financial Metrics:") + len("Financial Metrics:")
-            end = response.find("Risk Assessment:", start)
-            if end == -1:
-                end = len(response)
-            sections["financial_metrics"] = response[start:end].strip()
-        
-        if "Risk Assessment:" in response:
-            start = response.find("Risk Assessment:") + len("Risk Assessment:")
-            end = response.find("Recommendations:", start)
-            if end == -1:
-                end = len(response)
-            sections["risk_assessment"] = response[start:end].strip()
-        
-        if "Recommendations:" in response:
-            start = response.find("Recommendations:") + len("Recommendations:")
-            sections["recommendations"] = response[start:].strip()
-        
-        return sections
@@ -0,0 +1,77 @@
+"""Schema-constrained JSON output for agent results."""
+
+import json
+import re
+from typing import Any, Dict, Iterable, Type, TypeVar
+
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# A Markdown code fence around a JSON body, with an optional language tag
+_FENCE = re.compile(r"```[a-zA-Z]*\s*(.*?)\s*```", re.DOTALL)
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a response still does not fit the schema after every repair attempt."""
+
+
+def json_response_format(result_type: Type[BaseModel], exclude: Iterable[str] = ()) -> Dict[str, Any]:
+    """Build a strict ``response_format`` asking for the model's fields as JSON.
+    
+    Fields in ``exclude`` are filled in by the caller rather than generated.
+    """
+    excluded = set(exclude)
+    properties = {
+        name: {key: value for key, value in schema.items() if key != "title"}
+        for name, schema in result_type.model_json_schema()["properties"].items()
+        if name not in excluded
+    }
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": result_type.__name__,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False
+            }
+        }
+    }
+
+
+def extract_json(text: str) -> Any:
+    """Parse JSON from a response, tolerating code fences and text around the object."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("No JSON object found in the response")
+    return json.loads(text[start:end + 1])
+
+
+def parse_structured(text: str, result_type: Type[ModelT], **fields: Any) -> ModelT:
+    """Validate a JSON response in one pass; raises ValueError when it does not fit."""
+    data = extract_json(text)
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+    return result_type(**{**data, **fields})
+
+
+def repair_prompt(prompt: str, response: str, error: Exception) -> str:
+    """Ask the model to correct a response that failed validation."""
+    return f"""{prompt}
+        
+        Your previous response could not be used: {error}
+        Previous response:
+        {response}
+        
+        Respond again with only a JSON object that matches the required schema.
+        """
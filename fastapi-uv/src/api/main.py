@@ -1,11 +1,51 @@
 """FastAPI main application."""
 
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from .routes import analysis, health
+from .routes import analysis, cache, health, llm, metrics, reports
 from ..config.settings import settings
+from ..utils.analysis_store import analysis_store
+from ..utils.jobs import process_executor
+from ..utils.llm_client import llm_client
+from ..utils.progress import progress_broker
+from ..utils.reports import report_writer
+from ..utils.ticker_store import ticker_store
+from ..utils.tokenizer import load_encoding
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources on startup and release them on shutdown."""
+    settings.validate_workers()
+    llm_client.startup()
+    # Databases open on first use; opening them here keeps that off the event loop
+    await asyncio.to_thread(progress_broker.startup)
+    await asyncio.to_thread(ticker_store.purge_stale)
+    await asyncio.to_thread(analysis_store.apply_retention)
+    await analysis.recover_interrupted()
+    # Loaded in the background, since a first-time encoding download has no timeout
+    loop = asyncio.get_running_loop()
+    agents = (analysis.workflow.research_analyst, analysis.workflow.investment_lead)
+    for model in {agent.context_budget.model for agent in agents}:
+        loop.run_in_executor(None, load_encoding, model)
+    analysis.job_queue.start()
+    try:
+        yield
+    finally:
+        interrupted = await analysis.job_queue.stop()
+        await analysis.fail_interrupted([analysis_id for job in interrupted for analysis_id in job.analysis_ids()])
+        process_executor.shutdown()
+        await progress_broker.drain()
+        await asyncio.to_thread(progress_broker.shutdown)
+        # Let reports already being written reach the disk
+        await asyncio.to_thread(report_writer.shutdown)
+        await llm_client.shutdown()
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -13,7 +53,8 @@ app = FastAPI(
     version=settings.APP_VERSION,
     description="AI-powered investment analysis system built with Upsonic Agent Framework",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -28,6 +69,10 @@ app.add_middleware(
 # Include routers
 app.include_router(analysis.router)
 app.include_router(health.router)
+app.include_router(cache.router)
+app.include_router(reports.router)
+app.include_router(llm.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -1,7 +1,9 @@
 """Pydantic models for API requests and responses."""
 
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from ...utils.portfolio import Portfolio
 
 
 class AnalysisRequest(BaseModel):
@@ -16,6 +18,32 @@ class AnalysisRequest(BaseModel):
         default="Generate comprehensive investment analysis and portfolio allocation recommendations",
         description="Custom analysis message or instructions"
     )
+    per_ticker: Optional[bool] = Field(
+        default=None,
+        description="Analyze each company in its own concurrent Phase 1 call (defaults to server PHASE1_MODE)"
+    )
+    priority: int = Field(
+        default=5,
+        ge=0,
+        le=9,
+        description="Queue priority from 0 (lowest) to 9 (highest)"
+    )
+    
+    @field_validator("companies")
+    @classmethod
+    def canonical_companies(cls, companies: str) -> str:
+        """Parse, validate and rewrite the symbols as the canonical sorted list."""
+        return Portfolio.parse(companies).companies
+
+
+class BatchAnalysisRequest(BaseModel):
+    """Request model for analyzing several portfolios in one call."""
+    
+    portfolios: List[AnalysisRequest] = Field(
+        ...,
+        min_length=1,
+        description="Portfolios to analyze; results are streamed back as each one completes"
+    )
 
 
 class AnalysisResponse(BaseModel):
@@ -62,6 +90,8 @@ class ReportResponse(BaseModel):
     status: str = Field(..., description="Report status")
     reports: Optional[dict] = Field(None, description="Generated report files")
     summary: Optional[str] = Field(None, description="Analysis summary")
+    queue_position: Optional[int] = Field(None, description="Position in the job queue while queued")
+    metrics: Optional[dict] = Field(None, description="Per-stage timings and per-phase token usage and cost")
 
 
 class HealthResponse(BaseModel):
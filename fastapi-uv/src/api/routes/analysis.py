@@ -1,118 +1,404 @@
 """Analysis API routes."""
 
 import asyncio
-from typing import Dict, Any
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from ..models.schemas import AnalysisRequest, AnalysisResponse, ReportResponse
+from ..models.schemas import AnalysisRequest, AnalysisResponse, BatchAnalysisRequest, ReportResponse
+from ...utils.analysis_store import (
+    analysis_store,
+    decode_cursor,
+    AnalysisStore,
+    DEFAULT_LIST_FIELDS,
+    LISTABLE_FIELDS
+)
+from ...utils.jobs import AnalysisJob, JobQueue, QueueFullError, process_executor
+from ...utils.metrics import metrics_registry
+from ...utils.portfolio import normalize_symbol, portfolio_key
+from ...utils.progress import progress_broker, TERMINAL_EVENTS, TRANSIENT_EVENTS
 from ...utils.workflow import InvestmentWorkflow
 from ...config.settings import settings
 
 router = APIRouter(prefix="/api/v1", tags=["analysis"])
 
-# Store for analysis results (in production, use a proper database)
-analysis_store: Dict[str, Dict[str, Any]] = {}
-
 # Initialize workflow
 workflow = InvestmentWorkflow()
 
 
-async def run_analysis_background(analysis_id: str, companies: str, message: str):
-    """Run analysis in background and store results."""
+async def run_analysis_job(job: AnalysisJob):
+    """Run a queued analysis and store results under every request coalesced into it."""
+    record = await analysis_store.aget(job.analysis_id) or {}
+    for analysis_id in job.analysis_ids():
+        current = record if analysis_id == job.analysis_id else await analysis_store.aget(analysis_id) or {}
+        await analysis_store.asave(analysis_id, {
+            **current,
+            "status": "running",
+            "message": "Analysis in progress..."
+        })
+    
+    def publish(event: str, data: Dict[str, Any]) -> None:
+        # Requests that join while the job runs receive the events from then on
+        for analysis_id in job.analysis_ids():
+            progress_broker.publish(analysis_id, event, data)
+    
     try:
-        result = await workflow.execute_analysis(companies, message)
-        analysis_store[analysis_id] = result
+        if settings.JOB_EXECUTOR == "process":
+            # Intermediate events only cross the process boundary through a shared progress backend
+            progress_ids = job.analysis_ids() if progress_broker.shared else None
+            result = await process_executor.execute(job, progress_ids=progress_ids)
+            # Neither can the worker's metrics, so they are replayed from the record
+            metrics_registry.observe_analysis(result)
+        else:
+            result = await workflow.execute_analysis(**job.workflow_kwargs(), on_progress=publish)
     except Exception as e:
-        analysis_store[analysis_id] = {
-            "analysis_id": analysis_id,
+        result = {
+            "analysis_id": job.analysis_id,
+            "timestamp": record.get("timestamp"),
             "status": "failed",
             "error": str(e),
-            "companies": companies
+            "companies": job.companies
         }
+    
+    # No request can join once the result is being handed out
+    analysis_ids = job.close()
+    
+    # Persist before announcing so subscribers that refetch see the final record
+    await analysis_store.asave(job.analysis_id, result)
+    for alias in analysis_ids[1:]:
+        current = await analysis_store.aget(alias) or {}
+        await analysis_store.asave(alias, {
+            **result,
+            "analysis_id": alias,
+            "timestamp": current.get("timestamp", result.get("timestamp")),
+            "coalesced_with": job.analysis_id
+        })
+    for analysis_id in analysis_ids:
+        progress_broker.publish(analysis_id, result.get("status", "failed"), {"error": result.get("error")})
 
 
-@router.post("/analyze", response_model=AnalysisResponse)
-async def start_analysis(
+# Bounded worker pool that drains queued analyses
+job_queue = JobQueue(
+    runner=run_analysis_job,
+    workers=settings.JOB_WORKERS,
+    max_depth=settings.JOB_QUEUE_MAX_DEPTH
+)
+
+# Error recorded for analyses that were queued or running when the server stopped
+INTERRUPTED_ERROR = "Analysis was interrupted by a server restart"
+
+
+async def fail_interrupted(analysis_ids: List[str]) -> None:
+    """Mark analyses that will never finish as failed and end their event streams."""
+    for analysis_id in analysis_ids:
+        record = await analysis_store.aget(analysis_id)
+        if record is None or record.get("status") in TERMINAL_EVENTS:
+            continue
+        await analysis_store.asave(analysis_id, {**record, "status": "failed", "error": INTERRUPTED_ERROR})
+        progress_broker.publish(analysis_id, "failed", {"error": INTERRUPTED_ERROR})
+
+
+async def recover_interrupted() -> None:
+    """Fail the analyses a previous server process left queued or running.
+    
+    Skipped with several workers, since another worker may still be running them.
+    """
+    if settings.API_WORKERS > 1:
+        return
+    analysis_ids = []
+    for status in ("queued", "running"):
+        async for record in analysis_store.iter_query(status=status, fields=("analysis_id",)):
+            analysis_ids.append(record["analysis_id"])
+    await fail_interrupted(analysis_ids)
+
+
+async def enqueue_analysis(
     request: AnalysisRequest,
-    background_tasks: BackgroundTasks
-) -> AnalysisResponse:
-    """Start investment analysis for given companies."""
+    reserved: bool = False
+) -> Tuple[str, Optional[int], Optional[str]]:
+    """Record a queued analysis and hand it to the worker pool.
     
-    # Validate settings
-    try:
-        settings.validate()
-    except ValueError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    An identical analysis that is already queued or running is joined instead of
+    started again. With ``reserved``, a started analysis takes a queue slot held
+    by ``job_queue.reserve``. Returns the new analysis id, its queue position
+    (None once running) and the id of the joined analysis, if any.
+    """
     
     # Generate analysis ID
     import uuid
     analysis_id = str(uuid.uuid4())
     
+    key = None
+    if settings.COALESCE_ENABLED:
+        key = workflow.analysis_key(request.companies, request.message, request.per_ticker)
+        leader = job_queue.find(key)
+        if leader is not None:
+            # The record is written before joining so the shared result cannot be overwritten
+            position = job_queue.position(leader.analysis_id)
+            await analysis_store.asave(analysis_id, {
+                "analysis_id": analysis_id,
+                "timestamp": datetime.now().isoformat(),
+                "status": "queued" if position is not None else "running",
+                "companies": request.companies,
+                "message": f"Joined identical analysis {leader.analysis_id}",
+                "coalesced_with": leader.analysis_id
+            })
+            if job_queue.join(leader, analysis_id):
+                progress_broker.publish(analysis_id, "queued", {
+                    "queue_position": position,
+                    "coalesced_with": leader.analysis_id
+                })
+                # Catch up on the progress the shared analysis has already made
+                await progress_broker.copy_history(leader.analysis_id, analysis_id, skip=("queued",))
+                return analysis_id, position, leader.analysis_id
+            # The leader finished meanwhile, so this request runs on its own
+    
     # Initialize analysis in store
-    analysis_store[analysis_id] = {
+    await analysis_store.asave(analysis_id, {
         "analysis_id": analysis_id,
-        "status": "running",
+        "timestamp": datetime.now().isoformat(),
+        "status": "queued",
         "companies": request.companies,
-        "message": "Analysis in progress..."
-    }
+        "message": "Analysis is waiting in the queue..."
+    })
     
-    # Start background analysis
-    background_tasks.add_task(
-        run_analysis_background,
-        analysis_id,
-        request.companies,
-        request.message
-    )
+    # Hand the analysis to the bounded worker pool
+    try:
+        position = await job_queue.submit(
+            analysis_id,
+            request.companies,
+            request.message,
+            per_ticker=request.per_ticker,
+            priority=request.priority,
+            key=key,
+            reserved=reserved
+        )
+    except QueueFullError as e:
+        await analysis_store.adelete(analysis_id)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    progress_broker.publish(analysis_id, "queued", {"queue_position": position})
+    return analysis_id, position, None
+
+
+async def wait_for_analysis(analysis_id: str) -> Dict[str, Any]:
+    """Wait until an analysis finishes and return its stored record."""
+    async for message in progress_broker.subscribe(analysis_id, heartbeat=settings.SSE_HEARTBEAT):
+        if message is not None and message["event"] in TERMINAL_EVENTS:
+            break
+        if message is None:
+            # Idle: the job may have finished somewhere without publishing here
+            record = await analysis_store.aget(analysis_id) or {}
+            if record.get("status") in TERMINAL_EVENTS:
+                return record
+    return await analysis_store.aget(analysis_id) or {}
+
+
+@router.post("/analyze", response_model=AnalysisResponse)
+async def start_analysis(request: AnalysisRequest) -> AnalysisResponse:
+    """Start investment analysis for given companies."""
     
+    # Validate settings
+    try:
+        settings.validate()
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    analysis_id, position, coalesced_with = await enqueue_analysis(request)
+    
+    if coalesced_with is not None:
+        message = (
+            f"An identical investment analysis ({coalesced_with}) is already in progress; "
+            "this analysis shares its result. Use the analysis_id to check progress."
+        )
+    else:
+        message = f"Investment analysis has been queued at position {position}. Use the analysis_id to check progress."
     return AnalysisResponse(
         analysis_id=analysis_id,
-        status="started",
-        message="Investment analysis has been started. Use the analysis_id to check progress.",
+        status="queued",
+        message=message,
         companies=request.companies
     )
 
 
+@router.post("/analyze/batch")
+async def start_batch_analysis(request: BatchAnalysisRequest):
+    """Queue several portfolios at once and stream each result as NDJSON when it completes."""
+    
+    try:
+        settings.validate()
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    count = len(request.portfolios)
+    if count > settings.BATCH_MAX_PORTFOLIOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can contain at most {settings.BATCH_MAX_PORTFOLIOS} portfolios"
+        )
+    # Accept the whole batch or none of it: the slots are held before the first await
+    try:
+        job_queue.reserve(count)
+    except QueueFullError:
+        raise HTTPException(
+            status_code=429,
+            detail="Analysis queue cannot take the whole batch",
+            headers={"Retry-After": "30"}
+        )
+    
+    queued = []
+    try:
+        for portfolio in request.portfolios:
+            analysis_id, position, coalesced_with = await enqueue_analysis(portfolio, reserved=True)
+            queued.append({
+                "analysis_id": analysis_id,
+                "companies": portfolio.companies,
+                "queue_position": position,
+                "coalesced_with": coalesced_with
+            })
+    finally:
+        # Coalesced portfolios, and any left after a failure, never took their slot
+        job_queue.release(count - sum(1 for item in queued if item["coalesced_with"] is None))
+    
+    async def generate_results():
+        yield json.dumps({"event": "queued", "analyses": queued}) + "\n"
+        
+        async def finished(analysis_id: str) -> Tuple[str, Dict[str, Any]]:
+            return analysis_id, await wait_for_analysis(analysis_id)
+        
+        # The job workers run the portfolios as overlapping pipelines
+        tasks = [asyncio.create_task(finished(item["analysis_id"])) for item in queued]
+        try:
+            for task in asyncio.as_completed(tasks):
+                analysis_id, record = await task
+                result = AnalysisStore.project(analysis_id, record, LISTABLE_FIELDS)
+                yield json.dumps({"event": record.get("status", "failed"), **result}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(generate_results(), media_type="application/x-ndjson")
+
+
 @router.get("/analysis/{analysis_id}", response_model=ReportResponse)
 async def get_analysis_result(analysis_id: str) -> ReportResponse:
     """Get analysis results by analysis ID."""
     
-    if analysis_id not in analysis_store:
+    result = await analysis_store.aget(analysis_id)
+    if result is None:
         raise HTTPException(status_code=404, detail="Analysis not found")
     
-    result = analysis_store[analysis_id]
-    
     return ReportResponse(
         analysis_id=analysis_id,
         status=result.get("status", "unknown"),
         reports=result.get("reports"),
-        summary=result.get("summary")
+        summary=result.get("summary"),
+        queue_position=job_queue.position(analysis_id),
+        metrics=result.get("metrics")
+    )
+
+
+def _format_sse(message: Dict[str, Any]) -> str:
+    """Render a progress message as a server-sent event."""
+    payload = {**message["data"], "time": message["time"]}
+    return f"event: {message['event']}\ndata: {json.dumps(payload)}\n\n"
+
+
+@router.get("/analysis/{analysis_id}/events")
+async def stream_analysis_events(
+    analysis_id: str,
+    tokens: bool = Query(True, description="Include streamed response text as 'token' events")
+):
+    """Push progress events for an analysis as server-sent events."""
+    
+    record = await analysis_store.aget(analysis_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    async def generate_events():
+        status = record.get("status")
+        if status in TERMINAL_EVENTS and not await progress_broker.has_history(analysis_id):
+            yield _format_sse({"event": status, "data": {"error": record.get("error")}, "time": 0})
+            return
+        
+        async for message in progress_broker.subscribe(analysis_id, heartbeat=settings.SSE_HEARTBEAT):
+            if message is not None:
+                if tokens or message["event"] not in TRANSIENT_EVENTS:
+                    yield _format_sse(message)
+                continue
+            
+            # Idle: the job may have finished somewhere without publishing here
+            current = await analysis_store.aget(analysis_id) or {}
+            if current.get("status") in TERMINAL_EVENTS:
+                yield _format_sse({
+                    "event": current["status"],
+                    "data": {"error": current.get("error")},
+                    "time": 0
+                })
+                return
+            yield ": keep-alive\n\n"
+    
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
 @router.get("/analysis")
-async def list_analyses():
-    """List all analyses."""
-    return {
-        "analyses": [
-            {
-                "analysis_id": aid,
-                "status": data.get("status"),
-                "companies": data.get("companies"),
-                "timestamp": data.get("timestamp")
-            }
-            for aid, data in analysis_store.items()
-        ]
+async def list_analyses(
+    request: Request,
+    status: Optional[str] = Query(None, description="Only analyses with this status"),
+    ticker: Optional[str] = Query(None, description="Only analyses that include this symbol"),
+    portfolio: Optional[str] = Query(None, description="Only analyses of exactly these comma-separated symbols, in any order"),
+    since: Optional[datetime] = Query(None, description="Only analyses created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only analyses created before this time"),
+    cursor: Optional[str] = Query(None, description="Cursor returned by the previous page"),
+    limit: int = Query(50, ge=1, le=500, description="Page size"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    format: Optional[str] = Query(None, description="Set to 'ndjson' to stream every match")
+):
+    """List analyses with cursor pagination, filtering and field projection."""
+    
+    selected = tuple(field.strip() for field in fields.split(",") if field.strip()) if fields else DEFAULT_LIST_FIELDS
+    unknown = [field for field in selected if field not in LISTABLE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    filters = {
+        "status": status,
+        "ticker": normalize_symbol(ticker) if ticker else None,
+        "portfolio": portfolio_key(portfolio) if portfolio else None,
+        "since": since.timestamp() if since else None,
+        "until": until.timestamp() if until else None,
+        "cursor": cursor,
+        "fields": selected
     }
+    
+    # Stream the full result set as NDJSON without materializing it
+    wants_ndjson = format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "")
+    if wants_ndjson:
+        async def generate_lines():
+            async for item in analysis_store.iter_query(batch_size=limit, **filters):
+                yield json.dumps(item) + "\n"
+        
+        return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+    
+    items, next_cursor = await analysis_store.aquery(limit=limit, **filters)
+    return {"analyses": items, "next_cursor": next_cursor}
 
 
 @router.delete("/analysis/{analysis_id}")
 async def delete_analysis(analysis_id: str):
     """Delete analysis results."""
     
-    if analysis_id not in analysis_store:
+    if not await analysis_store.adelete(analysis_id):
         raise HTTPException(status_code=404, detail="Analysis not found")
     
-    del analysis_store[analysis_id]
-    
     return {"message": f"Analysis {analysis_id} deleted successfully"}
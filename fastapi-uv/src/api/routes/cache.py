@@ -0,0 +1,24 @@
+"""Cache inspection API routes."""
+
+from fastapi import APIRouter
+
+from ...utils.cache import llm_cache, search_cache
+
+router = APIRouter(prefix="/api/v1", tags=["cache"])
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Return hit and miss counters for the LLM response and search caches."""
+    return {
+        "llm_responses": llm_cache.stats(),
+        "search_results": search_cache.stats()
+    }
+
+
+@router.delete("/cache")
+async def clear_cache():
+    """Drop all cached LLM responses and search results."""
+    llm_cache.clear()
+    search_cache.clear()
+    return {"message": "Cache cleared successfully"}
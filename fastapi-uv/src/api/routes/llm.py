@@ -0,0 +1,28 @@
+"""LLM client inspection API routes."""
+
+from fastapi import APIRouter
+
+from ...config.settings import settings
+from ...utils.coalesce import llm_flight, search_flight
+from ...utils.rate_limiter import rate_limiter
+from ...utils.resilience import llm_resilience, search_resilience
+
+router = APIRouter(prefix="/api/v1", tags=["llm"])
+
+
+@router.get("/llm/stats")
+async def get_llm_stats():
+    """Return per-model rate limit budgets, saturation, retry/hedge and coalescing counters."""
+    return {
+        "rate_limit_enabled": settings.LLM_RATE_LIMIT_ENABLED,
+        "max_concurrency": settings.LLM_MAX_CONCURRENCY,
+        "rate_limits": rate_limiter.stats(),
+        "resilience": {
+            "llm": llm_resilience.stats(),
+            "search": search_resilience.stats()
+        },
+        "coalescing": {
+            "llm": llm_flight.stats(),
+            "search": search_flight.stats()
+        }
+    }
@@ -0,0 +1,19 @@
+"""Prometheus metrics API routes."""
+
+from fastapi import APIRouter, Response
+
+from ...utils.metrics import metrics_registry
+from ...utils.rate_limiter import rate_limiter
+
+router = APIRouter(prefix="/api/v1", tags=["metrics"])
+
+
+@router.get("/metrics")
+async def get_metrics() -> Response:
+    """Return stage, LLM call, token and cost metrics in the Prometheus text format."""
+    for model, stats in rate_limiter.stats().items():
+        metrics_registry.rate_limit_saturation.set(stats["saturation"], model=model)
+    return Response(
+        content=metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,174 @@
+"""Report content API routes."""
+
+import asyncio
+import gzip
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from ...utils.analysis_store import analysis_store
+from ...utils.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional (the "compression" extra); gzip is always available
+    brotli = None
+
+router = APIRouter(prefix="/api/v1", tags=["reports"])
+
+# Report kinds that can be requested, with their media types
+REPORT_MEDIA_TYPES = {
+    "stock_analysis": "text/markdown; charset=utf-8",
+    "research_analysis": "text/markdown; charset=utf-8",
+    "portfolio_strategy": "text/markdown; charset=utf-8",
+    "archive": "application/zip"
+}
+
+# Reports are immutable once written, so encoded bodies are kept by ETag
+_encoded_bodies = LRUCache(max_entries=256)
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _entity_tag(stat: os.stat_result) -> str:
+    """Derive a strong ETag from the file's size and modification time."""
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported content coding the client accepts."""
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in accept_encoding.split(",")
+        if part.strip() and not part.replace(" ", "").endswith(";q=0")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive offsets; None if unsatisfiable."""
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+
+def _not_modified(request: Request, etag: str, stat: os.stat_result) -> bool:
+    """Evaluate If-None-Match, falling back to If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _read_slice(path: Path, start: int, length: int) -> bytes:
+    """Read ``length`` bytes of a file from ``start``."""
+    with path.open("rb") as file:
+        file.seek(start)
+        return file.read(length)
+
+
+def _encode(body: bytes, encoding: str) -> bytes:
+    """Compress a report body with the chosen content coding."""
+    if encoding == "br":
+        return brotli.compress(body)
+    return gzip.compress(body, compresslevel=6)
+
+
+@router.get("/analysis/{analysis_id}/reports/{kind}")
+async def get_report(analysis_id: str, kind: str, request: Request) -> Response:
+    """Serve one report of an analysis with conditional, compressed and range requests."""
+    
+    if kind not in REPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=404, detail=f"Unknown report kind: {kind}")
+    record = await analysis_store.aget(analysis_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    report_path = (record.get("reports") or {}).get(kind)
+    if not report_path:
+        raise HTTPException(status_code=404, detail="Report not available")
+    
+    path = Path(report_path)
+    try:
+        stat = await asyncio.to_thread(path.stat)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Report file not found")
+    
+    media_type = REPORT_MEDIA_TYPES[kind]
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    file_etag = _entity_tag(stat)
+    use_range = bool(range_header) and (if_range is None or if_range == file_etag)
+    
+    # Byte ranges address the stored file, so they are served uncompressed
+    encoding = None
+    if not use_range and kind != "archive":
+        encoding = _choose_encoding(request.headers.get("accept-encoding", ""))
+    # Each representation gets its own validator
+    etag = file_etag if encoding is None else f'{file_etag[:-1]}-{encoding}"'
+    
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": "private, no-cache",
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding"
+    }
+    if _not_modified(request, etag, stat):
+        return Response(status_code=304, headers=headers)
+    
+    if use_range:
+        # Only the requested bytes are read
+        byte_range = _parse_range(range_header, stat.st_size)
+        if byte_range is None:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{stat.st_size}"}
+            )
+        start, end = byte_range
+        return Response(
+            content=await asyncio.to_thread(_read_slice, path, start, end - start + 1),
+            status_code=206,
+            media_type=media_type,
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{stat.st_size}"}
+        )
+    
+    if encoding is not None:
+        # The ETag comes from the stat, so a cached body is served without reading the file
+        cache_key = f"{report_path}|{etag}"
+        body = _encoded_bodies.get(cache_key)
+        if body is None:
+            content = await asyncio.to_thread(path.read_bytes)
+            body = await asyncio.to_thread(_encode, content, encoding)
+            _encoded_bodies.set(cache_key, body)
+        headers["Content-Encoding"] = encoding
+    else:
+        body = await asyncio.to_thread(path.read_bytes)
+    
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -1,7 +1,16 @@
 """Configuration settings for the Investment Report Generator."""
 
 import os
-from typing import Optional
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Relative data paths are resolved here, so files never land in the working directory
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def project_path(path: str) -> str:
+    """Resolve a relative path against the project root; empty paths stay empty."""
+    return str(PROJECT_ROOT / path) if path else path
 
 
 class Settings:
@@ -9,27 +18,180 @@ class Settings:
     
     # API Configuration
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
+    # Point at any OpenAI-compatible server, e.g. the benchmark mock
+    OPENAI_BASE_URL: Optional[str] = os.getenv("OPENAI_BASE_URL") or None
     
     # Application Configuration
     APP_NAME: str = os.getenv("APP_NAME", "Investment Report Generator")
     APP_VERSION: str = os.getenv("APP_VERSION", "0.1.0")
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
     
-    # API Configuration
+    # LLM Client Configuration
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "120"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    
+    # LLM Rate Limit Configuration (overrides are "model=rpm:tpm,...")
+    LLM_RATE_LIMIT_ENABLED: bool = os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() == "true"
+    LLM_REQUESTS_PER_MINUTE: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+    LLM_TOKENS_PER_MINUTE: float = float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+    LLM_RATE_LIMIT_OVERRIDES: Dict[str, Tuple[float, float]] = {
+        model.strip(): (float(limits.partition(":")[0]), float(limits.partition(":")[2]))
+        for model, _, limits in (
+            item.partition("=") for item in os.getenv("LLM_RATE_LIMIT_OVERRIDES", "").split(",")
+        )
+        if model.strip() and ":" in limits
+    }
+    LLM_RATE_LIMIT_RETRIES: int = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "3"))
+    LLM_RATE_LIMIT_BACKOFF: float = float(os.getenv("LLM_RATE_LIMIT_BACKOFF", "5"))
+    
+    # Retry and Hedging Configuration (hedges fire after the HEDGE_QUANTILE latency)
+    LLM_RETRIES: int = int(os.getenv("LLM_RETRIES", "2"))
+    LLM_CALL_DEADLINE: float = float(os.getenv("LLM_CALL_DEADLINE", "90"))
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    SEARCH_RETRIES: int = int(os.getenv("SEARCH_RETRIES", "2"))
+    SEARCH_HEDGE_ENABLED: bool = os.getenv("SEARCH_HEDGE_ENABLED", "false").lower() == "true"
+    RETRY_BASE_DELAY: float = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+    RETRY_MAX_DELAY: float = float(os.getenv("RETRY_MAX_DELAY", "8"))
+    HEDGE_QUANTILE: float = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+    HEDGE_MIN_SAMPLES: int = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+    
+    # LLM Pricing for cost metrics (US dollars per million tokens, "model=input:output,...")
+    LLM_PRICING: Dict[str, Tuple[float, float]] = {
+        model.strip(): (float(prices.partition(":")[0]), float(prices.partition(":")[2]))
+        for model, _, prices in (
+            item.partition("=") for item in os.getenv("LLM_PRICING", "gpt-4o-mini=0.15:0.60").split(",")
+        )
+        if model.strip() and ":" in prices
+    }
+    
+    # LLM Response Cache Configuration
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+    LLM_CACHE_DISK_PATH: str = project_path(os.getenv("LLM_CACHE_DISK_PATH", ""))
+    LLM_CACHE_DEFAULT_TTL: float = float(os.getenv("LLM_CACHE_DEFAULT_TTL", "3600"))
+    LLM_CACHE_TTLS: Dict[str, float] = {
+        "stock_analysis": float(os.getenv("LLM_CACHE_TTL_STOCK_ANALYSIS", "1800")),
+        "investment_ranking": float(os.getenv("LLM_CACHE_TTL_INVESTMENT_RANKING", "3600")),
+        "portfolio_allocation": float(os.getenv("LLM_CACHE_TTL_PORTFOLIO_ALLOCATION", "3600")),
+    }
+    
+    # Structured Output Configuration
+    STRUCTURED_OUTPUT: bool = os.getenv("STRUCTURED_OUTPUT", "true").lower() == "true"
+    STRUCTURED_OUTPUT_REPAIR_ATTEMPTS: int = int(os.getenv("STRUCTURED_OUTPUT_REPAIR_ATTEMPTS", "1"))
+    
+    # Context Budget Configuration (prompt tokens of the results passed to Phases 2 and 3)
+    CONTEXT_BUDGET_ENABLED: bool = os.getenv("CONTEXT_BUDGET_ENABLED", "true").lower() == "true"
+    PHASE2_CONTEXT_TOKENS: int = int(os.getenv("PHASE2_CONTEXT_TOKENS", "3000"))
+    PHASE3_CONTEXT_TOKENS: int = int(os.getenv("PHASE3_CONTEXT_TOKENS", "2000"))
+    
+    # Portfolio Validation Configuration (one symbol per line or CSV with the symbol first; empty checks the format only)
+    SYMBOL_TABLE_PATH: str = os.getenv("SYMBOL_TABLE_PATH", "")
+    
+    # Web Search Configuration (SEARCH_BACKEND is "duckduckgo" or "mock")
+    SEARCH_BACKEND: str = os.getenv("SEARCH_BACKEND", "duckduckgo").lower()
+    SEARCH_MOCK_LATENCY: float = float(os.getenv("SEARCH_MOCK_LATENCY", "0.05"))
+    SEARCH_CONCURRENCY: int = int(os.getenv("SEARCH_CONCURRENCY", "5"))
+    SEARCH_TIMEOUT: float = float(os.getenv("SEARCH_TIMEOUT", "10"))
+    SEARCH_QUERY_TEMPLATE: str = os.getenv(
+        "SEARCH_QUERY_TEMPLATE", "{company} stock analysis financial metrics 2024"
+    )
+    SEARCH_MAX_RESULTS: int = int(os.getenv("SEARCH_MAX_RESULTS", "6"))
+    
+    # Snippet Processing Configuration (results kept per ticker after near-dedupe and ranking)
+    SNIPPET_PROCESSING_ENABLED: bool = os.getenv("SNIPPET_PROCESSING_ENABLED", "true").lower() == "true"
+    SNIPPET_TOP_K: int = int(os.getenv("SNIPPET_TOP_K", "3"))
+    SNIPPET_CHAR_BUDGET: int = int(os.getenv("SNIPPET_CHAR_BUDGET", "1200"))
+    SNIPPET_SIMILARITY_THRESHOLD: float = float(os.getenv("SNIPPET_SIMILARITY_THRESHOLD", "0.6"))
+    
+    # Search Cache Configuration
+    SEARCH_CACHE_ENABLED: bool = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+    SEARCH_CACHE_TTL: float = float(os.getenv("SEARCH_CACHE_TTL", "900"))
+    SEARCH_CACHE_TTL_OVERRIDES: Dict[str, float] = {
+        symbol.strip().upper(): float(ttl)
+        for symbol, _, ttl in (
+            item.partition("=") for item in os.getenv("SEARCH_CACHE_TTL_OVERRIDES", "").split(",")
+        )
+        if symbol.strip() and ttl
+    }
+    SEARCH_CACHE_MAX_ENTRIES: int = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+    SEARCH_CACHE_PATH: str = project_path(os.getenv("SEARCH_CACHE_PATH", "cache/search_cache.sqlite"))
+    
+    # Phase 1 Fan-out Configuration ("batch", "per_ticker" or "auto")
+    PHASE1_MODE: str = os.getenv("PHASE1_MODE", "auto").lower()
+    PHASE1_FAN_OUT_MIN_TICKERS: int = int(os.getenv("PHASE1_FAN_OUT_MIN_TICKERS", "4"))
+    PHASE1_CONCURRENCY: int = int(os.getenv("PHASE1_CONCURRENCY", "8"))
+    
+    # Per-ticker Analysis Store Configuration
+    TICKER_STORE_ENABLED: bool = os.getenv("TICKER_STORE_ENABLED", "true").lower() == "true"
+    TICKER_STORE_PATH: str = project_path(os.getenv("TICKER_STORE_PATH", "cache/ticker_analyses.sqlite"))
+    TICKER_STORE_MAX_AGE: float = float(os.getenv("TICKER_STORE_MAX_AGE", "21600"))
+    
+    # Analysis Store Configuration ("sqlite" or "memory")
+    ANALYSIS_STORE_BACKEND: str = os.getenv("ANALYSIS_STORE_BACKEND", "sqlite").lower()
+    ANALYSIS_STORE_PATH: str = project_path(os.getenv("ANALYSIS_STORE_PATH", "data/analyses.sqlite"))
+    ANALYSIS_RETENTION_DAYS: float = float(os.getenv("ANALYSIS_RETENTION_DAYS", "30"))
+    ANALYSIS_MAX_RECORDS: int = int(os.getenv("ANALYSIS_MAX_RECORDS", "10000"))
+    # Queued or running records older than this were left behind by a crash and may be evicted
+    ANALYSIS_ABANDONED_HOURS: float = float(os.getenv("ANALYSIS_ABANDONED_HOURS", "24"))
+    ANALYSIS_HOT_CACHE_SIZE: int = int(os.getenv("ANALYSIS_HOT_CACHE_SIZE", "256"))
+    
+    # Job Queue Configuration (JOB_EXECUTOR is "inline" or "process")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_QUEUE_MAX_DEPTH: int = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "100"))
+    JOB_EXECUTOR: str = os.getenv("JOB_EXECUTOR", "inline").lower()
+    
+    # Request Coalescing Configuration (identical in-flight analyses, LLM calls and searches run once)
+    COALESCE_ENABLED: bool = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+    
+    # Batch Analysis Configuration
+    BATCH_MAX_PORTFOLIOS: int = int(os.getenv("BATCH_MAX_PORTFOLIOS", "50"))
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "8"))
+    
+    # API Configuration (API_WORKERS > 1 runs several server processes sharing state through SQLite)
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("API_PORT", "8001"))
+    API_WORKERS: int = max(int(os.getenv("API_WORKERS", os.getenv("WEB_CONCURRENCY", "1"))), 1)
+    # Processes that call the LLM, each with an equal share of the rate limits and concurrency
+    LLM_BUDGET_SHARES: int = API_WORKERS * (max(JOB_WORKERS, 1) if JOB_EXECUTOR == "process" else 1)
+    
+    # Progress Stream Configuration (PROGRESS_BACKEND is "memory" or "sqlite"; multi-worker mode needs "sqlite")
+    SSE_HEARTBEAT: float = float(os.getenv("SSE_HEARTBEAT", "15"))
+    STREAM_TOKENS: bool = os.getenv("STREAM_TOKENS", "true").lower() == "true"
+    PROGRESS_BACKEND: str = os.getenv("PROGRESS_BACKEND", "sqlite" if API_WORKERS > 1 else "memory").lower()
+    PROGRESS_STORE_PATH: str = project_path(os.getenv("PROGRESS_STORE_PATH", "data/progress.sqlite"))
+    PROGRESS_POLL_INTERVAL: float = float(os.getenv("PROGRESS_POLL_INTERVAL", "0.2"))
+    # Undelivered token events held per SSE client before further deltas are merged or dropped
+    PROGRESS_TOKEN_BACKLOG: int = int(os.getenv("PROGRESS_TOKEN_BACKLOG", "1000"))
+    # Seconds without events after which an unfinished analysis's replay history is dropped
+    PROGRESS_HISTORY_MAX_IDLE: float = float(os.getenv("PROGRESS_HISTORY_MAX_IDLE", "3600"))
     
     # Streamlit Configuration
     STREAMLIT_PORT: int = int(os.getenv("STREAMLIT_PORT", "8501"))
     
     # Reports Configuration
     REPORTS_DIR: str = "reports"
+    REPORTS_FSYNC: bool = os.getenv("REPORTS_FSYNC", "true").lower() == "true"
+    REPORTS_ARCHIVE: bool = os.getenv("REPORTS_ARCHIVE", "false").lower() == "true"
+    REPORTS_WRITER_THREADS: int = int(os.getenv("REPORTS_WRITER_THREADS", "2"))
     
     @classmethod
     def validate(cls) -> None:
         """Validate required settings."""
         if not cls.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY environment variable is required")
+    
+    @classmethod
+    def validate_workers(cls) -> None:
+        """Validate that job state is shared when several API workers run."""
+        if cls.API_WORKERS <= 1:
+            return
+        if cls.ANALYSIS_STORE_BACKEND != "sqlite":
+            raise ValueError("API_WORKERS > 1 requires ANALYSIS_STORE_BACKEND=sqlite")
+        if cls.PROGRESS_BACKEND != "sqlite":
+            raise ValueError("API_WORKERS > 1 requires PROGRESS_BACKEND=sqlite")
 
 
 # Global settings instance
@@ -4,7 +4,6 @@ import streamlit as st
 import requests
 import time
 import json
-from pathlib import Path
 from typing import Dict, Any, Optional
 
 # Page configuration
@@ -17,7 +16,6 @@ st.set_page_config(
 
 # Configuration
 API_BASE_URL = "http://localhost:8001/api/v1"
-REPORTS_DIR = Path("reports")
 
 # Custom CSS
 st.markdown("""
@@ -222,18 +220,116 @@ def get_analysis_result(analysis_id: str) -> Optional[Dict[str, Any]]:
         return None
 
 
-def display_report_content(file_path: str) -> None:
-    """Display report content from file."""
+PHASE_LABELS = {
+    "stock_analysis": "📊 Stock analysis",
+    "investment_ranking": "🏆 Investment ranking",
+    "portfolio_allocation": "💼 Portfolio strategy"
+}
+
+
+def stream_progress_events(analysis_id: str):
+    """Yield (event, data) pairs from the analysis progress stream."""
+    with requests.get(
+        f"{API_BASE_URL}/analysis/{analysis_id}/events",
+        stream=True,
+        timeout=(5, 60)
+    ) as response:
+        response.raise_for_status()
+        event = "message"
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[len("data:"):])
+                event = "message"
+
+
+def render_live_text(phase: str, texts: Dict[str, str]) -> str:
+    """Build the Markdown shown while a phase's response is still streaming."""
+    title = f"#### {PHASE_LABELS.get(phase, phase)}"
+    
+    def body(text: str) -> str:
+        # Structured output arrives as JSON until the phase completes
+        return f"```json\n{text}\n```" if text.lstrip().startswith("{") else text
+    
+    if list(texts) == [""]:
+        return f"{title}\n\n{body(texts[''])}"
+    sections = [f"##### {ticker}\n\n{body(text)}" for ticker, text in texts.items()]
+    return "\n\n".join([title] + sections)
+
+
+def follow_analysis_progress(analysis_id: str, initial_status: str) -> None:
+    """Render pushed progress and streamed report text until the analysis finishes."""
+    status_box = st.empty()
+    progress_bar = st.progress(0)
+    live_box = st.empty()
+    live_phase = None
+    live_texts: Dict[str, str] = {}
+    last_render = 0.0
+    
+    def show(text: str) -> None:
+        status_box.markdown(f'<div class="status-box status-running">{text} (ID: {analysis_id})</div>', unsafe_allow_html=True)
+    
+    show("⏳ Analysis queued..." if initial_status == "queued" else "🔄 Analysis in progress...")
+    
     try:
-        path = Path(file_path)
-        if path.exists():
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            st.markdown(content)
-        else:
-            st.warning(f"Report file not found: {file_path}")
-    except Exception as e:
-        st.error(f"Error reading report: {str(e)}")
+        for event, data in stream_progress_events(analysis_id):
+            if event == "queued" and data.get("queue_position"):
+                show(f"⏳ Analysis queued at position {data['queue_position']}...")
+            elif event == "started":
+                show("🔄 Analysis started...")
+            elif event == "phase_started":
+                show(f"🔄 {PHASE_LABELS.get(data.get('phase'), data.get('phase'))} in progress... (step {data.get('step')}/{data.get('total')})")
+            elif event == "phase_completed":
+                progress_bar.progress(data.get("step", 0) / max(data.get("total", 1), 1))
+            elif event == "token":
+                if data.get("phase") != live_phase:
+                    live_phase, live_texts = data.get("phase"), {}
+                ticker = data.get("ticker") or ""
+                live_texts[ticker] = live_texts.get(ticker, "") + data.get("delta", "")
+                # Re-render at most a few times per second
+                if time.time() - last_render > 0.25:
+                    live_box.markdown(render_live_text(live_phase, live_texts))
+                    last_render = time.time()
+            elif event in ("completed", "failed"):
+                break
+    except Exception:
+        # Fall back to polling if the progress stream is unavailable
+        time.sleep(2)
+
+
+def fetch_report(analysis_id: str, kind: str) -> Optional[str]:
+    """Fetch report content from the API, revalidating a session-local copy by ETag."""
+    cache = st.session_state.setdefault("report_cache", {})
+    cached = cache.get((analysis_id, kind))
+    headers = {"If-None-Match": cached["etag"]} if cached else {}
+    
+    try:
+        response = requests.get(
+            f"{API_BASE_URL}/analysis/{analysis_id}/reports/{kind}",
+            headers=headers,
+            timeout=10
+        )
+    except Exception:
+        return cached["content"] if cached else None
+    
+    if response.status_code == 304 and cached:
+        return cached["content"]
+    if response.status_code != 200:
+        return None
+    
+    response.encoding = "utf-8"
+    cache[(analysis_id, kind)] = {"etag": response.headers.get("ETag"), "content": response.text}
+    return response.text
+
+
+def display_report_content(analysis_id: str, kind: str) -> None:
+    """Display report content served by the API."""
+    content = fetch_report(analysis_id, kind)
+    if content is not None:
+        st.markdown(content)
+    else:
+        st.warning(f"Report not available: {kind}")
 
 
 def main():
@@ -343,11 +439,9 @@ def main():
             if result:
                 status = result.get("status", "unknown")
                 
-                if status == "running":
-                    st.markdown(f'<div class="status-box status-running">🔄 Analysis in progress... (ID: {analysis_id})</div>', unsafe_allow_html=True)
-                    
-                    # Auto-refresh every 5 seconds
-                    time.sleep(2)
+                if status in ("queued", "running"):
+                    # Wait on the pushed progress stream, then render the final state
+                    follow_analysis_progress(analysis_id, status)
                     st.rerun()
                     
                 elif status == "completed":
@@ -369,15 +463,15 @@ def main():
                         
                         with tab1:
                             if "stock_analysis" in reports:
-                                display_report_content(reports["stock_analysis"])
+                                display_report_content(analysis_id, "stock_analysis")
                         
                         with tab2:
                             if "research_analysis" in reports:
-                                display_report_content(reports["research_analysis"])
+                                display_report_content(analysis_id, "research_analysis")
                         
                         with tab3:
                             if "portfolio_strategy" in reports:
-                                display_report_content(reports["portfolio_strategy"])
+                                display_report_content(analysis_id, "portfolio_strategy")
                         
                         # Download buttons
                         st.subheader("⬇️ Download Reports")
@@ -386,41 +480,41 @@ def main():
                         
                         with col1:
                             if "stock_analysis" in reports:
-                                try:
-                                    with open(reports["stock_analysis"], 'r', encoding='utf-8') as f:
-                                        st.download_button(
-                                            "📊 Stock Analysis",
-                                            f.read(),
-                                            file_name=f"stock_analysis_{analysis_id[:8]}.md",
-                                            mime="text/markdown"
-                                        )
-                                except:
+                                content = fetch_report(analysis_id, "stock_analysis")
+                                if content is not None:
+                                    st.download_button(
+                                        "📊 Stock Analysis",
+                                        content,
+                                        file_name=f"stock_analysis_{analysis_id[:8]}.md",
+                                        mime="text/markdown"
+                                    )
+                                else:
                                     st.error("Could not load stock analysis report")
                         
                         with col2:
                             if "research_analysis" in reports:
-                                try:
-                                    with open(reports["research_analysis"], 'r', encoding='utf-8') as f:
-                                        st.download_button(
-                                            "🏆 Investment Ranking",
-                                            f.read(),
-                                            file_name=f"investment_ranking_{analysis_id[:8]}.md",
-                                            mime="text/markdown"
-                                        )
-                                except:
+                                content = fetch_report(analysis_id, "research_analysis")
+                                if content is not None:
+                                    st.download_button(
+                                        "🏆 Investment Ranking",
+                                        content,
+                                        file_name=f"investment_ranking_{analysis_id[:8]}.md",
+                                        mime="text/markdown"
+                                    )
+                                else:
                                     st.error("Could not load research analysis report")
                         
                         with col3:
                             if "portfolio_strategy" in reports:
-                                try:
-                                    with open(reports["portfolio_strategy"], 'r', encoding='utf-8') as f:
-                                        st.download_button(
-                                            "💼 Portfolio Strategy",
-                                            f.read(),
-                                            file_name=f"portfolio_strategy_{analysis_id[:8]}.md",
-                                            mime="text/markdown"
-                                        )
-                                except:
+                                content = fetch_report(analysis_id, "portfolio_strategy")
+                                if content is not None:
+                                    st.download_button(
+                                        "💼 Portfolio Strategy",
+                                        content,
+                                        file_name=f"portfolio_strategy_{analysis_id[:8]}.md",
+                                        mime="text/markdown"
+                                    )
+                                else:
                                     st.error("Could not load portfolio strategy report")
                 
                 elif status == "failed":
@@ -0,0 +1,471 @@
+"""Pluggable storage backends for analysis records."""
+
+import asyncio
+import base64
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from ..config.settings import settings
+from .cache import LRUCache
+from .portfolio import normalize_symbol, parse_symbols, portfolio_key
+
+# Statuses after which a record no longer changes
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Fields that listings can project
+LISTABLE_FIELDS = (
+    "analysis_id", "status", "companies", "portfolio_key", "timestamp", "summary", "error", "reports", "metrics"
+)
+DEFAULT_LIST_FIELDS = ("analysis_id", "status", "companies", "timestamp")
+
+
+def encode_cursor(created_at: float, analysis_id: str) -> str:
+    """Encode a keyset position as an opaque cursor."""
+    raw = json.dumps([created_at, analysis_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Decode a cursor produced by ``encode_cursor``."""
+    try:
+        created_at, analysis_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(created_at), str(analysis_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class AnalysisStore:
+    """Interface shared by all analysis storage backends."""
+    
+    def save(self, analysis_id: str, record: Dict[str, Any]) -> None:
+        """Insert or replace the record for ``analysis_id``."""
+        raise NotImplementedError
+    
+    def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Return the record for ``analysis_id`` or None."""
+        raise NotImplementedError
+    
+    def delete(self, analysis_id: str) -> bool:
+        """Delete a record and report whether it existed."""
+        raise NotImplementedError
+    
+    def query(
+        self,
+        status: Optional[str] = None,
+        ticker: Optional[str] = None,
+        portfolio: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        fields: Sequence[str] = DEFAULT_LIST_FIELDS
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return one page of projected records, newest first, and the next cursor.
+        
+        ``portfolio`` is a portfolio key and matches every spelling of the same ticker set.
+        """
+        raise NotImplementedError
+    
+    def apply_retention(self) -> int:
+        """Evict records outside the retention policy and return how many were removed."""
+        raise NotImplementedError
+    
+    async def asave(self, analysis_id: str, record: Dict[str, Any]) -> None:
+        """Save without blocking the event loop."""
+        await asyncio.to_thread(self.save, analysis_id, record)
+    
+    async def aget(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Load without blocking the event loop."""
+        return await asyncio.to_thread(self.get, analysis_id)
+    
+    async def adelete(self, analysis_id: str) -> bool:
+        """Delete without blocking the event loop."""
+        return await asyncio.to_thread(self.delete, analysis_id)
+    
+    async def aquery(self, **filters: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Query one page without blocking the event loop."""
+        return await asyncio.to_thread(lambda: self.query(**filters))
+    
+    async def iter_query(self, batch_size: int = 200, **filters: Any) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every matching record, fetching one indexed page at a time."""
+        cursor = filters.pop("cursor", None)
+        while True:
+            items, cursor = await self.aquery(cursor=cursor, limit=batch_size, **filters)
+            for item in items:
+                yield item
+            if cursor is None:
+                break
+    
+    @staticmethod
+    def keyed(record: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the record with the canonical key of its company list."""
+        if "portfolio_key" in record:
+            return record
+        return {**record, "portfolio_key": portfolio_key(record.get("companies"))}
+    
+    @staticmethod
+    def project(analysis_id: str, record: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+        """Return the requested listing fields of a record."""
+        return {
+            field: analysis_id if field == "analysis_id" else record.get(field)
+            for field in fields
+        }
+
+
+class MemoryAnalysisStore(AnalysisStore):
+    """Process-local store bounded by the retention policy."""
+    
+    def __init__(self, max_records: int, retention_seconds: float, abandoned_seconds: float = 86400.0):
+        """Initialize an empty store; unfinished records older than ``abandoned_seconds`` can be evicted."""
+        self.max_records = max_records
+        self.retention_seconds = retention_seconds
+        self.abandoned_seconds = abandoned_seconds
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._created: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def save(self, analysis_id: str, record: Dict[str, Any]) -> None:
+        record = self.keyed(record)
+        with self._lock:
+            self._records[analysis_id] = record
+            self._created.setdefault(analysis_id, time.time())
+        self.apply_retention()
+    
+    def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        return self._records.get(analysis_id)
+    
+    def delete(self, analysis_id: str) -> bool:
+        with self._lock:
+            self._created.pop(analysis_id, None)
+            return self._records.pop(analysis_id, None) is not None
+    
+    def query(
+        self,
+        status: Optional[str] = None,
+        ticker: Optional[str] = None,
+        portfolio: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        fields: Sequence[str] = DEFAULT_LIST_FIELDS
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        position = decode_cursor(cursor) if cursor else None
+        with self._lock:
+            ordered = sorted(
+                ((self._created[aid], aid, record) for aid, record in self._records.items()),
+                key=lambda item: (item[0], item[1]),
+                reverse=True
+            )
+        
+        page = []
+        for created_at, analysis_id, record in ordered:
+            if position is not None and (created_at, analysis_id) >= position:
+                continue
+            if status is not None and record.get("status") != status:
+                continue
+            if ticker is not None and normalize_symbol(ticker) not in parse_symbols(record.get("companies")):
+                continue
+            if portfolio is not None and record.get("portfolio_key") != portfolio:
+                continue
+            if since is not None and created_at < since:
+                continue
+            if until is not None and created_at >= until:
+                continue
+            page.append((created_at, analysis_id, record))
+            if len(page) > limit:
+                break
+        
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(page[-1][0], page[-1][1])
+        return [self.project(aid, record, fields) for _, aid, record in page], next_cursor
+    
+    def apply_retention(self) -> int:
+        now = time.time()
+        cutoff = now - self.retention_seconds
+        abandoned = now - self.abandoned_seconds
+        with self._lock:
+            excess = len(self._records) - self.max_records
+            # Records stay in creation order, so the oldest one tells whether anything expired
+            oldest = next(iter(self._records), None)
+            if excess <= 0 and (oldest is None or self._created[oldest] >= cutoff):
+                return 0
+            
+            expired = []
+            for analysis_id, record in self._records.items():
+                if len(expired) >= excess and self._created[analysis_id] >= cutoff:
+                    break
+                # Queued and running records still receive status updates, unless a crash left them behind
+                if record.get("status") in TERMINAL_STATUSES or self._created[analysis_id] < abandoned:
+                    expired.append(analysis_id)
+            for analysis_id in expired:
+                del self._records[analysis_id]
+                del self._created[analysis_id]
+        return len(expired)
+    
+    async def asave(self, analysis_id: str, record: Dict[str, Any]) -> None:
+        self.save(analysis_id, record)
+    
+    async def aget(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        return self.get(analysis_id)
+    
+    async def adelete(self, analysis_id: str) -> bool:
+        return self.delete(analysis_id)
+    
+    async def aquery(self, **filters: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        return self.query(**filters)
+
+
+class SQLiteAnalysisStore(AnalysisStore):
+    """SQLite (WAL) store with an in-process hot cache of finished records."""
+    
+    def __init__(
+        self,
+        path: str,
+        max_records: int,
+        retention_seconds: float,
+        hot_cache_size: int = 256,
+        abandoned_seconds: float = 86400.0
+    ):
+        """Prepare the database at ``path``; it is opened on first use."""
+        self.path = Path(path)
+        self.max_records = max_records
+        self.retention_seconds = retention_seconds
+        self.abandoned_seconds = abandoned_seconds
+        self.hot_cache = LRUCache(max_entries=hot_cache_size)
+        self._saves_since_retention = 0
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+    
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Open (or create) the database on first use; callers hold the lock."""
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS analyses (
+                    analysis_id TEXT PRIMARY KEY,
+                    status TEXT,
+                    companies TEXT,
+                    timestamp TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    record TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS analyses_status_idx ON analyses (status, created_at);
+                CREATE INDEX IF NOT EXISTS analyses_created_idx ON analyses (created_at);
+                CREATE INDEX IF NOT EXISTS analyses_keyset_idx ON analyses (created_at, analysis_id);
+                CREATE TABLE IF NOT EXISTS analysis_tickers (
+                    analysis_id TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    PRIMARY KEY (analysis_id, symbol)
+                );
+                CREATE INDEX IF NOT EXISTS analysis_tickers_symbol_idx ON analysis_tickers (symbol);
+                CREATE INDEX IF NOT EXISTS analyses_portfolio_idx
+                    ON analyses (json_extract(record, '$.portfolio_key'), created_at);
+                """
+            )
+            conn.commit()
+            self._connection = conn
+        return self._connection
+    
+    def save(self, analysis_id: str, record: Dict[str, Any]) -> None:
+        record = self.keyed(record)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO analyses "
+                "(analysis_id, status, companies, timestamp, created_at, updated_at, record) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(analysis_id) DO UPDATE SET "
+                "status = excluded.status, companies = excluded.companies, "
+                "timestamp = COALESCE(excluded.timestamp, analyses.timestamp), "
+                "updated_at = excluded.updated_at, record = excluded.record",
+                (
+                    analysis_id,
+                    record.get("status"),
+                    record.get("companies"),
+                    record.get("timestamp"),
+                    now,
+                    now,
+                    json.dumps(record)
+                )
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO analysis_tickers (analysis_id, symbol) VALUES (?, ?)",
+                [(analysis_id, symbol) for symbol in parse_symbols(record.get("companies"))]
+            )
+            self._conn.commit()
+            self._saves_since_retention += 1
+            run_retention = self._saves_since_retention >= 100
+        
+        # Only finished records are immutable and therefore safe to cache
+        if record.get("status") in TERMINAL_STATUSES:
+            self.hot_cache.set(analysis_id, record)
+        else:
+            self.hot_cache.delete(analysis_id)
+        
+        if run_retention:
+            self.apply_retention()
+    
+    def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        record = self.hot_cache.get(analysis_id)
+        if record is not None:
+            return record
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM analyses WHERE analysis_id = ?", (analysis_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        if record.get("status") in TERMINAL_STATUSES:
+            self.hot_cache.set(analysis_id, record)
+        return record
+    
+    def delete(self, analysis_id: str) -> bool:
+        self.hot_cache.delete(analysis_id)
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM analyses WHERE analysis_id = ?", (analysis_id,))
+            self._conn.execute("DELETE FROM analysis_tickers WHERE analysis_id = ?", (analysis_id,))
+            self._conn.commit()
+        return cursor.rowcount > 0
+    
+    def query(
+        self,
+        status: Optional[str] = None,
+        ticker: Optional[str] = None,
+        portfolio: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        fields: Sequence[str] = DEFAULT_LIST_FIELDS
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        columns = {
+            "analysis_id": "a.analysis_id",
+            "status": "a.status",
+            "companies": "a.companies",
+            "portfolio_key": "json_extract(a.record, '$.portfolio_key')",
+            "timestamp": "a.timestamp",
+            "summary": "json_extract(a.record, '$.summary')",
+            "error": "json_extract(a.record, '$.error')",
+            "reports": "json_extract(a.record, '$.reports')",
+            "metrics": "json_extract(a.record, '$.metrics')"
+        }
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("a.status = ?")
+            params.append(status)
+        if ticker is not None:
+            conditions.append(
+                "a.analysis_id IN (SELECT analysis_id FROM analysis_tickers WHERE symbol = ?)"
+            )
+            params.append(normalize_symbol(ticker))
+        if portfolio is not None:
+            conditions.append("json_extract(a.record, '$.portfolio_key') = ?")
+            params.append(portfolio)
+        if since is not None:
+            conditions.append("a.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("a.created_at < ?")
+            params.append(until)
+        if cursor:
+            created_at, analysis_id = decode_cursor(cursor)
+            conditions.append("(a.created_at, a.analysis_id) < (?, ?)")
+            params.extend([created_at, analysis_id])
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        select = ", ".join(columns[field] for field in fields)
+        sql = (
+            f"SELECT a.created_at, a.analysis_id, {select} FROM analyses a {where} "
+            "ORDER BY a.created_at DESC, a.analysis_id DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit + 1)).fetchall()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+        
+        items = []
+        for row in rows:
+            item = dict(zip(fields, row[2:]))
+            for field in ("reports", "metrics"):
+                if item.get(field) is not None:
+                    item[field] = json.loads(item[field])
+            items.append(item)
+        return items, next_cursor
+    
+    def apply_retention(self) -> int:
+        now = time.time()
+        with self._lock:
+            self._saves_since_retention = 0
+            expired = self._expired_ids(now - self.retention_seconds, now - self.abandoned_seconds)
+            self._conn.executemany(
+                "DELETE FROM analyses WHERE analysis_id = ?", [(aid,) for aid in expired]
+            )
+            self._conn.executemany(
+                "DELETE FROM analysis_tickers WHERE analysis_id = ?", [(aid,) for aid in expired]
+            )
+            self._conn.commit()
+        for analysis_id in expired:
+            self.hot_cache.delete(analysis_id)
+        return len(expired)
+    
+    def _expired_ids(self, cutoff: float, abandoned: float) -> List[str]:
+        """Return evictable ids older than the retention window or beyond the record limit.
+        
+        Finished records are evictable, and so are unfinished ones created before
+        ``abandoned``, which a crashed process left behind.
+        """
+        evictable = "(status IN (%s) OR created_at < ?)" % ", ".join("?" for _ in TERMINAL_STATUSES)
+        too_old = self._conn.execute(
+            f"SELECT analysis_id FROM analyses WHERE created_at < ? AND {evictable}",
+            (cutoff, *TERMINAL_STATUSES, abandoned)
+        ).fetchall()
+        excess = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0] - self.max_records
+        over_limit = self._conn.execute(
+            f"SELECT analysis_id FROM analyses WHERE {evictable} ORDER BY created_at LIMIT ?",
+            (*TERMINAL_STATUSES, abandoned, max(excess, 0))
+        ).fetchall()
+        return list(dict.fromkeys(row[0] for row in too_old + over_limit))
+
+
+def create_analysis_store() -> AnalysisStore:
+    """Build the analysis store selected by ANALYSIS_STORE_BACKEND."""
+    retention_seconds = settings.ANALYSIS_RETENTION_DAYS * 86400
+    abandoned_seconds = settings.ANALYSIS_ABANDONED_HOURS * 3600
+    if settings.ANALYSIS_STORE_BACKEND == "memory":
+        return MemoryAnalysisStore(
+            max_records=settings.ANALYSIS_MAX_RECORDS,
+            retention_seconds=retention_seconds,
+            abandoned_seconds=abandoned_seconds
+        )
+    if settings.ANALYSIS_STORE_BACKEND == "sqlite":
+        return SQLiteAnalysisStore(
+            path=settings.ANALYSIS_STORE_PATH,
+            max_records=settings.ANALYSIS_MAX_RECORDS,
+            retention_seconds=retention_seconds,
+            # Another worker may delete a record, so finished records are only cached by a lone worker
+            hot_cache_size=settings.ANALYSIS_HOT_CACHE_SIZE if settings.API_WORKERS == 1 else 0,
+            abandoned_seconds=abandoned_seconds
+        )
+    raise ValueError(f"Unknown ANALYSIS_STORE_BACKEND: {settings.ANALYSIS_STORE_BACKEND}")
+
+
+# Global analysis store instance
+analysis_store = create_analysis_store()
@@ -0,0 +1,288 @@
+"""Tiered caches with TTL and LRU eviction."""
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from ..config.settings import settings
+from .portfolio import normalize_symbol
+
+
+class LRUCache:
+    """Thread-safe in-memory cache with per-entry TTL and LRU eviction."""
+    
+    def __init__(self, max_entries: int = 512):
+        """Initialize an empty cache holding at most ``max_entries`` items."""
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return a live value and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries if full."""
+        expires_at = time.time() + ttl if ttl else 0.0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key: str) -> None:
+        """Remove a single entry if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """Persistent key/value cache stored in a SQLite table."""
+    
+    def __init__(self, path: str, table: str = "cache", max_entries: int = 10000):
+        """Prepare the cache database at ``path``; it is opened on first use."""
+        self.path = Path(path)
+        self.table = table
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+    
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Open (or create) the database on first use; callers hold the lock."""
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_accessed_idx ON {self.table} (accessed_at)"
+            )
+            conn.commit()
+            self._connection = conn
+        return self._connection
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return a live value, or None when missing or expired."""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+    
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return a live ``(value, expires_at)`` pair, or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at and expires_at < now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return json.loads(value), expires_at
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a JSON-serializable value and trim the table to its size limit."""
+        now = time.time()
+        expires_at = now + ttl if ttl else 0.0
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now)
+            )
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+    
+    def delete(self, key: str) -> None:
+        """Remove a single entry if present."""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+    
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class TieredCache:
+    """In-memory LRU tier in front of an optional SQLite tier, with hit counters."""
+    
+    def __init__(
+        self,
+        max_entries: int = 512,
+        disk_path: Optional[str] = None,
+        table: str = "cache",
+        disk_max_entries: int = 10000
+    ):
+        """Initialize the memory tier and, if a path is given, the disk tier."""
+        self.memory = LRUCache(max_entries=max_entries)
+        self.disk = SQLiteCache(disk_path, table=table, max_entries=disk_max_entries) if disk_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Look a key up in memory first, then on disk."""
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                value, expires_at = entry
+                self.disk_hits += 1
+                self.memory.set(key, value, expires_at - time.time() if expires_at else None)
+                return value
+        self.misses += 1
+        return None
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Write a value through both tiers."""
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl)
+    
+    def delete(self, key: str) -> None:
+        """Remove a key from both tiers."""
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+    
+    async def aget(self, key: str) -> Optional[Any]:
+        """Async lookup that keeps disk reads off the event loop."""
+        if self.disk is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+    
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Async write that keeps disk writes off the event loop."""
+        if self.disk is None:
+            self.set(key, value, ttl)
+        else:
+            await asyncio.to_thread(self.set, key, value, ttl)
+    
+    async def adelete(self, key: str) -> None:
+        """Async delete that keeps disk writes off the event loop."""
+        if self.disk is None:
+            self.delete(key)
+        else:
+            await asyncio.to_thread(self.delete, key)
+    
+    def clear(self) -> None:
+        """Remove all entries from both tiers and reset counters."""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+        self.memory_hits = self.disk_hits = self.misses = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes."""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else None
+        }
+
+
+class LLMResponseCache(TieredCache):
+    """Content-addressed cache of LLM completions with per-phase TTLs."""
+    
+    def make_key(self, model: str, prompt: str, params: Dict[str, Any]) -> str:
+        """Hash the model, normalized prompt and call parameters."""
+        payload = json.dumps(
+            {"model": model, "prompt": self.normalize_prompt(prompt), "params": params},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Collapse whitespace so re-indented prompts share a cache entry."""
+        return re.sub(r"\s+", " ", prompt).strip()
+    
+    @staticmethod
+    def ttl_for(phase: Optional[str]) -> float:
+        """Return the configured TTL in seconds for a workflow phase."""
+        return settings.LLM_CACHE_TTLS.get(phase or "", settings.LLM_CACHE_DEFAULT_TTL)
+
+
+class SearchResultCache(TieredCache):
+    """Ticker-keyed cache of web search results with per-ticker freshness windows."""
+    
+    @staticmethod
+    def make_key(company: str, query_template: str, max_results: int) -> str:
+        """Key on the ticker plus the query shape so template changes invalidate entries."""
+        return f"{normalize_symbol(company)}|{max_results}|{query_template}"
+    
+    @staticmethod
+    def ttl_for(company: str) -> float:
+        """Return the freshness window in seconds for a ticker."""
+        return settings.SEARCH_CACHE_TTL_OVERRIDES.get(normalize_symbol(company), settings.SEARCH_CACHE_TTL)
+
+
+# Global LLM response cache instance
+llm_cache = LLMResponseCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    disk_path=settings.LLM_CACHE_DISK_PATH or None,
+    table="llm_responses"
+)
+
+# Global search result cache instance, persisted across restarts
+search_cache = SearchResultCache(
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+    disk_path=settings.SEARCH_CACHE_PATH or None,
+    table="search_results",
+    disk_max_entries=settings.SEARCH_CACHE_MAX_ENTRIES
+)
@@ -0,0 +1,164 @@
+"""Single-flight coalescing of identical concurrent calls."""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+from ..config.settings import settings
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """One shared call and the number of callers waiting on it."""
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    """A shared stream whose items are buffered so late joiners replay them."""
+    
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.readers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+    
+    def notify(self) -> None:
+        """Wake every reader waiting for the next item."""
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    async def read(self) -> AsyncIterator[Any]:
+        """Yield every item from the first, then live ones until the stream ends."""
+        index = 0
+        while True:
+            # Taken before reading so an item appended meanwhile is not missed
+            changed = self._changed
+            while index < len(self.items):
+                yield self.items[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class SingleFlight(Generic[T]):
+    """Runs at most one call per key at a time; concurrent callers share its outcome.
+    
+    The shared call runs as its own task, so a caller that gives up does not
+    cancel it for the others. It is cancelled only when every caller has gone.
+    """
+    
+    def __init__(self, name: str, enabled: bool = True):
+        """Initialize an empty flight table."""
+        self.name = name
+        self.enabled = enabled
+        self._flights: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self.leaders = 0
+        self.followers = 0
+    
+    def in_flight(self, key: str) -> bool:
+        """Return whether a call or stream for ``key`` is running on this event loop."""
+        flight = self._flights.get(key)
+        if flight is not None and self._current(flight.task):
+            return True
+        broadcast = self._streams.get(key)
+        return broadcast is not None and broadcast.task is not None and self._current(broadcast.task)
+    
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``factory()``, joining a running call with the same key."""
+        if not self.enabled:
+            return await factory()
+        
+        flight = self._flights.get(key)
+        if flight is None or not self._current(flight.task):
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._land(self._flights, key, task))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+    
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Yield the items of ``factory()``; joiners replay what was already produced."""
+        if not self.enabled:
+            async for item in factory():
+                yield item
+            return
+        
+        broadcast = self._streams.get(key)
+        if broadcast is None or broadcast.task is None or not self._current(broadcast.task):
+            broadcast = _Broadcast()
+            broadcast.task = asyncio.ensure_future(self._produce(broadcast, factory))
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(lambda task: self._land(self._streams, key, task))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        
+        broadcast.readers += 1
+        try:
+            async for item in broadcast.read():
+                yield item
+        finally:
+            broadcast.readers -= 1
+            if broadcast.readers == 0 and not broadcast.task.done():
+                broadcast.task.cancel()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return how many calls ran and how many callers joined one instead."""
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights) + len(self._streams),
+            "leaders": self.leaders,
+            "followers": self.followers
+        }
+    
+    @staticmethod
+    async def _produce(broadcast: _Broadcast, factory: Callable[[], AsyncIterator[Any]]) -> None:
+        """Drain the source stream into the broadcast buffer."""
+        try:
+            async for item in factory():
+                broadcast.items.append(item)
+                broadcast.notify()
+        except BaseException as e:
+            broadcast.error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            broadcast.done = True
+            broadcast.notify()
+    
+    @staticmethod
+    def _current(task: asyncio.Task) -> bool:
+        """Return whether ``task`` is still running on the running event loop."""
+        return not task.done() and task.get_loop() is asyncio.get_running_loop()
+    
+    @staticmethod
+    def _land(table: Dict[str, Any], key: str, task: asyncio.Task) -> None:
+        """Forget a finished flight and mark its error as retrieved."""
+        entry = table.get(key)
+        if entry is not None and entry.task is task:
+            table.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+
+# Global single-flight tables for LLM completions and web searches
+llm_flight = SingleFlight("llm", enabled=settings.COALESCE_ENABLED)
+search_flight = SingleFlight("search", enabled=settings.COALESCE_ENABLED)
@@ -0,0 +1,214 @@
+"""Token budgeting and deterministic compaction of the context passed between phases."""
+
+import re
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from ..config.settings import settings
+from .tokenizer import count_tokens
+
+# Sentences that carry no analysis: disclaimers and conversational filler
+BOILERPLATE_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"educational purposes only",
+        r"(is|are|be|constitute)( considered)?( as)? (not )?(personalized |professional )?(financial|investment) advice",
+        r"\bnot (financial|investment) advice\b",
+        r"consult (with )?(a|an|your) (licensed |qualified |certified )?(financial|investment) (advisor|adviser|professional)",
+        r"past performance (is|does) not",
+        r"do your own (research|due diligence)",
+        r"\bas an ai\b",
+        r"^(i hope|let me know|feel free)\b",
+        r"^(certainly|sure|of course)[!,.]"
+    )
+]
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[*])")
+_TICKER_HEADING = re.compile(r"^#{1,6}\s*([A-Z][A-Z0-9.\-]{0,9})\s*$")
+_FACT = re.compile(r"\d|%|\$")
+_NORMALIZE = re.compile(r"[^a-z0-9]+")
+
+# Sentences shorter than this are never treated as duplicates (headings, list labels)
+MIN_DEDUPE_LENGTH = 20
+
+# A line as a list of sentences
+Line = List[str]
+
+
+def _split_lines(text: str) -> List[Line]:
+    """Split text into lines of sentences, keeping blank lines as empty lists."""
+    return [
+        [sentence for sentence in _SENTENCE_BOUNDARY.split(line.strip()) if sentence]
+        for line in text.splitlines()
+    ]
+
+
+def _join_lines(lines: List[Line]) -> str:
+    """Rebuild text from lines, collapsing runs of blank lines."""
+    output: List[str] = []
+    for line in lines:
+        text = " ".join(line)
+        if not text and (not output or not output[-1]):
+            continue
+        output.append(text)
+    while output and not output[-1]:
+        output.pop()
+    return "\n".join(output)
+
+
+class ContextBudget:
+    """Fits the results handed to the next phase into a prompt token budget.
+    
+    Cleaning and deduplication are always applied. Only when the context is
+    still over budget are sentences dropped, ticker by ticker, keeping the
+    ones with figures first.
+    """
+    
+    def __init__(self, max_tokens: int, model: str = "gpt-4o-mini", enabled: Optional[bool] = None):
+        """Initialize the budget for prompts sent to ``model``."""
+        self.max_tokens = max_tokens
+        self.model = model
+        self.enabled = settings.CONTEXT_BUDGET_ENABLED if enabled is None else enabled
+    
+    def compact(
+        self,
+        fields: Dict[str, str],
+        symbols: Sequence[str] = (),
+        label: str = "Context"
+    ) -> Dict[str, str]:
+        """Return ``fields`` compacted to the budget and log the size before and after."""
+        if not self.enabled:
+            return fields
+        
+        before = self.size(fields)
+        compacted = self._deduplicate({name: self._clean(text) for name, text in fields.items()})
+        if self.size(compacted) > self.max_tokens:
+            compacted = self._summarize(compacted, [symbol.upper() for symbol in symbols])
+        after = self.size(compacted)
+        print(f"{label} context: {before} -> {after} tokens (budget {self.max_tokens})")
+        return compacted
+    
+    def size(self, fields: Dict[str, str]) -> int:
+        """Return the token count of all fields together."""
+        return sum(count_tokens(text, self.model) for text in fields.values())
+    
+    @staticmethod
+    def _clean(text: str) -> str:
+        """Drop boilerplate sentences and redundant blank lines."""
+        lines = []
+        for line in _split_lines(text):
+            kept = [
+                sentence for sentence in line
+                if not any(pattern.search(sentence.strip("*_-• ")) for pattern in BOILERPLATE_PATTERNS)
+            ]
+            # A line made only of boilerplate disappears instead of becoming a blank line
+            if kept or not line:
+                lines.append(kept)
+        return _join_lines(lines)
+    
+    @staticmethod
+    def _deduplicate(fields: Dict[str, str]) -> Dict[str, str]:
+        """Drop sentences repeated within or across fields, keeping the first occurrence."""
+        seen: Set[str] = set()
+        deduplicated = {}
+        for name, text in fields.items():
+            lines = []
+            for line in _split_lines(text):
+                kept = []
+                for sentence in line:
+                    key = _NORMALIZE.sub(" ", sentence.lower()).strip()
+                    if len(key) >= MIN_DEDUPE_LENGTH:
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    kept.append(sentence)
+                if kept or not line:
+                    lines.append(kept)
+            deduplicated[name] = _join_lines(lines)
+        return deduplicated
+    
+    def _summarize(self, fields: Dict[str, str], symbols: List[str]) -> Dict[str, str]:
+        """Share the budget among fields by size and keep each field's best sentences per ticker."""
+        sizes = {name: count_tokens(text, self.model) for name, text in fields.items()}
+        total = sum(sizes.values()) or 1
+        return {
+            name: self._summarize_field(text, symbols, self.max_tokens * sizes[name] // total)
+            for name, text in fields.items()
+        }
+    
+    def _summarize_field(self, text: str, symbols: List[str], budget: int) -> str:
+        """Select sentences round-robin across tickers, highest scoring first, within ``budget``."""
+        lines = _split_lines(text)
+        patterns = {symbol: re.compile(rf"(?<![A-Za-z]){re.escape(symbol)}(?![A-Za-z])") for symbol in symbols}
+        
+        # Every sentence as (line, position, tokens, score), grouped by the tickers it covers
+        groups: Dict[str, List[Tuple[int, int, int, int]]] = {symbol: [] for symbol in symbols}
+        groups[""] = []
+        headings: Dict[int, str] = {}
+        block_symbol = ""
+        used = 0
+        for line_index, line in enumerate(lines):
+            heading = _TICKER_HEADING.match(" ".join(line))
+            if heading:
+                # Per-ticker blocks as produced by merged Phase 1 results
+                block_symbol = heading.group(1) if heading.group(1) in groups else ""
+                headings[line_index] = block_symbol
+                used += count_tokens(" ".join(line), self.model)
+                continue
+            for position, sentence in enumerate(line):
+                mentioned = [symbol for symbol, pattern in patterns.items() if pattern.search(sentence)]
+                owners = [block_symbol] if block_symbol else mentioned or [""]
+                score = 2 * bool(_FACT.search(sentence)) + bool(mentioned) + (position == 0)
+                unit = (line_index, position, count_tokens(sentence, self.model) + 1, score)
+                for owner in owners:
+                    groups[owner].append(unit)
+        
+        queues = [
+            sorted(units, key=lambda unit: (-unit[3], unit[0], unit[1]))
+            for units in groups.values() if units
+        ]
+        selected: Set[Tuple[int, int]] = set()
+        while queues:
+            remaining = []
+            for queue in queues:
+                # Take this group's best sentence that still fits
+                while queue:
+                    line_index, position, tokens, _ = queue.pop(0)
+                    if (line_index, position) in selected:
+                        continue
+                    if used + tokens <= budget:
+                        selected.add((line_index, position))
+                        used += tokens
+                        break
+                if queue:
+                    remaining.append(queue)
+            queues = remaining
+        
+        output: List[Line] = []
+        for line_index, line in enumerate(lines):
+            if line_index in headings:
+                output.append(line)
+                continue
+            kept = [sentence for position, sentence in enumerate(line) if (line_index, position) in selected]
+            if kept or not line:
+                output.append(kept)
+        # Headings whose block lost every sentence are dropped too
+        return _join_lines(self._drop_empty_headings(output))
+    
+    @staticmethod
+    def _drop_empty_headings(lines: List[Line]) -> List[Line]:
+        """Remove ticker headings that are followed by no content before the next heading."""
+        output: List[Line] = []
+        for index, line in enumerate(lines):
+            if _TICKER_HEADING.match(" ".join(line)):
+                following = lines[index + 1:]
+                has_content = False
+                for later in following:
+                    if _TICKER_HEADING.match(" ".join(later)):
+                        break
+                    if later:
+                        has_content = True
+                        break
+                if not has_content:
+                    continue
+            output.append(line)
+        return output
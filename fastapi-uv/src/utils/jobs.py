@@ -0,0 +1,266 @@
+"""Bounded priority job queue and worker pool for analyses."""
+
+import asyncio
+import heapq
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..config.settings import settings
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted to a queue that is at max depth."""
+
+
+@dataclass(order=True)
+class AnalysisJob:
+    """A queued analysis; lower sort keys run first."""
+    
+    sort_key: tuple = field(init=False, repr=False)
+    analysis_id: str = field(compare=False)
+    companies: str = field(compare=False)
+    message: str = field(compare=False)
+    per_ticker: Optional[bool] = field(default=None, compare=False)
+    priority: int = field(default=5, compare=False)
+    sequence: int = field(default=0, compare=False)
+    key: Optional[str] = field(default=None, compare=False)
+    aliases: List[str] = field(default_factory=list, compare=False)
+    closed: bool = field(default=False, compare=False)
+    
+    def __post_init__(self):
+        # Higher priority first, then first-come first-served
+        self.sort_key = (-self.priority, self.sequence)
+    
+    def analysis_ids(self) -> List[str]:
+        """Return the job's own analysis id followed by those of requests coalesced into it."""
+        return [self.analysis_id, *self.aliases]
+    
+    def close(self) -> List[str]:
+        """Stop accepting coalesced requests and return every analysis id the result belongs to."""
+        self.closed = True
+        return self.analysis_ids()
+    
+    def workflow_kwargs(self) -> Dict[str, Any]:
+        """Return the keyword arguments for InvestmentWorkflow.execute_analysis."""
+        return {
+            "companies": self.companies,
+            "message": self.message,
+            "per_ticker": self.per_ticker,
+            "analysis_id": self.analysis_id
+        }
+
+
+class JobQueue:
+    """Priority queue drained by a fixed pool of asyncio workers."""
+    
+    def __init__(
+        self,
+        runner: Callable[[AnalysisJob], Awaitable[None]],
+        workers: int,
+        max_depth: int
+    ):
+        """Initialize the queue; workers start on first use or on ``start``."""
+        self.runner = runner
+        self.worker_count = workers
+        self.max_depth = max_depth
+        self._pending: List[AnalysisJob] = []
+        self._running: Dict[str, AnalysisJob] = {}
+        self._by_key: Dict[str, AnalysisJob] = {}
+        self._sequence = itertools.count()
+        self._reserved = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._workers: List[asyncio.Task] = []
+        self.completed = 0
+        self.rejected = 0
+        self.coalesced = 0
+    
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        if self._workers:
+            return
+        self._condition = asyncio.Condition()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"analysis-worker-{index}")
+            for index in range(self.worker_count)
+        ]
+    
+    async def stop(self) -> List[AnalysisJob]:
+        """Cancel the workers and return the running and queued jobs that will never finish."""
+        interrupted = [*self._running.values(), *sorted(self._pending)]
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._condition = None
+        self._pending = []
+        self._by_key.clear()
+        for job in interrupted:
+            job.closed = True
+        return interrupted
+    
+    async def submit(
+        self,
+        analysis_id: str,
+        companies: str,
+        message: str,
+        per_ticker: Optional[bool] = None,
+        priority: int = 5,
+        key: Optional[str] = None,
+        reserved: bool = False
+    ) -> int:
+        """Enqueue a job and return its 1-based queue position.
+        
+        Requests with the same ``key`` can later ``join`` the job while it is queued or running.
+        With ``reserved``, the job takes a slot held by an earlier ``reserve`` call.
+        """
+        if reserved:
+            self._reserved -= 1
+        elif len(self._pending) + self._reserved >= self.max_depth:
+            self.rejected += 1
+            raise QueueFullError(f"Analysis queue is full ({self.max_depth} jobs waiting)")
+        
+        self.start()
+        job = AnalysisJob(
+            analysis_id=analysis_id,
+            companies=companies,
+            message=message,
+            per_ticker=per_ticker,
+            priority=priority,
+            sequence=next(self._sequence),
+            key=key
+        )
+        if key is not None:
+            self._by_key[key] = job
+        async with self._condition:
+            heapq.heappush(self._pending, job)
+            self._condition.notify()
+        return self.position(analysis_id)
+    
+    def reserve(self, count: int) -> None:
+        """Hold ``count`` queue slots for jobs submitted later with ``reserved``.
+        
+        Raises QueueFullError, holding nothing, when the slots are not all free.
+        """
+        if len(self._pending) + self._reserved + count > self.max_depth:
+            self.rejected += 1
+            raise QueueFullError(f"Analysis queue cannot take {count} more jobs")
+        self._reserved += count
+    
+    def release(self, count: int) -> None:
+        """Give back reserved slots that were not used."""
+        self._reserved = max(self._reserved - count, 0)
+    
+    def find(self, key: str) -> Optional[AnalysisJob]:
+        """Return the queued or running job with ``key`` that can still be joined."""
+        job = self._by_key.get(key)
+        if job is None or job.closed:
+            return None
+        return job
+    
+    def join(self, job: AnalysisJob, analysis_id: str) -> bool:
+        """Attach ``analysis_id`` to ``job`` so it receives the job's events and result.
+        
+        Fails once the job has started handing out its result.
+        """
+        if job.closed:
+            return False
+        job.aliases.append(analysis_id)
+        self.coalesced += 1
+        return True
+    
+    def position(self, analysis_id: str) -> Optional[int]:
+        """Return the 1-based position of a waiting job, or None if it is not waiting."""
+        for index, job in enumerate(sorted(self._pending)):
+            if analysis_id in job.analysis_ids():
+                return index + 1
+        return None
+    
+    def stats(self) -> Dict[str, int]:
+        """Return queue depth and worker utilisation."""
+        return {
+            "queued": len(self._pending),
+            "reserved": self._reserved,
+            "running": len(self._running),
+            "workers": self.worker_count,
+            "max_depth": self.max_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "coalesced": self.coalesced
+        }
+    
+    async def _worker(self) -> None:
+        """Take the highest-priority job and run it, forever."""
+        while True:
+            async with self._condition:
+                while not self._pending:
+                    await self._condition.wait()
+                job = heapq.heappop(self._pending)
+            
+            self._running[job.analysis_id] = job
+            try:
+                await self.runner(job)
+            except Exception as e:
+                print(f"Job {job.analysis_id} crashed: {str(e)}")
+            finally:
+                job.closed = True
+                if job.key is not None and self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+                self._running.pop(job.analysis_id, None)
+                self.completed += 1
+
+
+def _execute_in_process(kwargs: Dict[str, Any], progress_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Run one analysis in a worker process with its own event loop and clients.
+    
+    With ``progress_ids``, progress events are published to those analyses
+    through the (shared) progress broker of the worker process.
+    """
+    from .llm_client import llm_client
+    from .progress import progress_broker
+    from .workflow import InvestmentWorkflow
+    
+    def publish(event: str, data: Dict[str, Any]) -> None:
+        for analysis_id in progress_ids or ():
+            progress_broker.publish(analysis_id, event, data)
+    
+    async def run() -> Dict[str, Any]:
+        try:
+            return await InvestmentWorkflow().execute_analysis(
+                **kwargs,
+                on_progress=publish if progress_ids else None
+            )
+        finally:
+            await progress_broker.drain()
+            await llm_client.shutdown()
+    
+    return asyncio.run(run())
+
+
+class ProcessExecutor:
+    """Runs analyses in a separate worker process pool."""
+    
+    def __init__(self, workers: int):
+        """Initialize the executor; processes are spawned on first use."""
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    async def execute(self, job: AnalysisJob, progress_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Run the job's workflow in a worker process and return its result."""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._pool, _execute_in_process, job.workflow_kwargs(), progress_ids
+        )
+    
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Global process executor, used when JOB_EXECUTOR is "process"
+process_executor = ProcessExecutor(workers=settings.JOB_WORKERS)
@@ -0,0 +1,70 @@
+"""Process-wide pooled LLM client shared by all agents."""
+
+import asyncio
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from ..config.settings import settings
+
+
+class LLMClientManager:
+    """Owns a single pooled AsyncOpenAI client for the whole process."""
+    
+    def __init__(self):
+        """Initialize the manager without opening any connections."""
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def startup(self) -> None:
+        """Open the shared HTTP connection pool."""
+        if self._http_client is None:
+            limits = httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY
+            )
+            self._http_client = httpx.AsyncClient(
+                limits=limits,
+                timeout=httpx.Timeout(settings.LLM_TIMEOUT)
+            )
+    
+    def get(self) -> AsyncOpenAI:
+        """Return the shared client, opening the pool lazily outside of FastAPI."""
+        if self._client is None:
+            self.startup()
+            self._client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                http_client=self._http_client,
+                # Retries are owned by the rate limiter and the resilience layer
+                max_retries=0
+            )
+        return self._client
+    
+    def request_slot(self) -> asyncio.Semaphore:
+        """Return the process-wide budget of in-flight LLM calls for the running loop.
+        
+        The budget is split between API workers and, with the process
+        executor, between the job processes of each worker.
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(max(settings.LLM_MAX_CONCURRENCY // settings.LLM_BUDGET_SHARES, 1))
+            self._loop = loop
+        return self._semaphore
+    
+    async def shutdown(self) -> None:
+        """Close the shared pool and release all connections."""
+        http_client = self._http_client
+        self._client = None
+        self._http_client = None
+        if http_client is not None:
+            await http_client.aclose()
+
+
+# Global LLM client instance
+llm_client = LLMClientManager()
@@ -0,0 +1,344 @@
+"""Timing spans, token usage and cost, aggregated into Prometheus-format metrics."""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ..config.settings import settings
+
+# Bucket upper bounds in seconds for stage and call latencies
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# Bucket upper bounds for the tokens of a single LLM call
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Render a Prometheus label set such as ``{phase="x",le="1"}``."""
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value without a trailing ``.0`` on whole numbers."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing value per label set."""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        """Initialize an empty counter."""
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        """Add ``amount`` to the series selected by ``labels``."""
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def render(self) -> List[str]:
+        """Return the exposition lines of every series."""
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Gauge(Counter):
+    """Value that is set to the latest reading per label set."""
+    
+    kind = "gauge"
+    
+    def set(self, value: float, **labels: Any) -> None:
+        """Replace the value of the series selected by ``labels``."""
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set."""
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        """Initialize an empty histogram with the given bucket upper bounds."""
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket counts (plus +Inf), sum and count
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels: Any) -> None:
+        """Record one observation in the series selected by ``labels``."""
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            counts, totals = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0, 0]))
+            counts[bisect_left(self.buckets, value)] += 1
+            totals[0] += value
+            totals[1] += 1
+    
+    def render(self) -> List[str]:
+        """Return the bucket, sum and count lines of every series."""
+        lines = []
+        with self._lock:
+            for key, (counts, totals) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    bucket = 'le="' + le + '"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, bucket)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(totals[0])}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {totals[1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics rendered in the Prometheus text format."""
+    
+    def __init__(self):
+        """Initialize the metrics recorded by the workflow and agents."""
+        self.stage_seconds = Histogram(
+            "investment_stage_duration_seconds",
+            "Duration of workflow stages (search, LLM phases, report writes, whole analyses).",
+            labels=("stage",)
+        )
+        self.llm_call_seconds = Histogram(
+            "investment_llm_call_duration_seconds",
+            "Duration of LLM calls including retries.",
+            labels=("phase", "model")
+        )
+        self.llm_call_tokens = Histogram(
+            "investment_llm_call_tokens",
+            "Tokens used by a single LLM call.",
+            labels=("phase", "model", "kind"),
+            buckets=TOKEN_BUCKETS
+        )
+        self.llm_tokens = Counter(
+            "investment_llm_tokens_total",
+            "Tokens used by LLM calls.",
+            labels=("phase", "model", "kind")
+        )
+        self.llm_cost = Counter(
+            "investment_llm_cost_usd_total",
+            "Estimated LLM spend in US dollars.",
+            labels=("phase", "model")
+        )
+        self.llm_cache_hits = Counter(
+            "investment_llm_cache_hits_total",
+            "LLM calls answered from the response cache.",
+            labels=("phase", "model")
+        )
+        self.analyses = Counter(
+            "investment_analyses_total",
+            "Finished analyses by status.",
+            labels=("status",)
+        )
+        self.rate_limit_saturation = Gauge(
+            "investment_llm_rate_limit_saturation",
+            "How close the tighter of a model's request and token budgets is to exhaustion (0 to 1).",
+            labels=("model",)
+        )
+        self.metrics = [
+            self.stage_seconds,
+            self.llm_call_seconds,
+            self.llm_call_tokens,
+            self.llm_tokens,
+            self.llm_cost,
+            self.llm_cache_hits,
+            self.analyses,
+            self.rate_limit_saturation
+        ]
+    
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def observe_span(self, stage: str, seconds: float) -> None:
+        """Record the duration of a workflow stage."""
+        self.stage_seconds.observe(seconds, stage=stage)
+    
+    def observe_llm_call(self, call: Dict[str, Any]) -> None:
+        """Record one LLM call as summarized by ``AnalysisMetrics.record_llm_call``."""
+        labels = {"phase": call["phase"], "model": call["model"]}
+        if call.get("cached"):
+            self.llm_cache_hits.inc(**labels)
+            return
+        self.llm_call_seconds.observe(call["seconds"], **labels)
+        for kind in ("prompt", "completion"):
+            tokens = call.get(f"{kind}_tokens")
+            if tokens is not None:
+                self.llm_call_tokens.observe(tokens, kind=kind, **labels)
+                self.llm_tokens.inc(tokens, kind=kind, **labels)
+        self.llm_cost.inc(call.get("cost_usd", 0.0), **labels)
+    
+    def observe_analysis(self, record: Dict[str, Any]) -> None:
+        """Replay the metrics of an analysis that ran in another process."""
+        metrics = record.get("metrics") or {}
+        for span in metrics.get("spans", []):
+            self.observe_span(span["stage"], span["seconds"])
+        for call in metrics.get("llm_calls", []):
+            self.observe_llm_call(call)
+        self.analyses.inc(status=record.get("status", "failed"))
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate the price of a call from LLM_PRICING (US dollars per million tokens)."""
+    input_price, output_price = settings.LLM_PRICING.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class AnalysisMetrics:
+    """Spans and LLM usage of one analysis, stored with its record."""
+    
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        """Initialize an empty collection that also feeds ``registry`` as it goes."""
+        self.registry = registry
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.llm_calls: List[Dict[str, Any]] = []
+        self._token: Optional[Token] = None
+    
+    def record_span(self, stage: str, seconds: float) -> None:
+        """Add a finished stage."""
+        self.spans.append({"stage": stage, "seconds": round(seconds, 4)})
+        if self.registry is not None:
+            self.registry.observe_span(stage, seconds)
+    
+    def record_llm_call(self, call: Dict[str, Any]) -> None:
+        """Add a finished LLM call."""
+        self.llm_calls.append(call)
+        if self.registry is not None:
+            self.registry.observe_llm_call(call)
+    
+    def finish(self, status: str) -> Dict[str, Any]:
+        """Stop collecting, record the whole analysis and return its summary."""
+        if self._token is not None:
+            _current_analysis.reset(self._token)
+            self._token = None
+        self.record_span("analysis", time.perf_counter() - self.started)
+        if self.registry is not None:
+            self.registry.analyses.inc(status=status)
+        return self.summary()
+    
+    def summary(self) -> Dict[str, Any]:
+        """Return per-stage durations, per-phase token usage and cost, plus the raw events."""
+        stages: Dict[str, float] = {}
+        for span in self.spans:
+            stages[span["stage"]] = round(stages.get(span["stage"], 0.0) + span["seconds"], 4)
+        
+        phases: Dict[str, Dict[str, Any]] = {}
+        for call in self.llm_calls:
+            phase = phases.setdefault(call["phase"], {
+                "calls": 0, "cached": 0, "seconds": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0
+            })
+            if call.get("cached"):
+                phase["cached"] += 1
+                continue
+            phase["calls"] += 1
+            phase["seconds"] = round(phase["seconds"] + call["seconds"], 4)
+            phase["prompt_tokens"] += call.get("prompt_tokens") or 0
+            phase["completion_tokens"] += call.get("completion_tokens") or 0
+            phase["cost_usd"] = round(phase["cost_usd"] + call.get("cost_usd", 0.0), 6)
+        
+        return {
+            "duration_seconds": round(time.perf_counter() - self.started, 4),
+            "stages": stages,
+            "llm": phases,
+            "total_tokens": sum(p["prompt_tokens"] + p["completion_tokens"] for p in phases.values()),
+            "cost_usd": round(sum(p["cost_usd"] for p in phases.values()), 6),
+            "spans": self.spans,
+            "llm_calls": self.llm_calls
+        }
+
+
+# Global metrics registry instance
+metrics_registry = MetricsRegistry()
+
+# Metrics of the analysis running in the current task, if any
+_current_analysis: ContextVar[Optional[AnalysisMetrics]] = ContextVar("current_analysis", default=None)
+
+
+def start_analysis_metrics() -> AnalysisMetrics:
+    """Collect the spans and LLM calls of the current task and its subtasks until ``finish``."""
+    collector = AnalysisMetrics(metrics_registry)
+    collector._token = _current_analysis.set(collector)
+    return collector
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a workflow stage into the stage histogram and the current analysis."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        collector = _current_analysis.get()
+        if collector is not None:
+            collector.record_span(stage, seconds)
+        else:
+            metrics_registry.observe_span(stage, seconds)
+
+
+def record_llm_call(
+    phase: Optional[str],
+    model: str,
+    seconds: float,
+    usage: Any = None,
+    cached: bool = False
+) -> None:
+    """Record one LLM call with the token usage reported by the API."""
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    call: Dict[str, Any] = {
+        "phase": phase or "unknown",
+        "model": model,
+        "seconds": round(seconds, 4),
+        "cached": cached
+    }
+    if prompt_tokens is not None or completion_tokens is not None:
+        call["prompt_tokens"] = prompt_tokens or 0
+        call["completion_tokens"] = completion_tokens or 0
+        call["cost_usd"] = round(estimate_cost(model, prompt_tokens or 0, completion_tokens or 0), 8)
+    
+    collector = _current_analysis.get()
+    if collector is not None:
+        collector.record_llm_call(call)
+    else:
+        metrics_registry.observe_llm_call(call)
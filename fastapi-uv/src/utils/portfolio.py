@@ -0,0 +1,134 @@
+"""Canonical portfolios: parsed, validated ticker sets with a stable key."""
+
+import hashlib
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import FrozenSet, Iterator, List, Optional, Tuple
+
+from ..config.settings import settings
+
+# Exchange tickers, optionally with a share class or market suffix (BRK.B, BTC-USD, 7203.T)
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9]{1,10}([.\-][A-Z0-9]{1,4})?$")
+
+# First-column values of a CSV header row
+HEADER_NAMES = ("SYMBOL", "TICKER")
+
+
+class InvalidPortfolioError(ValueError):
+    """Raised when a company list is empty or contains unknown symbols."""
+
+
+def normalize_symbol(symbol: str) -> str:
+    """Return a symbol stripped, upper-cased and without a leading cashtag ``$``."""
+    return symbol.strip().lstrip("$").strip().upper()
+
+
+def parse_symbols(companies: Optional[str]) -> List[str]:
+    """Split a comma-separated company list into unique normalized symbols, in input order."""
+    symbols = [normalize_symbol(symbol) for symbol in (companies or "").split(",")]
+    return list(dict.fromkeys(symbol for symbol in symbols if symbol))
+
+
+class SymbolTable:
+    """Known ticker symbols loaded from a local file, one per line.
+    
+    Lines may be CSV rows whose first column is the symbol; blank lines and
+    ``#`` comments are ignored. Without a file only the symbol format is checked.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        """Initialize the table; the file is read on first use."""
+        self.path = path if path is not None else settings.SYMBOL_TABLE_PATH
+        self._symbols: Optional[FrozenSet[str]] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        """Return whether a symbol table file is configured and present."""
+        return bool(self.path) and Path(self.path).is_file()
+    
+    def symbols(self) -> FrozenSet[str]:
+        """Return every known symbol."""
+        if self._symbols is None:
+            with self._lock:
+                if self._symbols is None:
+                    self._symbols = self._load()
+        return self._symbols
+    
+    def unknown(self, symbols: List[str]) -> List[str]:
+        """Return the symbols that are malformed or missing from the table."""
+        known = self.symbols() if self.enabled else None
+        return [
+            symbol for symbol in symbols
+            if not SYMBOL_PATTERN.match(symbol) or (known is not None and symbol not in known)
+        ]
+    
+    def _load(self) -> FrozenSet[str]:
+        """Read the symbol file."""
+        if not self.enabled:
+            return frozenset()
+        symbols = set()
+        for line in Path(self.path).read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            symbol = normalize_symbol(line.split(",", 1)[0])
+            if symbol and symbol not in HEADER_NAMES:
+                symbols.add(symbol)
+        return frozenset(symbols)
+
+
+@dataclass(frozen=True)
+class Portfolio:
+    """A deduplicated, sorted set of upper-cased ticker symbols."""
+    
+    symbols: Tuple[str, ...]
+    
+    @classmethod
+    def parse(
+        cls,
+        companies: Optional[str],
+        validate: bool = True,
+        table: Optional["SymbolTable"] = None
+    ) -> "Portfolio":
+        """Build the canonical portfolio of a comma-separated company list.
+        
+        With ``validate``, raises InvalidPortfolioError for an empty list or
+        symbols that are malformed or missing from the symbol table.
+        """
+        symbols = tuple(sorted(parse_symbols(companies)))
+        if validate:
+            if not symbols:
+                raise InvalidPortfolioError("At least one company symbol is required")
+            unknown = (table or symbol_table).unknown(list(symbols))
+            if unknown:
+                raise InvalidPortfolioError(f"Invalid or unknown company symbols: {', '.join(unknown)}")
+        return cls(symbols)
+    
+    @property
+    def companies(self) -> str:
+        """Return the canonical comma-separated company list."""
+        return ", ".join(self.symbols)
+    
+    @property
+    def key(self) -> str:
+        """Return a stable hash of the symbol set, shared by every spelling of the portfolio."""
+        return hashlib.sha256(",".join(self.symbols).encode("utf-8")).hexdigest()[:32]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.symbols)
+    
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+
+def portfolio_key(companies: Optional[str]) -> Optional[str]:
+    """Return the canonical key of a company list, or None when it has no symbols."""
+    portfolio = Portfolio.parse(companies, validate=False)
+    return portfolio.key if portfolio.symbols else None
+
+
+# Global symbol table instance
+symbol_table = SymbolTable()
@@ -0,0 +1,455 @@
+"""Per-analysis progress events published by the workflow and pushed to clients."""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..config.settings import settings
+
+# Events after which no more events are published for an analysis
+TERMINAL_EVENTS = ("completed", "failed")
+
+# High-volume events pushed to live subscribers but never replayed
+TRANSIENT_EVENTS = ("token",)
+
+
+class Subscription:
+    """Pending events of one live subscriber, with a bounded backlog of token events.
+    
+    Once ``token_limit`` token events are waiting, a further delta is appended
+    to the last waiting one of the same stream, or dropped if another event
+    came in between, so a slow client cannot make the backlog grow without
+    bound. Other events are always kept.
+    """
+    
+    def __init__(self, token_limit: int):
+        """Initialize an empty backlog."""
+        self.token_limit = token_limit
+        self.tokens = 0
+        self.dropped = 0
+        self._messages: Deque[Dict[str, Any]] = deque()
+        self._ready = asyncio.Event()
+    
+    def put(self, message: Dict[str, Any]) -> None:
+        """Add an event without blocking."""
+        if message["event"] in TRANSIENT_EVENTS:
+            if self.tokens >= self.token_limit:
+                self._coalesce(message)
+                return
+            self.tokens += 1
+        self._messages.append(message)
+        self._ready.set()
+    
+    def _coalesce(self, message: Dict[str, Any]) -> None:
+        """Merge a token event into the last waiting one of the same stream, else drop it."""
+        last = self._messages[-1] if self._messages else None
+        data = message["data"]
+        if (
+            last is None
+            or last["event"] != message["event"]
+            or {**last["data"], "delta": None} != {**data, "delta": None}
+        ):
+            self.dropped += 1
+            return
+        # Messages are shared between subscribers, so the merged one is a copy
+        self._messages[-1] = {
+            **message,
+            "data": {**data, "delta": last["data"].get("delta", "") + data.get("delta", "")}
+        }
+    
+    async def get(self) -> Dict[str, Any]:
+        """Wait for and return the oldest pending event."""
+        while not self._messages:
+            self._ready.clear()
+            await self._ready.wait()
+        message = self._messages.popleft()
+        if message["event"] in TRANSIENT_EVENTS:
+            self.tokens -= 1
+        return message
+
+
+class ProgressBroker:
+    """In-process publish/subscribe channel with a short replay history per analysis."""
+    
+    # Whether events published in one process reach subscribers in another
+    shared = False
+    
+    def __init__(
+        self,
+        history_limit: int = 500,
+        retention: float = 300.0,
+        max_idle: float = 3600.0,
+        token_backlog: int = 1000
+    ):
+        """Initialize the broker.
+        
+        Finished histories are kept for ``retention`` seconds, and histories
+        of analyses that published nothing for ``max_idle`` seconds are
+        dropped even if they never finished. Each subscriber holds at most
+        ``token_backlog`` undelivered token events.
+        """
+        self.history_limit = history_limit
+        self.retention = retention
+        self.max_idle = max_idle
+        self.token_backlog = token_backlog
+        self._history: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._updated: Dict[str, float] = {}
+        self._swept = time.time()
+        self._subscribers: Dict[str, List[Subscription]] = defaultdict(list)
+    
+    def publish(self, analysis_id: str, event: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """Record an event and push it to every live subscriber without blocking."""
+        message = {"event": event, "data": data or {}, "time": time.time()}
+        history = self._history.setdefault(analysis_id, deque(maxlen=self.history_limit))
+        if event not in TRANSIENT_EVENTS:
+            history.append(message)
+        for subscription in self._subscribers.get(analysis_id, []):
+            subscription.put(message)
+        self._touch(analysis_id, message["time"])
+        
+        if event in TERMINAL_EVENTS:
+            try:
+                asyncio.get_running_loop().call_later(self.retention, self._forget, analysis_id)
+            except RuntimeError:
+                self._forget(analysis_id)
+    
+    def _touch(self, analysis_id: str, now: float) -> None:
+        """Note an event of an analysis and now and then drop the histories gone idle."""
+        self._updated[analysis_id] = now
+        if now - self._swept < min(self.max_idle, 60.0):
+            return
+        self._swept = now
+        for idle_id, updated in list(self._updated.items()):
+            # An analysis that never finishes (e.g. its worker died) would keep its history forever
+            if now - updated > self.max_idle and not self._subscribers.get(idle_id):
+                self._forget(idle_id)
+    
+    async def copy_history(self, source_id: str, target_id: str, skip: Tuple[str, ...] = ()) -> None:
+        """Publish the buffered events of ``source_id`` to ``target_id``, except ``skip`` events."""
+        for message in list(self._history.get(source_id, ())):
+            if message["event"] not in skip and message["event"] not in TERMINAL_EVENTS:
+                self.publish(target_id, message["event"], message["data"])
+    
+    async def has_history(self, analysis_id: str) -> bool:
+        """Return whether any events are buffered for an analysis."""
+        return analysis_id in self._history
+    
+    async def subscribe(
+        self,
+        analysis_id: str,
+        heartbeat: Optional[float] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Replay buffered events, then yield live ones until a terminal event.
+        
+        When ``heartbeat`` is set, None is yielded after that many idle seconds.
+        """
+        # Snapshot and register together so no event is missed or duplicated
+        subscription = Subscription(self.token_backlog)
+        replay = list(self._history.get(analysis_id, ()))
+        self._subscribers[analysis_id].append(subscription)
+        try:
+            for message in replay:
+                yield message
+                if message["event"] in TERMINAL_EVENTS:
+                    return
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield message
+                if message["event"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            subscribers = self._subscribers.get(analysis_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(analysis_id, None)
+    
+    def startup(self) -> None:
+        """Open the broker's resources; an in-process broker has none."""
+    
+    def flush(self) -> None:
+        """Deliver any buffered events; in-process events are never buffered."""
+    
+    async def drain(self) -> None:
+        """Wait until every published event has been delivered."""
+    
+    def shutdown(self) -> None:
+        """Deliver any buffered events and release the broker's resources."""
+    
+    def _forget(self, analysis_id: str) -> None:
+        """Drop the replay history of a finished or abandoned analysis."""
+        self._history.pop(analysis_id, None)
+        self._updated.pop(analysis_id, None)
+
+
+class SQLiteProgressBroker(ProgressBroker):
+    """Progress channel shared by every process on the host through a SQLite table.
+    
+    Token events are buffered for ``flush_delay`` seconds and written in one
+    batch; any other event flushes the buffer at once so ordering is kept.
+    Writes run on a single writer thread with its own connection, so a busy
+    database never blocks the event loop. Subscribers poll for rows they have
+    not seen yet from the thread pool, so an API worker can stream the
+    progress of an analysis running in another worker or process.
+    """
+    
+    shared = True
+    
+    def __init__(
+        self,
+        path: str,
+        retention: float = 300.0,
+        poll_interval: float = 0.2,
+        flush_delay: float = 0.05,
+        token_retention: float = 60.0,
+        max_idle: float = 3600.0
+    ):
+        """Prepare the event table at ``path``; it is opened on first use."""
+        super().__init__(retention=retention, max_idle=max_idle)
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.flush_delay = flush_delay
+        self.token_retention = token_retention
+        self._pid: Optional[int] = None
+        self._open_lock = threading.Lock()
+    
+    def startup(self) -> None:
+        """Open the broker in the current process unless it already is."""
+        if self._pid != os.getpid():
+            with self._open_lock:
+                if self._pid != os.getpid():
+                    self._open()
+    
+    def _open(self) -> None:
+        """Create the table, start the writer thread and open the connections of this process.
+        
+        Called again after a fork, since the parent's thread and connections do
+        not carry over to a child process.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._pending: List[Tuple[str, str, str, float]] = []
+        self._flush_scheduled = False
+        self._flushes = 0
+        self._last_write: Optional[Future] = None
+        # Only the writer thread uses the write connection, only pool threads the read one
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="progress-writer")
+        self._conn = self._connect()
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS progress_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                analysis_id TEXT NOT NULL,
+                event TEXT NOT NULL,
+                data TEXT NOT NULL,
+                time REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS progress_events_analysis_idx ON progress_events (analysis_id, id);
+            CREATE INDEX IF NOT EXISTS progress_events_time_idx ON progress_events (time);
+            """
+        )
+        self._conn.commit()
+        self._read_conn = self._connect()
+        self._read_lock = threading.Lock()
+        self._pid = os.getpid()
+    
+    def _submit(self, fn: Callable[..., None], *args: Any) -> Future:
+        """Run ``fn`` on the writer thread of the current process."""
+        self.startup()
+        return self._writer.submit(fn, *args)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the event table."""
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def publish(self, analysis_id: str, event: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """Queue an event for the shared table; non-token events are written immediately."""
+        self.startup()
+        created = time.time()
+        self._pending.append((analysis_id, event, json.dumps(data or {}), created))
+        if event not in TRANSIENT_EVENTS:
+            # Kept locally too, so a coalesced request can catch up without a read
+            history = self._history.setdefault(analysis_id, deque(maxlen=self.history_limit))
+            history.append({"event": event, "data": data or {}, "time": created})
+            self._touch(analysis_id, created)
+        
+        if event not in TRANSIENT_EVENTS:
+            self.flush()
+        elif not self._flush_scheduled:
+            try:
+                asyncio.get_running_loop().call_later(self.flush_delay, self.flush)
+                self._flush_scheduled = True
+            except RuntimeError:
+                self.flush()
+        
+        if event in TERMINAL_EVENTS:
+            try:
+                asyncio.get_running_loop().call_later(self.retention, self._forget, analysis_id)
+            except RuntimeError:
+                self._forget(analysis_id)
+    
+    def flush(self) -> None:
+        """Hand the buffered events to the writer thread without waiting for the write."""
+        self.startup()
+        self._flush_scheduled = False
+        rows, self._pending = self._pending, []
+        if rows:
+            self._last_write = self._submit(self._write, rows)
+    
+    async def drain(self) -> None:
+        """Wait until every event published so far is in the table."""
+        self.flush()
+        if self._last_write is not None:
+            await asyncio.wrap_future(self._last_write)
+    
+    async def has_history(self, analysis_id: str) -> bool:
+        if analysis_id in self._history:
+            return True
+        await self.drain()
+        row = await asyncio.to_thread(
+            self._fetch, "SELECT 1 FROM progress_events WHERE analysis_id = ? LIMIT 1", (analysis_id,)
+        )
+        return bool(row)
+    
+    async def copy_history(self, source_id: str, target_id: str, skip: Tuple[str, ...] = ()) -> None:
+        if source_id in self._history:
+            # Published by this process: copied before any await, so in order with live events
+            await super().copy_history(source_id, target_id, skip)
+            return
+        
+        # Published by another process; events from now on reach the target directly
+        cutoff = time.time()
+        _, replay = await asyncio.to_thread(self._read, source_id, 0, True)
+        for message in replay:
+            if message["time"] < cutoff and message["event"] not in skip + TERMINAL_EVENTS:
+                self.publish(target_id, message["event"], message["data"])
+    
+    async def subscribe(
+        self,
+        analysis_id: str,
+        heartbeat: Optional[float] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Replay stored events, then poll for new ones until a terminal event."""
+        await self.drain()
+        last_id, replay = await asyncio.to_thread(self._read, analysis_id, 0, True)
+        for message in replay:
+            yield message
+            if message["event"] in TERMINAL_EVENTS:
+                return
+        
+        idle = 0.0
+        while True:
+            self.flush()
+            last_id, messages = await asyncio.to_thread(self._read, analysis_id, last_id, False)
+            for message in messages:
+                yield message
+                if message["event"] in TERMINAL_EVENTS:
+                    return
+            if messages:
+                idle = 0.0
+                continue
+            await asyncio.sleep(self.poll_interval)
+            idle += self.poll_interval
+            if heartbeat is not None and idle >= heartbeat:
+                idle = 0.0
+                yield None
+    
+    def shutdown(self) -> None:
+        """Write the buffered events and stop the writer thread."""
+        if self._pid != os.getpid():
+            return
+        self.flush()
+        self._writer.shutdown(wait=True)
+    
+    def _write(self, rows: List[Tuple[str, str, str, float]]) -> None:
+        """Insert a batch of events in one transaction; runs on the writer thread."""
+        self._conn.executemany(
+            "INSERT INTO progress_events (analysis_id, event, data, time) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        self._conn.commit()
+        self._flushes += 1
+        if self._flushes % 200 == 0:
+            self._purge()
+    
+    def _purge(self) -> None:
+        """Delete token events past their short retention and events of long-finished analyses."""
+        now = time.time()
+        self._conn.execute(
+            "DELETE FROM progress_events WHERE event IN (%s) AND time < ?"
+            % ", ".join("?" for _ in TRANSIENT_EVENTS),
+            (*TRANSIENT_EVENTS, now - self.token_retention)
+        )
+        # Analyses whose owner never got to forget them (e.g. a restarted worker)
+        self._conn.execute(
+            "DELETE FROM progress_events WHERE time < ?", (now - max(self.retention, 86400.0),)
+        )
+        self._conn.commit()
+    
+    def _fetch(self, query: str, params: Tuple[Any, ...]) -> List[Tuple[Any, ...]]:
+        """Run a read query on the read connection; runs in a pool thread."""
+        self.startup()
+        with self._read_lock:
+            return self._read_conn.execute(query, params).fetchall()
+    
+    def _read(
+        self,
+        analysis_id: str,
+        after_id: int,
+        replay: bool
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Return the last event id and the events after ``after_id``; replays skip token events."""
+        rows = self._fetch(
+            "SELECT id, event, data, time FROM progress_events "
+            "WHERE analysis_id = ? AND id > ? ORDER BY id",
+            (analysis_id, after_id)
+        )
+        last_id = rows[-1][0] if rows else after_id
+        messages = [
+            {"event": event, "data": json.loads(data), "time": created}
+            for _, event, data, created in rows
+            if not (replay and event in TRANSIENT_EVENTS)
+        ]
+        return last_id, messages
+    
+    def _forget(self, analysis_id: str) -> None:
+        super()._forget(analysis_id)
+        self._submit(self._delete, analysis_id)
+    
+    def _delete(self, analysis_id: str) -> None:
+        """Delete the events of an analysis; runs on the writer thread."""
+        self._conn.execute("DELETE FROM progress_events WHERE analysis_id = ?", (analysis_id,))
+        self._conn.commit()
+
+
+def create_progress_broker() -> ProgressBroker:
+    """Build the progress broker selected by PROGRESS_BACKEND."""
+    if settings.PROGRESS_BACKEND == "memory":
+        return ProgressBroker(
+            max_idle=settings.PROGRESS_HISTORY_MAX_IDLE,
+            token_backlog=settings.PROGRESS_TOKEN_BACKLOG
+        )
+    if settings.PROGRESS_BACKEND == "sqlite":
+        return SQLiteProgressBroker(
+            path=settings.PROGRESS_STORE_PATH,
+            poll_interval=settings.PROGRESS_POLL_INTERVAL,
+            max_idle=settings.PROGRESS_HISTORY_MAX_IDLE
+        )
+    raise ValueError(f"Unknown PROGRESS_BACKEND: {settings.PROGRESS_BACKEND}")
+
+
+# Global progress broker instance
+progress_broker = create_progress_broker()
@@ -0,0 +1,179 @@
+"""Process-wide request and token rate limiting for LLM calls."""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..config.settings import settings
+from .tokenizer import approximate_tokens
+
+
+class RateLimitExceededError(Exception):
+    """Raised when the provider keeps rejecting a call after the limiter backed off."""
+
+
+class TokenBucket:
+    """Continuously refilling bucket; the balance may go negative after reconciliation."""
+    
+    def __init__(self, capacity: float, per_seconds: float = 60.0):
+        """Initialize a full bucket that refills ``capacity`` units every ``per_seconds``."""
+        self.capacity = capacity
+        self.rate = capacity / per_seconds
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self) -> None:
+        """Add the units accrued since the last update."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Return the seconds until ``amount`` units are available."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+    
+    def consume(self, amount: float) -> None:
+        """Take ``amount`` units; negative amounts return units to the bucket."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+    
+    def available(self) -> float:
+        """Return the units available right now."""
+        self._refill()
+        return max(self.tokens, 0.0)
+
+
+class ModelRateLimiter:
+    """Requests-per-minute and tokens-per-minute budgets for one model."""
+    
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        """Initialize both buckets full."""
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+        self.waiting = 0
+        self.granted = 0
+        self.rate_limited = 0
+        self.throttled_seconds = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _queue(self) -> asyncio.Lock:
+        """Return the FIFO admission lock for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+    
+    async def acquire(self, tokens: float) -> None:
+        """Wait, in arrival order, until one request and ``tokens`` tokens fit the budget."""
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            # The lock admits waiters first come, first served
+            async with self._queue():
+                while True:
+                    delay = max(
+                        self.requests.wait_time(1),
+                        self.tokens.wait_time(tokens),
+                        self.paused_until - time.monotonic()
+                    )
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                self.requests.consume(1)
+                self.tokens.consume(tokens)
+                self.granted += 1
+        finally:
+            self.waiting -= 1
+            self.throttled_seconds += time.monotonic() - started
+    
+    def reconcile(self, estimated: float, actual: float) -> None:
+        """Correct the token budget once the provider reports actual usage."""
+        self.tokens.consume(actual - estimated)
+    
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller after the provider answered 429."""
+        self.rate_limited += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+    
+    def saturation(self) -> float:
+        """Return how close the tighter of the two budgets is to exhaustion (0 to 1)."""
+        if self.waiting or self.paused_until > time.monotonic():
+            return 1.0
+        return round(1 - min(
+            self.requests.available() / self.requests.capacity,
+            self.tokens.available() / self.tokens.capacity
+        ), 4)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return budget usage and throttling counters."""
+        return {
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "requests_available": round(self.requests.available(), 2),
+            "tokens_available": round(self.tokens.available(), 2),
+            "waiting": self.waiting,
+            "granted": self.granted,
+            "rate_limited": self.rate_limited,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "saturation": self.saturation()
+        }
+
+
+class RateLimiter:
+    """Shared per-model limiter consulted before every chat completion."""
+    
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        overrides: Optional[Dict[str, Tuple[float, float]]] = None,
+        shares: int = 1
+    ):
+        """Initialize with default budgets and optional per-model (rpm, tpm) overrides.
+        
+        With ``shares`` > 1 the budgets are split evenly between that many
+        processes, so the API workers and job processes together stay within
+        the account limits.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.overrides = overrides or {}
+        self.shares = max(shares, 1)
+        self._models: Dict[str, ModelRateLimiter] = {}
+    
+    def for_model(self, model: str) -> ModelRateLimiter:
+        """Return the limiter of a model, creating it on first use."""
+        limiter = self._models.get(model)
+        if limiter is None:
+            rpm, tpm = self.overrides.get(model, (self.requests_per_minute, self.tokens_per_minute))
+            limiter = self._models[model] = ModelRateLimiter(rpm / self.shares, tpm / self.shares)
+        return limiter
+    
+    @staticmethod
+    def estimate_tokens(prompt: str, max_tokens: int) -> int:
+        """Estimate the tokens a call is charged for: the prompt plus its completion allowance.
+        
+        The prompt is approximated rather than encoded, since this runs on the
+        event loop for every call and is reconciled with the reported usage.
+        """
+        return approximate_tokens(prompt) + max_tokens
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return per-model statistics."""
+        return {model: limiter.stats() for model, limiter in self._models.items()}
+
+
+# Global LLM rate limiter instance
+rate_limiter = RateLimiter(
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+    overrides=settings.LLM_RATE_LIMIT_OVERRIDES,
+    shares=settings.LLM_BUDGET_SHARES
+)
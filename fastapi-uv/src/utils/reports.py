@@ -0,0 +1,222 @@
+"""Rendering and atomic, off-loop persistence of analysis reports."""
+
+import asyncio
+import io
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..api.models.schemas import (
+    StockAnalysisResult,
+    InvestmentRanking,
+    PortfolioAllocation
+)
+from ..config.settings import settings
+
+DISCLAIMER = "*This analysis is for educational purposes only and should not be considered as financial advice.*"
+
+
+def render_stock_report(report_id: str, analysis: StockAnalysisResult, generated: str) -> str:
+    """Render the stock analysis report as Markdown."""
+    return f"""# Stock Analysis Report
+
+**Analysis ID:** {report_id}
+**Companies:** {analysis.company_symbols}
+**Generated:** {generated}
+
+## Market Analysis
+{analysis.market_analysis}
+
+## Financial Metrics
+{analysis.financial_metrics}
+
+## Risk Assessment
+{analysis.risk_assessment}
+
+## Recommendations
+{analysis.recommendations}
+
+---
+{DISCLAIMER}
+"""
+
+
+def render_research_report(report_id: str, ranking: InvestmentRanking, generated: str) -> str:
+    """Render the investment ranking report as Markdown."""
+    return f"""# Investment Ranking Report
+
+**Analysis ID:** {report_id}
+**Generated:** {generated}
+
+## Company Rankings
+{ranking.ranked_companies}
+
+## Investment Rationale
+{ranking.investment_rationale}
+
+## Risk Evaluation
+{ranking.risk_evaluation}
+
+## Growth Potential
+{ranking.growth_potential}
+
+---
+{DISCLAIMER}
+"""
+
+
+def render_portfolio_report(report_id: str, allocation: PortfolioAllocation, generated: str) -> str:
+    """Render the portfolio strategy report as Markdown."""
+    return f"""# Investment Portfolio Report
+
+**Analysis ID:** {report_id}
+**Generated:** {generated}
+
+## Allocation Strategy
+{allocation.allocation_strategy}
+
+## Investment Thesis
+{allocation.investment_thesis}
+
+## Risk Management
+{allocation.risk_management}
+
+## Final Recommendations
+{allocation.final_recommendations}
+
+---
+{DISCLAIMER}
+"""
+
+
+class ReportWriter:
+    """Renders and writes all of an analysis's reports in one batch off the event loop.
+    
+    Every file is written to a temporary name and renamed into place, so readers
+    never see a partial report.
+    """
+    
+    def __init__(
+        self,
+        reports_dir: str,
+        fsync: Optional[bool] = None,
+        archive: Optional[bool] = None,
+        workers: Optional[int] = None
+    ):
+        """Initialize the writer with a dedicated pool for disk I/O."""
+        self.reports_dir = Path(reports_dir)
+        self.fsync = settings.REPORTS_FSYNC if fsync is None else fsync
+        self.archive = settings.REPORTS_ARCHIVE if archive is None else archive
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or settings.REPORTS_WRITER_THREADS,
+            thread_name_prefix="report-writer"
+        )
+    
+    async def write_reports(
+        self,
+        analysis_id: str,
+        stock_analysis: StockAnalysisResult,
+        investment_ranking: InvestmentRanking,
+        portfolio_allocation: PortfolioAllocation
+    ) -> Dict[str, str]:
+        """Render and persist the three reports; return their paths by kind."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            self._write_batch,
+            analysis_id,
+            stock_analysis,
+            investment_ranking,
+            portfolio_allocation
+        )
+    
+    def _write_batch(
+        self,
+        analysis_id: str,
+        stock_analysis: StockAnalysisResult,
+        investment_ranking: InvestmentRanking,
+        portfolio_allocation: PortfolioAllocation
+    ) -> Dict[str, str]:
+        """Render every artifact, write each atomically and sync the directory once."""
+        generated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        documents = {
+            "stock_analysis": render_stock_report(
+                f"{analysis_id}_stock_analysis", stock_analysis, generated
+            ),
+            "research_analysis": render_research_report(
+                f"{analysis_id}_research_analysis", investment_ranking, generated
+            ),
+            "portfolio_strategy": render_portfolio_report(
+                f"{analysis_id}_portfolio_strategy", portfolio_allocation, generated
+            )
+        }
+        
+        self.reports_dir.mkdir(parents=True, exist_ok=True)
+        paths: Dict[str, str] = {}
+        for kind, content in documents.items():
+            path = self.reports_dir / f"{analysis_id}_{kind}.md"
+            self._write_atomic(path, content.encode("utf-8"))
+            paths[kind] = str(path)
+        
+        if self.archive:
+            path = self.reports_dir / f"{analysis_id}_reports.zip"
+            self._write_atomic(path, self._bundle(analysis_id, documents))
+            paths["archive"] = str(path)
+        
+        # One directory sync makes all of the renames above durable
+        if self.fsync:
+            self._sync_directory()
+        return paths
+    
+    @staticmethod
+    def _bundle(analysis_id: str, documents: Dict[str, str]) -> bytes:
+        """Pack the rendered reports into one zip archive."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for kind, content in documents.items():
+                archive.writestr(f"{analysis_id}_{kind}.md", content)
+        return buffer.getvalue()
+    
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        """Write to a temporary file in the same directory, then rename over ``path``."""
+        fd, temp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            # mkstemp creates owner-only files; reports are shared like before
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+    
+    def _sync_directory(self) -> None:
+        """Flush directory entries to disk where the platform allows it."""
+        try:
+            fd = os.open(str(self.reports_dir), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    
+    def shutdown(self) -> None:
+        """Stop the writer threads once pending writes finish."""
+        self._executor.shutdown(wait=True)
+
+
+# Global report writer instance
+report_writer = ReportWriter(reports_dir=settings.REPORTS_DIR)
@@ -0,0 +1,177 @@
+"""Retries, deadlines and hedged requests around remote calls."""
+
+import asyncio
+import random
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, TypeVar
+
+import openai
+from duckduckgo_search.exceptions import DuckDuckGoSearchException
+
+from ..config.settings import settings
+
+T = TypeVar("T")
+
+# Decides whether a failed call is worth another attempt
+RetryClassifier = Callable[[BaseException], bool]
+
+COUNTERS = ("calls", "retries", "timeouts", "hedges", "hedge_wins", "failures")
+
+
+def is_transient_llm_error(error: BaseException) -> bool:
+    """Retry timeouts, connection errors and server-side failures, never bad requests."""
+    if isinstance(error, (asyncio.TimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.RateLimitError):
+        # 429s are paced by the rate limiter, which gives up on purpose
+        return False
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409) or error.status_code >= 500
+    return False
+
+
+def is_transient_search_error(error: BaseException) -> bool:
+    """Retry search timeouts and DuckDuckGo errors, including its rate limiting."""
+    return isinstance(error, (asyncio.TimeoutError, DuckDuckGoSearchException))
+
+
+class Resilience:
+    """Retries with exponential backoff and full jitter, per-call deadlines and hedging.
+    
+    Latencies and counters are kept per key (e.g. the model name), so hedges
+    fire after that key's own high percentile.
+    """
+    
+    def __init__(
+        self,
+        retryable: RetryClassifier,
+        retries: int,
+        deadline: float,
+        hedge: bool = False,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        hedge_quantile: Optional[float] = None,
+        hedge_min_samples: Optional[int] = None,
+        window: int = 200
+    ):
+        """Initialize the policy; unset delays and hedge parameters come from settings."""
+        self.retryable = retryable
+        self.retries = retries
+        self.deadline = deadline
+        self.hedge = hedge
+        self.base_delay = settings.RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = settings.RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.hedge_quantile = hedge_quantile or settings.HEDGE_QUANTILE
+        self.hedge_min_samples = hedge_min_samples or settings.HEDGE_MIN_SAMPLES
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    
+    async def call(self, factory: Callable[[], Awaitable[T]], key: str = "default", hedge: bool = True) -> T:
+        """Run ``factory()``, retrying transient failures; ``hedge=False`` skips hedging.
+        
+        Latencies are measured over the whole ``factory()`` call, the same span the
+        hedge timer covers, so time the factory spends waiting for rate limits or
+        concurrency slots raises the hedge delay instead of triggering hedges.
+        """
+        counters = self._counters[key]
+        counters["calls"] += 1
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                hedge_after = self.hedge_delay(key) if self.hedge and hedge else None
+                if hedge_after is None:
+                    result = await factory()
+                else:
+                    result = await self._hedged(factory, key, hedge_after)
+            except Exception as e:
+                if attempt >= self.retries or not self.retryable(e):
+                    counters["failures"] += 1
+                    raise
+                counters["retries"] += 1
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            self._latencies[key].append(time.monotonic() - started)
+            return result
+    
+    async def timed(
+        self,
+        awaitable: Awaitable[T],
+        key: str = "default",
+        timeout: Optional[float] = None
+    ) -> T:
+        """Await one remote call under the deadline (or ``timeout``), counting timeouts."""
+        try:
+            return await asyncio.wait_for(awaitable, timeout=timeout or self.deadline)
+        except asyncio.TimeoutError:
+            self._counters[key]["timeouts"] += 1
+            raise
+    
+    def backoff(self, attempt: int) -> float:
+        """Return a full-jitter delay for the given retry attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+    
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """Return the latency percentile after which to hedge, once enough samples exist."""
+        latencies = self._latencies[key]
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(int(len(ordered) * self.hedge_quantile), len(ordered) - 1)]
+    
+    async def _hedged(self, factory: Callable[[], Awaitable[T]], key: str, delay: float) -> T:
+        """Start a backup call if the first is still running after ``delay``; take the first success."""
+        primary = asyncio.ensure_future(factory())
+        pending: Set[asyncio.Future] = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            
+            self._counters[key]["hedges"] += 1
+            backup = asyncio.ensure_future(factory())
+            pending.add(backup)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # exception() raises on a cancelled task instead of returning it
+                    if not task.cancelled() and task.exception() is None:
+                        if task is backup:
+                            self._counters[key]["hedge_wins"] += 1
+                        return task.result()
+                if not pending:
+                    # Both attempts failed; surface the last error
+                    return done.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return counters and the current hedge delay per key."""
+        stats = {}
+        for key, counters in self._counters.items():
+            hedge_after = self.hedge_delay(key)
+            stats[key] = {
+                **counters,
+                "hedge_after_seconds": round(hedge_after, 3) if hedge_after is not None else None
+            }
+        return stats
+
+
+# Global LLM call resilience instance
+llm_resilience = Resilience(
+    retryable=is_transient_llm_error,
+    retries=settings.LLM_RETRIES,
+    deadline=settings.LLM_CALL_DEADLINE,
+    hedge=settings.LLM_HEDGE_ENABLED
+)
+
+# Global web search resilience instance
+search_resilience = Resilience(
+    retryable=is_transient_search_error,
+    retries=settings.SEARCH_RETRIES,
+    deadline=settings.SEARCH_TIMEOUT,
+    hedge=settings.SEARCH_HEDGE_ENABLED
+)
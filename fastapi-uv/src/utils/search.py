@@ -0,0 +1,140 @@
+"""Non-blocking web search used to gather market data."""
+
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from duckduckgo_search import DDGS
+
+from ..config.settings import settings
+from .cache import SearchResultCache, search_cache as default_search_cache
+from .coalesce import SingleFlight, search_flight as default_search_flight
+from .metrics import span
+from .resilience import Resilience, search_resilience as default_search_resilience
+
+
+class WebSearch:
+    """Runs DuckDuckGo queries concurrently without blocking the event loop."""
+    
+    def __init__(
+        self,
+        max_results: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[SearchResultCache] = None,
+        resilience: Optional[Resilience] = None,
+        backend: Optional[str] = None,
+        flight: Optional[SingleFlight] = None
+    ):
+        """Initialize the search stage with a bounded worker pool."""
+        self.max_results = max_results or settings.SEARCH_MAX_RESULTS
+        self.cache = cache or default_search_cache
+        self.concurrency = concurrency or settings.SEARCH_CONCURRENCY
+        self.timeout = timeout or settings.SEARCH_TIMEOUT
+        self.resilience = resilience or default_search_resilience
+        self.backend = backend or settings.SEARCH_BACKEND
+        self.flight = flight or default_search_flight
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix="web-search"
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _text_search(self, query: str) -> List[Dict[str, str]]:
+        """Run one blocking text search against the configured backend."""
+        if self.backend == "mock":
+            return self._mock_search(query)
+        # Bounds each HTTP request, so a query that timed out does not hold its thread forever
+        return list(DDGS(timeout=max(int(self.timeout), 1)).text(query, max_results=self.max_results) or [])
+    
+    def _mock_search(self, query: str) -> List[Dict[str, str]]:
+        """Return deterministic offline results after a simulated network delay."""
+        time.sleep(settings.SEARCH_MOCK_LATENCY)
+        digest = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        return [
+            {
+                "title": f"{query} - result {index + 1}",
+                "body": f"Synthetic market coverage for {query} ({digest[index * 8:index * 8 + 8]}). "
+                        "Revenue, margins and guidance are discussed alongside analyst ratings.",
+                "href": f"https://example.com/{digest[:12]}/{index + 1}"
+            }
+            for index in range(self.max_results)
+        ]
+    
+    async def search(self, query: str) -> List[Dict[str, str]]:
+        """Run one query, retrying transient failures and hedging slow ones.
+        
+        Concurrent identical queries share one search.
+        """
+        return await self.flight.do(
+            f"{self.backend}|{self.max_results}|{query}",
+            lambda: self.resilience.call(lambda: self._search_once(query), key="search")
+        )
+    
+    async def _search_once(self, query: str) -> List[Dict[str, str]]:
+        """Run one query in the worker pool under the concurrency cap and timeout.
+        
+        A thread cannot be interrupted, so a query that times out is only no
+        longer awaited. It keeps its concurrency slot until its thread finishes,
+        so timed-out queries never pile up in the pool behind new ones.
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        semaphore = self._semaphore
+        
+        def finished(future: asyncio.Future) -> None:
+            semaphore.release()
+            if not future.cancelled():
+                # Retrieved so an error after a timeout is not reported as unhandled
+                future.exception()
+        
+        await semaphore.acquire()
+        future = loop.run_in_executor(self._executor, self._text_search, query)
+        future.add_done_callback(finished)
+        return await self.resilience.timed(asyncio.shield(future), key="search", timeout=self.timeout)
+    
+    async def search_companies(self, companies: List[str]) -> Dict[str, List[Dict[str, str]]]:
+        """Fan out one query per uncached ticker; failed tickers map to an empty list."""
+        template = settings.SEARCH_QUERY_TEMPLATE
+        results: Dict[str, List[Dict[str, str]]] = {}
+        
+        # Reuse fresh results from earlier analyses
+        pending = []
+        for company in companies:
+            cached = None
+            if settings.SEARCH_CACHE_ENABLED:
+                cached = await self.cache.aget(self.cache.make_key(company, template, self.max_results))
+            if cached is not None:
+                results[company] = cached
+            else:
+                pending.append(company)
+        
+        with span("search"):
+            outcomes = await asyncio.gather(
+                *(self.search(template.format(company=company.upper())) for company in pending),
+                return_exceptions=True
+            )
+        
+        for company, outcome in zip(pending, outcomes):
+            if isinstance(outcome, BaseException):
+                reason = "timed out" if isinstance(outcome, asyncio.TimeoutError) else str(outcome)
+                print(f"Search for {company} failed: {reason}")
+                results[company] = []
+                continue
+            results[company] = outcome
+            if settings.SEARCH_CACHE_ENABLED and outcome:
+                await self.cache.aset(
+                    self.cache.make_key(company, template, self.max_results),
+                    outcome,
+                    self.cache.ttl_for(company)
+                )
+        return results
+
+
+# Global web search instance
+web_search = WebSearch()
@@ -0,0 +1,207 @@
+"""Near-duplicate removal and ranking of search snippets before they enter the prompt."""
+
+import random
+import re
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from ..config.settings import settings
+
+_WORD = re.compile(r"[a-z0-9$%.]+")
+_YEAR = re.compile(r"\b(19[89]\d|20\d\d)\b")
+_RELATIVE_AGE = re.compile(r"\b(\d+)\s+(minute|hour|day|week|month|year)s?\s+ago\b", re.IGNORECASE)
+_FACT = re.compile(r"\d")
+
+# Words that mark a snippet as financially substantive
+FINANCIAL_TERMS = frozenset((
+    "revenue", "earnings", "eps", "margin", "margins", "guidance", "profit", "income",
+    "valuation", "dividend", "forecast", "outlook", "growth", "sales", "debt", "cash",
+    "quarter", "quarterly", "analyst", "analysts", "rating", "upgrade", "downgrade", "target"
+))
+
+# Days per unit of a relative age such as "3 days ago"
+AGE_UNITS = {"minute": 1 / 1440, "hour": 1 / 24, "day": 1, "week": 7, "month": 30, "year": 365}
+
+# Number of hash functions in a MinHash signature
+MINHASH_PERMUTATIONS = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _hash_parameters(count: int) -> List[Tuple[int, int]]:
+    """Return fixed (a, b) pairs for the universal hash family h(x) = (a*x + b) mod p."""
+    rng = random.Random(0)
+    return [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(count)]
+
+
+_HASH_PARAMETERS = _hash_parameters(MINHASH_PERMUTATIONS)
+
+
+def _shingles(text: str, size: int = 3) -> FrozenSet[int]:
+    """Return the hashed word ``size``-grams of ``text``."""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return frozenset([zlib.crc32(" ".join(words).encode("utf-8"))]) if words else frozenset()
+    return frozenset(
+        zlib.crc32(" ".join(words[index:index + size]).encode("utf-8"))
+        for index in range(len(words) - size + 1)
+    )
+
+
+def _minhash(shingles: FrozenSet[int]) -> Tuple[int, ...]:
+    """Return the MinHash signature of a shingle set."""
+    if not shingles:
+        return tuple([_MAX_HASH] * MINHASH_PERMUTATIONS)
+    return tuple(
+        min(((a * shingle + b) % _MERSENNE_PRIME) & _MAX_HASH for shingle in shingles)
+        for a, b in _HASH_PARAMETERS
+    )
+
+
+def _similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimate the Jaccard similarity of two shingle sets from their signatures."""
+    return sum(x == y for x, y in zip(first, second)) / MINHASH_PERMUTATIONS
+
+
+class SnippetProcessor:
+    """Near-dedupes, scores and trims the search results of each ticker.
+    
+    Results are compared with MinHash signatures over word shingles, so
+    syndicated copies of the same article collapse to the first one. The
+    rest are ranked by relevance to the ticker and recency, and the best
+    ones are kept up to ``top_k`` results and ``char_budget`` characters.
+    """
+    
+    def __init__(
+        self,
+        top_k: Optional[int] = None,
+        char_budget: Optional[int] = None,
+        similarity_threshold: Optional[float] = None,
+        enabled: Optional[bool] = None
+    ):
+        """Initialize the limits applied to each ticker's results."""
+        self.top_k = top_k or settings.SNIPPET_TOP_K
+        self.char_budget = char_budget or settings.SNIPPET_CHAR_BUDGET
+        self.similarity_threshold = similarity_threshold or settings.SNIPPET_SIMILARITY_THRESHOLD
+        self.enabled = settings.SNIPPET_PROCESSING_ENABLED if enabled is None else enabled
+    
+    def process(
+        self,
+        symbol: str,
+        results: Sequence[Dict[str, str]],
+        now: Optional[datetime] = None
+    ) -> List[Dict[str, str]]:
+        """Return the deduplicated, best-ranked results of ``symbol`` within the budget."""
+        if not self.enabled:
+            return list(results)
+        
+        now = now or datetime.now(timezone.utc)
+        unique = self._deduplicate(results)
+        # Off-topic results are dropped unless nothing else is left
+        relevant = [result for result in unique if self.relevance(symbol, result) > 0] or unique
+        ranked = sorted(
+            enumerate(relevant),
+            key=lambda item: (-self.score(symbol, item[1], now), item[0])
+        )
+        
+        selected: List[Dict[str, str]] = []
+        used = 0
+        for _, result in ranked:
+            if len(selected) >= self.top_k:
+                break
+            snippet = self.compact(result)
+            size = self.size(snippet)
+            if used + size > self.char_budget:
+                # Trim the body of the first result that does not fit instead of dropping it
+                room = self.char_budget - used - self.size({**snippet, "body": ""})
+                if selected or room < 80:
+                    continue
+                snippet["body"] = snippet["body"][:room].rsplit(" ", 1)[0] + "..."
+                size = self.size(snippet)
+            selected.append(snippet)
+            used += size
+        return selected
+    
+    def _deduplicate(self, results: Sequence[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Drop results whose title and body are near-duplicates of an earlier result."""
+        unique: List[Dict[str, str]] = []
+        signatures: List[Tuple[int, ...]] = []
+        for result in results:
+            text = f"{result.get('title', '')} {result.get('body', '')}"
+            signature = _minhash(_shingles(text))
+            if any(_similarity(signature, seen) >= self.similarity_threshold for seen in signatures):
+                continue
+            unique.append(result)
+            signatures.append(signature)
+        return unique
+    
+    def score(self, symbol: str, result: Dict[str, str], now: datetime) -> float:
+        """Score a result by relevance and recency."""
+        return self.relevance(symbol, result) + 3.0 * self.recency(result, now)
+    
+    @staticmethod
+    def relevance(symbol: str, result: Dict[str, str]) -> float:
+        """Score how much a result is about ``symbol`` and its financials; 0 when it is off-topic."""
+        title = result.get("title") or ""
+        body = result.get("body") or ""
+        mention = re.compile(rf"(?<![A-Za-z]){re.escape(symbol)}(?![A-Za-z])", re.IGNORECASE)
+        terms = len(set(_WORD.findall(f"{title} {body}".lower())) & FINANCIAL_TERMS)
+        if not terms and not mention.search(f"{title} {body}"):
+            return 0.0
+        
+        relevance = 2.0 * bool(mention.search(title)) + 1.0 * bool(mention.search(body))
+        relevance += min(terms, 4) * 0.5
+        return relevance + 0.5 * bool(_FACT.search(body))
+    
+    @staticmethod
+    def recency(result: Dict[str, str], now: datetime) -> float:
+        """Return 1.0 for results from today, decaying with age; 0.5 when the age is unknown."""
+        age_days = None
+        published = result.get("date")
+        if published:
+            try:
+                moment = datetime.fromisoformat(str(published).replace("Z", "+00:00"))
+                if moment.tzinfo is None:
+                    moment = moment.replace(tzinfo=timezone.utc)
+                age_days = max((now - moment).total_seconds() / 86400, 0.0)
+            except ValueError:
+                age_days = None
+        
+        text = f"{result.get('title', '')} {result.get('body', '')}"
+        if age_days is None:
+            relative = _RELATIVE_AGE.search(text)
+            if relative:
+                age_days = int(relative.group(1)) * AGE_UNITS[relative.group(2).lower()]
+        if age_days is None:
+            years = [int(year) for year in _YEAR.findall(text) if int(year) <= now.year]
+            if years:
+                # Only the year is known: assume the middle of the most recent one mentioned
+                age_days = max((now.year - max(years)) * 365 + now.timetuple().tm_yday - 182, 0)
+        if age_days is None:
+            return 0.5
+        # Halves every 90 days
+        return 0.5 ** (age_days / 90)
+    
+    @staticmethod
+    def compact(result: Dict[str, str]) -> Dict[str, str]:
+        """Return the prompt fields of a result, with the source reduced to its domain."""
+        href = result.get("href") or ""
+        source = urlparse(href).netloc or href
+        if source.startswith("www."):
+            source = source[4:]
+        return {
+            "title": " ".join((result.get("title") or "N/A").split()),
+            "body": " ".join((result.get("body") or "N/A").split()),
+            "href": source or "N/A"
+        }
+    
+    @staticmethod
+    def size(result: Dict[str, str]) -> int:
+        """Return the characters a result adds to the prompt."""
+        return sum(len(value) for value in result.values())
+
+
+# Global snippet processor instance
+snippet_processor = SnippetProcessor()
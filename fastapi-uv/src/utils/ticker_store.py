@@ -0,0 +1,97 @@
+"""Persistent store of per-ticker Phase 1 analyses reused across portfolios."""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..api.models.schemas import StockAnalysisResult
+from ..config.settings import settings
+
+
+class TickerAnalysisStore:
+    """SQLite-backed per-symbol analyses with an as-of timestamp and staleness policy."""
+    
+    def __init__(self, path: str, max_age: float):
+        """Prepare the store at ``path``; entries older than ``max_age`` are stale."""
+        self.path = Path(path)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+    
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Open (or create) the store on first use; callers hold the lock."""
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ticker_analyses ("
+                "symbol TEXT NOT NULL, message_hash TEXT NOT NULL, "
+                "as_of REAL NOT NULL, result TEXT NOT NULL, "
+                "PRIMARY KEY (symbol, message_hash))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ticker_analyses_as_of_idx ON ticker_analyses (as_of)"
+            )
+            conn.commit()
+            self._connection = conn
+        return self._connection
+    
+    @staticmethod
+    def message_hash(message: str) -> str:
+        """Hash the whitespace-normalized analysis instructions."""
+        normalized = re.sub(r"\s+", " ", message or "").strip().lower()
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+    
+    def get_fresh(self, symbols: List[str], message: str) -> Dict[str, StockAnalysisResult]:
+        """Return the non-stale stored analyses for ``symbols``."""
+        if not symbols:
+            return {}
+        cutoff = time.time() - self.max_age
+        placeholders = ", ".join("?" for _ in symbols)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT symbol, result FROM ticker_analyses "
+                f"WHERE message_hash = ? AND as_of >= ? AND symbol IN ({placeholders})",
+                (self.message_hash(message), cutoff, *[symbol.upper() for symbol in symbols])
+            ).fetchall()
+        return {
+            symbol: StockAnalysisResult(**json.loads(result))
+            for symbol, result in rows
+        }
+    
+    def put_many(self, results: Dict[str, StockAnalysisResult], message: str) -> None:
+        """Store per-ticker analyses stamped with the current time."""
+        now = time.time()
+        message_hash = self.message_hash(message)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ticker_analyses (symbol, message_hash, as_of, result) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (symbol.upper(), message_hash, now, json.dumps(result.dict()))
+                    for symbol, result in results.items()
+                ]
+            )
+            self._conn.commit()
+    
+    def purge_stale(self) -> int:
+        """Delete stale entries and return how many were removed."""
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM ticker_analyses WHERE as_of < ?", (cutoff,))
+            self._conn.commit()
+        return cursor.rowcount
+
+
+# Global per-ticker analysis store instance
+ticker_store = TickerAnalysisStore(
+    path=settings.TICKER_STORE_PATH,
+    max_age=settings.TICKER_STORE_MAX_AGE
+)
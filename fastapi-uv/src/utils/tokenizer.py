@@ -0,0 +1,56 @@
+"""Local prompt token counting."""
+
+import logging
+from functools import lru_cache
+from typing import Any, Optional
+
+try:
+    import tiktoken
+except ImportError:  # a broken install falls back to a character estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Characters per token assumed when no tokenizer is installed
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> Optional[Any]:
+    """Return the tiktoken encoding of a model, or None when it cannot be loaded.
+    
+    tiktoken downloads an encoding on first use unless it is already in
+    TIKTOKEN_CACHE_DIR, so an offline host without that cache gets None.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("Token counts are estimated; tiktoken encoding unavailable: %s", e)
+        return None
+
+
+def load_encoding(model: str) -> None:
+    """Load the encoding of ``model`` ahead of use; may download, so call it off the event loop."""
+    _encoding(model)
+
+
+def approximate_tokens(text: str) -> int:
+    """Approximate the tokens of ``text`` as chars/4, cheap enough for the event loop."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Count the tokens of ``text`` for ``model``; approximate as chars/4 without tiktoken.
+    
+    The first call for a model may download its encoding, and long texts take
+    a while to encode, so this belongs in a worker thread.
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return approximate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -1,12 +1,13 @@
 """Investment analysis workflow orchestrator."""
 
 import asyncio
+import hashlib
+import json
 import uuid
 from datetime import datetime
-from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Callable, Dict, Any, Iterable, Optional
 
-from ..agents.stock_analyst import StockAnalystAgent
+from ..agents.stock_analyst import StockAnalystAgent, TickerDeltaCallback
 from ..agents.research_analyst import ResearchAnalystAgent
 from ..agents.investment_lead import InvestmentLeadAgent
 from ..api.models.schemas import (
@@ -15,71 +16,152 @@ from ..api.models.schemas import (
     PortfolioAllocation
 )
 from ..config.settings import settings
+from .llm_client import LLMClientManager, llm_client as default_llm_client
+from .metrics import span, start_analysis_metrics
+from .portfolio import Portfolio
+from .reports import ReportWriter, report_writer as default_report_writer
+from .ticker_store import TickerAnalysisStore, ticker_store as default_ticker_store
+
+# Callback receiving (event, data) progress notifications
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
 
 
 class InvestmentWorkflow:
     """Orchestrates the complete investment analysis workflow."""
     
-    def __init__(self):
-        """Initialize the workflow with all agents."""
-        self.stock_analyst = StockAnalystAgent()
-        self.research_analyst = ResearchAnalystAgent()
-        self.investment_lead = InvestmentLeadAgent()
-        
-        # Ensure reports directory exists
-        self.reports_dir = Path(settings.REPORTS_DIR)
-        self.reports_dir.mkdir(exist_ok=True)
+    def __init__(
+        self,
+        llm_client: Optional[LLMClientManager] = None,
+        ticker_store: Optional[TickerAnalysisStore] = None,
+        report_writer: Optional[ReportWriter] = None
+    ):
+        """Initialize the workflow with all agents sharing one LLM client."""
+        self.llm_client = llm_client or default_llm_client
+        self.ticker_store = ticker_store or default_ticker_store
+        self.report_writer = report_writer or default_report_writer
+        self.stock_analyst = StockAnalystAgent(llm_client=self.llm_client)
+        self.research_analyst = ResearchAnalystAgent(llm_client=self.llm_client)
+        self.investment_lead = InvestmentLeadAgent(llm_client=self.llm_client)
+    
+    def analysis_key(self, companies: str, message: str, per_ticker: Optional[bool] = None) -> str:
+        """Return the key under which identical in-flight analyses are coalesced.
+        
+        Tickers are compared by canonical portfolio key and the message ignoring
+        case and whitespace, so trivially different requests share one pipeline.
+        """
+        portfolio = Portfolio.parse(companies, validate=False)
+        if per_ticker is None:
+            per_ticker = self.stock_analyst.should_fan_out(companies)
+        normalized_message = " ".join((message or "").lower().split())
+        payload = json.dumps([portfolio.key, normalized_message, per_ticker])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
     
     async def execute_analysis(
         self, 
         companies: str, 
-        message: str = "Generate comprehensive investment analysis and portfolio allocation recommendations"
+        message: str = "Generate comprehensive investment analysis and portfolio allocation recommendations",
+        per_ticker: Optional[bool] = None,
+        analysis_id: Optional[str] = None,
+        on_progress: Optional[ProgressCallback] = None
     ) -> Dict[str, Any]:
         """Execute the complete investment analysis workflow."""
         
-        analysis_id = str(uuid.uuid4())
+        analysis_id = analysis_id or str(uuid.uuid4())
         timestamp = datetime.now().isoformat()
         
+        def emit(event: str, **data: Any) -> None:
+            if on_progress is not None:
+                on_progress(event, data)
+        
+        # Forward response text to subscribers as it is generated
+        stream_tokens = on_progress is not None and settings.STREAM_TOKENS
+        
+        def token_callback(phase: str):
+            if not stream_tokens:
+                return None
+            return lambda delta: emit("token", phase=phase, delta=delta)
+        
+        def ticker_token_callback(phase: str):
+            if not stream_tokens:
+                return None
+            return lambda symbol, delta: emit("token", phase=phase, ticker=symbol, delta=delta)
+        
         print(f"Starting investment analysis for companies: {companies}")
         print(f"Analysis ID: {analysis_id}")
         print(f"Analysis request: {message}")
+        emit("started", companies=companies)
+        
+        # Time every stage and LLM call of this analysis, including concurrent subtasks
+        analysis_metrics = start_analysis_metrics()
         
         try:
             # Phase 1: Stock Analysis
             print("\nPHASE 1: COMPREHENSIVE STOCK ANALYSIS")
             print("=" * 60)
             print("Analyzing market data and fundamentals...")
+            emit("phase_started", phase="stock_analysis", step=1, total=3)
             
-            stock_analysis = await self.stock_analyst.analyze(companies, message)
-            
-            # Save stock analysis report
-            stock_report_path = self.reports_dir / f"{analysis_id}_stock_analysis.md"
-            await self._save_stock_report(stock_report_path, stock_analysis)
-            print(f"Stock analysis completed and saved to {stock_report_path}")
+            # Stored per-ticker analyses are looked up unless a single call was asked for
+            reused: Dict[str, StockAnalysisResult] = {}
+            if settings.TICKER_STORE_ENABLED and per_ticker is not False and (
+                per_ticker or settings.PHASE1_MODE != "batch"
+            ):
+                reused = await self._stored_analyses(companies, message)
+            if per_ticker is None:
+                # A hit fans out so that only the missing tickers are analyzed again, and a
+                # single ticker takes the same one call either way, so its result is stored
+                per_ticker = (
+                    bool(reused)
+                    or len(self.stock_analyst.split_symbols(companies)) == 1
+                    or self.stock_analyst.should_fan_out(companies)
+                )
+            with span("stock_analysis"):
+                if per_ticker:
+                    stock_analysis = await self._analyze_tickers_with_store(
+                        companies, message, reused, on_delta=ticker_token_callback("stock_analysis")
+                    )
+                else:
+                    stock_analysis = await self.stock_analyst.analyze(
+                        companies, message, per_ticker=False, on_delta=token_callback("stock_analysis")
+                    )
+                    await self._store_split_result(stock_analysis, companies, message)
+            print("Stock analysis completed")
+            emit("phase_completed", phase="stock_analysis", step=1, total=3)
             
             # Phase 2: Investment Ranking
             print("\nPHASE 2: INVESTMENT POTENTIAL RANKING")
             print("=" * 60)
             print("Ranking companies by investment potential...")
+            emit("phase_started", phase="investment_ranking", step=2, total=3)
             
-            investment_ranking = await self.research_analyst.analyze(stock_analysis)
-            
-            # Save research analysis report
-            research_report_path = self.reports_dir / f"{analysis_id}_research_analysis.md"
-            await self._save_research_report(research_report_path, investment_ranking)
-            print(f"Investment ranking completed and saved to {research_report_path}")
+            with span("investment_ranking"):
+                investment_ranking = await self.research_analyst.analyze(
+                    stock_analysis, on_delta=token_callback("investment_ranking")
+                )
+            print("Investment ranking completed")
+            emit("phase_completed", phase="investment_ranking", step=2, total=3)
             
             # Phase 3: Portfolio Allocation Strategy
             print("\nPHASE 3: PORTFOLIO ALLOCATION STRATEGY")
             print("=" * 60)
             print("Developing portfolio allocation strategy...")
+            emit("phase_started", phase="portfolio_allocation", step=3, total=3)
             
-            portfolio_allocation = await self.investment_lead.analyze(investment_ranking)
+            with span("portfolio_allocation"):
+                portfolio_allocation = await self.investment_lead.analyze(
+                    investment_ranking,
+                    on_delta=token_callback("portfolio_allocation"),
+                    company_symbols=stock_analysis.company_symbols
+                )
+            print("Portfolio strategy completed")
+            emit("phase_completed", phase="portfolio_allocation", step=3, total=3)
             
-            # Save portfolio strategy report
-            portfolio_report_path = self.reports_dir / f"{analysis_id}_portfolio_strategy.md"
-            await self._save_portfolio_report(portfolio_report_path, portfolio_allocation)
-            print(f"Portfolio strategy completed and saved to {portfolio_report_path}")
+            # Render and save all reports in one batch off the event loop
+            with span("write_reports"):
+                reports = await self.report_writer.write_reports(
+                    analysis_id, stock_analysis, investment_ranking, portfolio_allocation
+                )
+            print(f"Reports saved to {self.report_writer.reports_dir}")
             
             # Generate summary
             summary = self._generate_summary(
@@ -92,19 +174,16 @@ class InvestmentWorkflow:
                 "timestamp": timestamp,
                 "status": "completed",
                 "companies": companies,
-                "reports": {
-                    "stock_analysis": str(stock_report_path),
-                    "research_analysis": str(research_report_path),
-                    "portfolio_strategy": str(portfolio_report_path)
-                },
+                "reports": reports,
                 "summary": summary,
+                "metrics": analysis_metrics.finish("completed"),
                 "results": {
                     "stock_analysis": stock_analysis.dict(),
                     "investment_ranking": investment_ranking.dict(),
                     "portfolio_allocation": portfolio_allocation.dict()
                 }
             }
-            
+        
         except Exception as e:
             error_message = f"Analysis failed: {str(e)}"
             print(f"ERROR: {error_message}")
@@ -115,87 +194,71 @@ class InvestmentWorkflow:
                 "status": "failed",
                 "companies": companies,
                 "error": error_message,
-                "summary": f"Investment analysis failed for {companies}: {error_message}"
+                "summary": f"Investment analysis failed for {companies}: {error_message}",
+                "metrics": analysis_metrics.finish("failed")
             }
     
-    async def _save_stock_report(self, file_path: Path, analysis: StockAnalysisResult) -> None:
-        """Save stock analysis report to markdown file."""
-        content = f"""# Stock Analysis Report
-
-**Analysis ID:** {file_path.stem}
-**Companies:** {analysis.company_symbols}
-**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-## Market Analysis
-{analysis.market_analysis}
-
-## Financial Metrics
-{analysis.financial_metrics}
-
-## Risk Assessment
-{analysis.risk_assessment}
-
-## Recommendations
-{analysis.recommendations}
-
----
-*This analysis is for educational purposes only and should not be considered as financial advice.*
-"""
+    async def execute_batch(
+        self,
+        portfolios: Iterable[Dict[str, Any]],
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Analyze several portfolios as overlapping pipelines and yield results as they finish.
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-    
-    async def _save_research_report(self, file_path: Path, ranking: InvestmentRanking) -> None:
-        """Save research analysis report to markdown file."""
-        content = f"""# Investment Ranking Report
-
-**Analysis ID:** {file_path.stem}
-**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-## Company Rankings
-{ranking.ranked_companies}
-
-## Investment Rationale
-{ranking.investment_rationale}
-
-## Risk Evaluation
-{ranking.risk_evaluation}
-
-## Growth Potential
-{ranking.growth_potential}
-
----
-*This analysis is for educational purposes only and should not be considered as financial advice.*
-"""
+        Each portfolio is a dict of ``execute_analysis`` keyword arguments. While one
+        portfolio is in Phase 2 or 3, the next can already be in Phase 1; the shared
+        LLM_MAX_CONCURRENCY budget keeps the combined load bounded.
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.BATCH_CONCURRENCY)
+        
+        async def run(portfolio: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.execute_analysis(**portfolio)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        tasks = [asyncio.create_task(run(portfolio)) for portfolio in portfolios]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
     
-    async def _save_portfolio_report(self, file_path: Path, allocation: PortfolioAllocation) -> None:
-        """Save portfolio strategy report to markdown file."""
-        content = f"""# Investment Portfolio Report
-
-**Analysis ID:** {file_path.stem}
-**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-## Allocation Strategy
-{allocation.allocation_strategy}
-
-## Investment Thesis
-{allocation.investment_thesis}
-
-## Risk Management
-{allocation.risk_management}
-
-## Final Recommendations
-{allocation.final_recommendations}
-
----
-*This analysis is for educational purposes only and should not be considered as financial advice.*
-"""
+    async def _stored_analyses(self, companies: str, message: str) -> Dict[str, StockAnalysisResult]:
+        """Return the fresh stored Phase 1 analyses of the portfolio's tickers, by symbol."""
+        symbols = self.stock_analyst.split_symbols(companies)
+        return await asyncio.to_thread(self.ticker_store.get_fresh, symbols, message)
+    
+    async def _store_split_result(self, result: StockAnalysisResult, companies: str, message: str) -> None:
+        """Store the per-ticker parts of a single-call Phase 1 result, so later portfolios can reuse them."""
+        symbols = self.stock_analyst.split_symbols(companies)
+        if not settings.TICKER_STORE_ENABLED or len(symbols) < 2:
+            return
+        parts = self.stock_analyst.split_result(result, symbols)
+        if parts:
+            await asyncio.to_thread(self.ticker_store.put_many, parts, message)
+    
+    async def _analyze_tickers_with_store(
+        self,
+        companies: str,
+        message: str,
+        reused: Dict[str, StockAnalysisResult],
+        on_delta: Optional[TickerDeltaCallback] = None
+    ) -> StockAnalysisResult:
+        """Run Phase 1 per ticker for the tickers missing from ``reused`` and store the new analyses."""
+        symbols = self.stock_analyst.split_symbols(companies)
+        missing = [symbol for symbol in symbols if symbol not in reused]
+        print(f"Reusing stored analyses for {len(reused)} of {len(symbols)} tickers")
+        
+        fresh: Dict[str, StockAnalysisResult] = {}
+        if missing:
+            fresh = await self.stock_analyst.analyze_tickers(missing, message, on_delta=on_delta)
+        
+        if settings.TICKER_STORE_ENABLED and fresh:
+            await asyncio.to_thread(self.ticker_store.put_many, fresh, message)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        return self.stock_analyst.merge_results(
+            [reused.get(symbol) or fresh[symbol] for symbol in symbols]
+        )
     
     def _generate_summary(
         self, 
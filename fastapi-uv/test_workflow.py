@@ -3,6 +3,7 @@
 import asyncio
 import os
 from src.utils.workflow import InvestmentWorkflow
+from src.utils.llm_client import llm_client
 from src.config.settings import settings
 
 async def test_workflow():
@@ -50,6 +51,8 @@ async def test_workflow():
             
     except Exception as e:
         print(f"Test failed with error: {str(e)}")
+    finally:
+        await llm_client.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(test_workflow())
@@ -0,0 +1,79 @@
+"""Tests for the agent's streamed LLM calls."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.agents.base import Agent
+from src.config.settings import settings
+from src.utils.cache import LLMResponseCache
+from src.utils.coalesce import SingleFlight
+from src.utils.llm_client import LLMClientManager
+from src.utils.resilience import Resilience, is_transient_llm_error
+
+
+class SlowStream:
+    """A streamed completion producing one chunk every ``interval`` seconds."""
+    
+    def __init__(self, chunks: int, interval: float):
+        self.chunks = chunks
+        self.interval = interval
+    
+    def __aiter__(self):
+        return self._chunks()
+    
+    async def _chunks(self):
+        for _ in range(self.chunks):
+            await asyncio.sleep(self.interval)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="x"))], usage=None)
+    
+    async def close(self) -> None:
+        pass
+
+
+class FakeClientManager(LLMClientManager):
+    """Hands out a client whose completions are slow streams."""
+    
+    def get(self):
+        async def create(**kwargs):
+            return SlowStream(chunks=4, interval=0.05)
+        
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "LLM_BUDGET_SHARES", 1)
+    return Agent(
+        name="Test Agent",
+        llm_client=FakeClientManager(),
+        cache=LLMResponseCache(max_entries=4),
+        resilience=Resilience(retryable=is_transient_llm_error, retries=0, deadline=0.3),
+        flight=SingleFlight("test")
+    )
+
+
+async def read(agent: Agent, prompt: str) -> str:
+    return "".join([delta async for delta in agent.stream(prompt)])
+
+
+@pytest.mark.asyncio
+async def test_waiting_for_a_slot_does_not_count_against_the_stream_deadline(agent):
+    # Each stream takes 0.2s of a 0.3s deadline; the second waits 0.2s for the only slot first
+    results = await asyncio.gather(read(agent, "first"), read(agent, "second"))
+    
+    assert results == ["xxxx", "xxxx"]
+    assert agent.llm_client.request_slot()._value == 1
+
+
+@pytest.mark.asyncio
+async def test_stalled_stream_still_times_out(agent):
+    agent.resilience.deadline = 0.1
+    
+    with pytest.raises(asyncio.TimeoutError):
+        await read(agent, "stalled")
+    assert agent.llm_client.request_slot()._value == 1
@@ -0,0 +1,82 @@
+"""Tests for the retention policy of the analysis stores."""
+
+import time
+
+import pytest
+
+from src.utils.analysis_store import MemoryAnalysisStore, SQLiteAnalysisStore
+
+
+class FakeClock:
+    """Stands in for time.time so records can age on demand."""
+    
+    def __init__(self):
+        self.now = 1_700_000_000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, "time", fake)
+    return fake
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**limits):
+        if request.param == "memory":
+            return MemoryAnalysisStore(**limits)
+        return SQLiteAnalysisStore(str(tmp_path / "analyses.sqlite"), hot_cache_size=0, **limits)
+    return make
+
+
+def save(store, analysis_id: str, status: str) -> None:
+    store.save(analysis_id, {"analysis_id": analysis_id, "status": status, "companies": "AAPL"})
+
+
+def test_old_finished_records_expire_but_active_ones_stay(make_store, clock):
+    store = make_store(max_records=100, retention_seconds=100, abandoned_seconds=1000)
+    save(store, "done", "completed")
+    save(store, "running", "running")
+    clock.now += 101
+    save(store, "fresh", "failed")
+    
+    store.apply_retention()
+    
+    assert store.get("done") is None
+    assert store.get("running") is not None
+    assert store.get("fresh") is not None
+
+
+def test_records_over_the_limit_are_evicted_oldest_finished_first(make_store, clock):
+    store = make_store(max_records=2, retention_seconds=10000, abandoned_seconds=1000)
+    save(store, "queued", "queued")
+    for analysis_id in ("first", "second", "third"):
+        clock.now += 1
+        save(store, analysis_id, "completed")
+    store.apply_retention()
+    
+    assert store.get("queued") is not None
+    assert store.get("first") is None
+    assert store.get("second") is None
+    assert store.get("third") is not None
+
+
+def test_abandoned_unfinished_records_are_evicted(make_store, clock):
+    store = make_store(max_records=100, retention_seconds=100, abandoned_seconds=50)
+    save(store, "orphan", "running")
+    save(store, "queued", "queued")
+    clock.now += 60
+    save(store, "active", "running")
+    # Within the retention window, an abandoned record only goes when the store is full
+    assert store.apply_retention() == 0
+    
+    clock.now += 50
+    
+    assert store.apply_retention() == 2
+    assert store.get("orphan") is None
+    assert store.get("queued") is None
+    assert store.get("active") is not None
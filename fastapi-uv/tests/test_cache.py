@@ -0,0 +1,112 @@
+"""Tests for the LRU/TTL memory cache and the SQLite cache tier."""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src.config.settings import PROJECT_ROOT
+from src.utils.cache import LLMResponseCache, LRUCache, SQLiteCache, TieredCache
+
+
+class FakeClock:
+    """Stands in for time.time so entries can expire on demand."""
+    
+    def __init__(self):
+        self.now = 1_700_000_000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, "time", fake)
+    return fake
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_memory_entries_expire_after_their_ttl(clock):
+    cache = LRUCache()
+    cache.set("short", "x", ttl=10)
+    cache.set("forever", "y")
+    
+    clock.now += 11
+    
+    assert cache.get("short") is None
+    assert cache.get("forever") == "y"
+    assert len(cache) == 1
+
+
+def test_sqlite_entries_expire_and_are_trimmed(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.set("short", {"v": 1}, ttl=10)
+    clock.now += 1
+    cache.set("b", [1, 2])
+    clock.now += 1
+    
+    assert cache.get("short") == {"v": 1}
+    clock.now += 1
+    cache.set("c", "three")
+    # "b" was used least recently
+    assert cache.get("b") is None
+    
+    clock.now += 10
+    assert cache.get("short") is None
+    assert cache.get("c") == "three"
+
+
+def test_disk_hit_is_promoted_to_memory(tmp_path):
+    cache = TieredCache(max_entries=4, disk_path=str(tmp_path / "tiered.sqlite"))
+    cache.disk.set("key", "value")
+    
+    assert cache.get("key") == "value"
+    assert cache.memory.get("key") == "value"
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["misses"]) == (1, 1)
+
+
+def test_llm_cache_keys_ignore_whitespace_but_not_parameters():
+    cache = LLMResponseCache(max_entries=4)
+    params = {"temperature": 0.3, "max_tokens": 100}
+    
+    key = cache.make_key("gpt-4o-mini", "Analyze  AAPL\n now", params)
+    
+    assert key == cache.make_key("gpt-4o-mini", "Analyze AAPL now", params)
+    assert key != cache.make_key("gpt-4o", "Analyze AAPL now", params)
+    assert key != cache.make_key("gpt-4o-mini", "Analyze AAPL now", {**params, "temperature": 0.7})
+
+
+def test_sqlite_cache_is_created_on_first_use(tmp_path):
+    path = tmp_path / "nested" / "cache.sqlite"
+    cache = SQLiteCache(str(path))
+    assert not path.parent.exists()
+    
+    cache.set("key", "value")
+    
+    assert path.exists()
+    assert cache.get("key") == "value"
+
+
+def test_importing_the_app_writes_nothing_to_the_working_directory(tmp_path):
+    env = {**os.environ, "PYTHONPATH": str(PROJECT_ROOT), "PROGRESS_BACKEND": "sqlite"}
+    subprocess.run([sys.executable, "-c", "import src.api.main"], cwd=tmp_path, env=env, check=True)
+    
+    assert list(tmp_path.iterdir()) == []
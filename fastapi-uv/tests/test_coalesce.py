@@ -0,0 +1,123 @@
+"""Tests for single-flight coalescing."""
+
+import asyncio
+
+import pytest
+
+from src.utils.coalesce import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_result():
+    flight = SingleFlight("test")
+    calls = 0
+    
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+    
+    results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+    
+    assert results == [1] * 5
+    assert calls == 1
+    assert flight.stats()["leaders"] == 1
+    assert flight.stats()["followers"] == 4
+
+
+@pytest.mark.asyncio
+async def test_different_keys_and_later_calls_run_again():
+    flight = SingleFlight("test")
+    calls = []
+    
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+    
+    assert await asyncio.gather(flight.do("a", lambda: work("a")), flight.do("b", lambda: work("b"))) == ["a", "b"]
+    assert await flight.do("a", lambda: work("a")) == "a"
+    assert calls == ["a", "b", "a"]
+    assert not flight.in_flight("a")
+
+
+@pytest.mark.asyncio
+async def test_error_reaches_every_caller():
+    flight = SingleFlight("test")
+    
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+    
+    results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+    
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_one_caller_giving_up_does_not_cancel_the_others():
+    flight = SingleFlight("test")
+    
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+    
+    first = asyncio.create_task(flight.do("key", work))
+    second = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    
+    assert await second == "done"
+
+
+@pytest.mark.asyncio
+async def test_shared_call_is_cancelled_when_every_caller_has_gone():
+    flight = SingleFlight("test")
+    caller = asyncio.create_task(flight.do("key", lambda: asyncio.sleep(10)))
+    await asyncio.sleep(0.01)
+    assert flight.in_flight("key")
+    
+    caller.cancel()
+    await asyncio.sleep(0.01)
+    
+    assert not flight.in_flight("key")
+    assert flight.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_late_stream_reader_replays_earlier_items():
+    flight = SingleFlight("test")
+    produced = 0
+    
+    async def source():
+        nonlocal produced
+        for item in range(3):
+            produced += 1
+            await asyncio.sleep(0.01)
+            yield item
+    
+    async def read():
+        return [item async for item in flight.stream("key", source)]
+    
+    early = asyncio.create_task(read())
+    await asyncio.sleep(0.015)
+    
+    assert await read() == [0, 1, 2]
+    assert await early == [0, 1, 2]
+    assert produced == 3
+
+
+@pytest.mark.asyncio
+async def test_disabled_flight_runs_every_call():
+    flight = SingleFlight("test", enabled=False)
+    calls = 0
+    
+    async def work():
+        nonlocal calls
+        calls += 1
+        call = calls
+        await asyncio.sleep(0)
+        return call
+    
+    assert sorted(await asyncio.gather(flight.do("key", work), flight.do("key", work))) == [1, 2]
@@ -0,0 +1,155 @@
+"""Tests for the bounded priority job queue."""
+
+import asyncio
+
+import pytest
+
+from src.utils.jobs import AnalysisJob, JobQueue, QueueFullError
+
+
+class GatedRunner:
+    """Records the jobs it runs and holds each one until the gate opens."""
+    
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.started = []
+        self.finished = []
+    
+    async def __call__(self, job: AnalysisJob) -> None:
+        self.started.append(job.analysis_id)
+        await self.gate.wait()
+        self.finished.append(job.analysis_id)
+
+
+async def drain(queue: JobQueue, count: int) -> None:
+    for _ in range(200):
+        if queue.completed >= count:
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError("jobs did not finish")
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_runs_first_then_first_come_first_served():
+    runner = GatedRunner()
+    queue = JobQueue(runner, workers=1, max_depth=10)
+    try:
+        await queue.submit("blocker", "A", "m")
+        await asyncio.sleep(0.01)
+        assert runner.started == ["blocker"]
+        
+        await queue.submit("low", "B", "m", priority=1)
+        await queue.submit("normal-1", "C", "m")
+        await queue.submit("high", "D", "m", priority=9)
+        await queue.submit("normal-2", "E", "m")
+        
+        assert [queue.position(aid) for aid in ("high", "normal-1", "normal-2", "low")] == [1, 2, 3, 4]
+        assert queue.position("blocker") is None
+        assert queue.stats()["queued"] == 4
+        assert queue.stats()["running"] == 1
+        
+        runner.gate.set()
+        await drain(queue, 5)
+        assert runner.finished == ["blocker", "high", "normal-1", "normal-2", "low"]
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_new_jobs():
+    runner = GatedRunner()
+    queue = JobQueue(runner, workers=1, max_depth=2)
+    try:
+        await queue.submit("running", "A", "m")
+        await asyncio.sleep(0.01)
+        await queue.submit("first", "B", "m")
+        await queue.submit("second", "C", "m")
+        
+        with pytest.raises(QueueFullError):
+            await queue.submit("third", "D", "m")
+        assert queue.stats()["rejected"] == 1
+    finally:
+        runner.gate.set()
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_reserved_slots_are_held_for_a_batch():
+    runner = GatedRunner()
+    queue = JobQueue(runner, workers=1, max_depth=3)
+    try:
+        await queue.submit("running", "A", "m")
+        await asyncio.sleep(0.01)
+        
+        queue.reserve(2)
+        with pytest.raises(QueueFullError):
+            queue.reserve(2)
+        await queue.submit("single", "B", "m")
+        with pytest.raises(QueueFullError):
+            await queue.submit("overflow", "C", "m")
+        
+        await queue.submit("batch-1", "D", "m", reserved=True)
+        queue.release(1)
+        assert queue.stats()["reserved"] == 0
+        assert queue.stats()["queued"] == 2
+    finally:
+        runner.gate.set()
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_identical_job_can_be_joined_until_it_closes():
+    runner = GatedRunner()
+    queue = JobQueue(runner, workers=1, max_depth=10)
+    try:
+        await queue.submit("leader", "AAPL", "m", key="same")
+        job = queue.find("same")
+        
+        assert job is not None
+        assert queue.join(job, "follower")
+        assert job.analysis_ids() == ["leader", "follower"]
+        assert queue.position("follower") in (None, 1)
+        assert queue.stats()["coalesced"] == 1
+        
+        assert job.close() == ["leader", "follower"]
+        assert queue.find("same") is None
+        assert not queue.join(job, "late")
+    finally:
+        runner.gate.set()
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_crashing_job_does_not_stop_the_worker():
+    finished = []
+    
+    async def runner(job: AnalysisJob) -> None:
+        if job.analysis_id == "bad":
+            raise RuntimeError("crash")
+        finished.append(job.analysis_id)
+    
+    queue = JobQueue(runner, workers=1, max_depth=10)
+    try:
+        await queue.submit("bad", "A", "m")
+        await queue.submit("good", "B", "m")
+        await drain(queue, 2)
+        assert finished == ["good"]
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_returns_the_jobs_that_will_never_finish():
+    runner = GatedRunner()
+    queue = JobQueue(runner, workers=1, max_depth=10)
+    await queue.submit("running", "A", "m", key="a")
+    await asyncio.sleep(0.01)
+    await queue.submit("queued", "B", "m", key="b")
+    
+    interrupted = await queue.stop()
+    
+    assert [job.analysis_id for job in interrupted] == ["running", "queued"]
+    assert all(job.closed for job in interrupted)
+    assert queue.find("b") is None
+    assert queue.stats()["queued"] == 0
+    assert runner.finished == []
@@ -0,0 +1,39 @@
+"""Tests for the in-process progress broker."""
+
+import asyncio
+
+import pytest
+
+from src.utils.progress import ProgressBroker
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_backlog_merges_token_deltas():
+    broker = ProgressBroker(token_backlog=3)
+    broker.publish("a", "started")
+    events = broker.subscribe("a")
+    assert (await events.__anext__())["event"] == "started"
+    
+    for i in range(10):
+        broker.publish("a", "token", {"phase": "phase1", "delta": str(i)})
+    broker.publish("a", "phase_completed", {"phase": "phase1"})
+    broker.publish("a", "token", {"phase": "phase2", "delta": "x"})
+    broker.publish("a", "completed")
+    received = [message async for message in events]
+    
+    tokens = [message["data"]["delta"] for message in received if message["event"] == "token"]
+    assert tokens == ["0", "1", "23456789"]
+    assert [message["event"] for message in received if message["event"] != "token"] == [
+        "phase_completed", "completed"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_history_of_an_idle_analysis_expires():
+    broker = ProgressBroker(max_idle=0.05)
+    broker.publish("stalled", "started")
+    await asyncio.sleep(0.1)
+    broker.publish("live", "started")
+    
+    assert not await broker.has_history("stalled")
+    assert await broker.has_history("live")
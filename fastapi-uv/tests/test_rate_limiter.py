@@ -0,0 +1,117 @@
+"""Tests for token buckets and per-model rate limiting."""
+
+import asyncio
+import time
+
+import pytest
+
+from src.utils.rate_limiter import ModelRateLimiter, RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """Stands in for time.monotonic so buckets refill on demand."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake)
+    return fake
+
+
+def test_bucket_starts_full_and_refills_over_time(clock):
+    bucket = TokenBucket(60, per_seconds=60)
+    
+    assert bucket.wait_time(60) == 0.0
+    bucket.consume(60)
+    assert bucket.available() == 0.0
+    assert bucket.wait_time(6) == pytest.approx(6.0)
+    
+    clock.now += 3
+    assert bucket.available() == pytest.approx(3.0)
+    assert bucket.wait_time(6) == pytest.approx(3.0)
+
+
+def test_bucket_never_exceeds_capacity(clock):
+    bucket = TokenBucket(10)
+    clock.now += 3600
+    
+    assert bucket.available() == 10
+    # Requests larger than the bucket wait for a full bucket only
+    assert bucket.wait_time(50) == 0.0
+
+
+def test_reconciliation_can_overdraw_and_refund(clock):
+    bucket = TokenBucket(100, per_seconds=100)
+    bucket.consume(80)
+    
+    bucket.consume(50)
+    assert bucket.available() == 0.0
+    assert bucket.wait_time(10) == pytest.approx(40.0)
+    
+    bucket.consume(-1000)
+    assert bucket.available() == 100
+
+
+@pytest.mark.asyncio
+async def test_acquire_is_immediate_within_budget(clock):
+    limiter = ModelRateLimiter(requests_per_minute=10, tokens_per_minute=1000)
+    
+    await asyncio.wait_for(limiter.acquire(400), timeout=1)
+    await asyncio.wait_for(limiter.acquire(400), timeout=1)
+    
+    assert limiter.granted == 2
+    assert limiter.requests.available() == 8
+    assert limiter.tokens.available() == 200
+    assert limiter.saturation() == pytest.approx(0.8)
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_when_the_token_budget_is_spent(monkeypatch):
+    limiter = ModelRateLimiter(requests_per_minute=100, tokens_per_minute=60)
+    delays = []
+    
+    async def fake_sleep(delay):
+        delays.append(delay)
+        limiter.tokens.consume(-limiter.tokens.capacity)
+    
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    await limiter.acquire(60)
+    await limiter.acquire(30)
+    
+    assert len(delays) == 1
+    assert delays[0] == pytest.approx(30.0, abs=0.5)
+    assert limiter.granted == 2
+
+
+def test_pause_holds_back_and_saturates(clock):
+    limiter = ModelRateLimiter(requests_per_minute=10, tokens_per_minute=1000)
+    limiter.pause(5)
+    
+    assert limiter.rate_limited == 1
+    assert limiter.saturation() == 1.0
+    clock.now += 6
+    assert limiter.saturation() == 0.0
+
+
+def test_budgets_are_split_between_shares_and_overridden_per_model():
+    limiter = RateLimiter(
+        requests_per_minute=500,
+        tokens_per_minute=200000,
+        overrides={"gpt-4o": (100, 30000)},
+        shares=4
+    )
+    
+    default = limiter.for_model("gpt-4o-mini")
+    override = limiter.for_model("gpt-4o")
+    
+    assert (default.requests.capacity, default.tokens.capacity) == (125, 50000)
+    assert (override.requests.capacity, override.tokens.capacity) == (25, 7500)
+    assert limiter.for_model("gpt-4o-mini") is default
+    assert set(limiter.stats()) == {"gpt-4o-mini", "gpt-4o"}
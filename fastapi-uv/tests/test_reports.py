@@ -0,0 +1,61 @@
+"""Tests for the report content route."""
+
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.routes import reports
+
+
+class StubStore:
+    def __init__(self, path: Path):
+        self.record = {"analysis_id": "a1", "reports": {"stock_analysis": str(path)}}
+    
+    async def aget(self, analysis_id):
+        return self.record if analysis_id == "a1" else None
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    path = tmp_path / "a1_stock_analysis.md"
+    path.write_bytes(b"# Report\n" + b"AAPL outperforms. " * 200)
+    monkeypatch.setattr(reports, "analysis_store", StubStore(path))
+    monkeypatch.setattr(reports, "brotli", None)
+    monkeypatch.setattr(reports, "_encoded_bodies", reports.LRUCache(max_entries=8))
+    app = FastAPI()
+    app.include_router(reports.router)
+    return TestClient(app), path
+
+
+def test_cached_compressed_body_is_served_without_reading_the_file(client, monkeypatch):
+    test_client, path = client
+    url = "/api/v1/analysis/a1/reports/stock_analysis"
+    first = test_client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert first.headers["content-encoding"] == "gzip"
+    
+    def fail(self):
+        raise AssertionError("report file read again")
+    
+    expected = path.read_bytes()
+    monkeypatch.setattr(Path, "read_bytes", fail)
+    second = test_client.get(url, headers={"Accept-Encoding": "gzip"})
+    
+    assert second.status_code == 200
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.content == expected
+
+
+def test_range_reads_only_the_requested_bytes(client, monkeypatch):
+    test_client, path = client
+    expected = path.read_bytes()
+    monkeypatch.setattr(Path, "read_bytes", lambda self: pytest.fail("whole file read"))
+    
+    response = test_client.get(
+        "/api/v1/analysis/a1/reports/stock_analysis", headers={"Range": "bytes=2-7"}
+    )
+    
+    assert response.status_code == 206
+    assert response.content == expected[2:8]
+    assert response.headers["content-range"] == f"bytes 2-7/{len(expected)}"
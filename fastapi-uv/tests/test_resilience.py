@@ -0,0 +1,138 @@
+"""Tests for retries, backoff and hedged requests."""
+
+import asyncio
+
+import pytest
+
+from src.utils.resilience import Resilience
+
+
+def policy(**overrides) -> Resilience:
+    options = {
+        "retryable": lambda error: isinstance(error, ConnectionError),
+        "retries": 2,
+        "deadline": 1.0,
+        "base_delay": 0.0,
+        "max_delay": 0.0,
+        "hedge_quantile": 0.9,
+        "hedge_min_samples": 5
+    }
+    options.update(overrides)
+    return Resilience(**options)
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried_until_success():
+    resilience = policy()
+    attempts = 0
+    
+    async def flaky():
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise ConnectionError("reset")
+        return "ok"
+    
+    assert await resilience.call(flaky, key="model") == "ok"
+    assert resilience.stats()["model"]["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_and_exhausted_retries_are_raised():
+    resilience = policy()
+    attempts = 0
+    
+    async def bad_request():
+        nonlocal attempts
+        attempts += 1
+        raise ValueError("invalid")
+    
+    async def down():
+        raise ConnectionError("down")
+    
+    with pytest.raises(ValueError):
+        await resilience.call(bad_request, key="model")
+    assert attempts == 1
+    with pytest.raises(ConnectionError):
+        await resilience.call(down, key="model")
+    assert resilience.stats()["model"]["failures"] == 2
+
+
+def test_backoff_is_jittered_and_capped():
+    resilience = policy(base_delay=1.0, max_delay=5.0)
+    
+    for attempt in range(10):
+        delay = resilience.backoff(attempt)
+        assert 0 <= delay <= min(5.0, 2 ** attempt)
+
+
+@pytest.mark.asyncio
+async def test_timed_enforces_the_deadline():
+    resilience = policy(deadline=0.01)
+    
+    with pytest.raises(asyncio.TimeoutError):
+        await resilience.timed(asyncio.sleep(1), key="model")
+    assert resilience.stats()["model"]["timeouts"] == 1
+
+
+def test_hedge_delay_follows_the_latency_percentile():
+    resilience = policy()
+    assert resilience.hedge_delay("model") is None
+    
+    for latency in (0.1, 0.2, 0.3, 0.4, 1.0):
+        resilience._latencies["model"].append(latency)
+    
+    assert resilience.hedge_delay("model") == 1.0
+    resilience._latencies["model"].extend([0.1] * 15)
+    assert resilience.hedge_delay("model") == 0.4
+
+
+@pytest.mark.asyncio
+async def test_backup_request_wins_when_the_first_stalls():
+    resilience = policy(hedge=True)
+    resilience._latencies["model"].extend([0.01] * 5)
+    attempts = 0
+    
+    async def call():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            await asyncio.sleep(1)
+            return "slow"
+        return "fast"
+    
+    assert await resilience.call(call, key="model") == "fast"
+    stats = resilience.stats()["model"]
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_latency_covers_waiting_inside_the_call():
+    resilience = policy()
+    
+    async def call():
+        # Stands in for waiting on the rate limiter before the remote call
+        await asyncio.sleep(0.05)
+        return await resilience.timed(asyncio.sleep(0), key="model")
+    
+    await resilience.call(call, key="model")
+    
+    assert resilience._latencies["model"][0] >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_cancelled_attempt_does_not_abort_the_hedge():
+    resilience = policy(hedge=True)
+    resilience._latencies["model"].extend([0.01] * 5)
+    attempts = 0
+    
+    async def call():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            await asyncio.sleep(0.03)
+            raise asyncio.CancelledError()
+        await asyncio.sleep(0.05)
+        return "backup"
+    
+    assert await resilience.call(call, key="model") == "backup"
@@ -0,0 +1,33 @@
+"""Tests for the web search stage's concurrency cap and timeout."""
+
+import asyncio
+
+import pytest
+
+from src.config.settings import settings
+from src.utils.cache import SearchResultCache
+from src.utils.coalesce import SingleFlight
+from src.utils.resilience import Resilience, is_transient_search_error
+from src.utils.search import WebSearch
+
+
+@pytest.mark.asyncio
+async def test_timed_out_query_keeps_its_slot_until_its_thread_finishes(monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_MOCK_LATENCY", 0.2)
+    search = WebSearch(
+        concurrency=1,
+        timeout=0.05,
+        cache=SearchResultCache(max_entries=4),
+        resilience=Resilience(retryable=is_transient_search_error, retries=0, deadline=0.05),
+        backend="mock",
+        flight=SingleFlight("test")
+    )
+    
+    with pytest.raises(asyncio.TimeoutError):
+        await search.search("AAPL")
+    assert search._semaphore.locked()
+    
+    await asyncio.sleep(0.25)
+    assert not search._semaphore.locked()
+    monkeypatch.setattr(settings, "SEARCH_MOCK_LATENCY", 0.0)
+    assert len(await search.search("MSFT")) == search.max_results
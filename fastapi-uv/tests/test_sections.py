@@ -0,0 +1,74 @@
+"""Tests for the incremental section parser."""
+
+from src.agents.sections import SectionParser, parse_sections
+
+SECTIONS = {
+    "market_analysis": "Market Analysis",
+    "risk_assessment": "Risk Assessment",
+    "recommendations": "Recommendations",
+    "final_recommendations": "Final Recommendations"
+}
+
+
+def feed_all(deltas):
+    parser = SectionParser(SECTIONS)
+    completed = []
+    for delta in deltas:
+        completed.extend(parser.feed(delta))
+    return parser.close(), completed
+
+
+def test_complete_text_is_split_at_headers():
+    result = parse_sections(
+        "Market Analysis: Demand is strong.\nRisk Assessment: Supply chains.\nRecommendations: Buy.",
+        SECTIONS
+    )
+    
+    assert result["market_analysis"] == "Demand is strong."
+    assert result["risk_assessment"] == "Supply chains."
+    assert result["recommendations"] == "Buy."
+    assert result["final_recommendations"] == ""
+
+
+def test_header_split_across_deltas_is_found():
+    text = "Market Analysis: Up 12%.\n**Risk Assessment:** Rates.\nRecommendations: Hold."
+    
+    for size in (1, 2, 3, 7):
+        deltas = [text[index:index + size] for index in range(0, len(text), size)]
+        result, _ = feed_all(deltas)
+        assert result == parse_sections(text, SECTIONS), size
+        assert result["risk_assessment"] == "Rates."
+
+
+def test_feed_reports_sections_as_they_complete():
+    result, completed = feed_all(["Market Analysis: A.\nRisk Ass", "essment: B.\nRecommendations: C."])
+    
+    assert completed == ["market_analysis", "risk_assessment"]
+    assert result["recommendations"] == "C."
+
+
+def test_markdown_decoration_is_accepted():
+    result = parse_sections("## Market Analysis:\nStrong.\n- **Recommendations:** Buy.", SECTIONS)
+    
+    assert result["market_analysis"] == "Strong."
+    assert result["recommendations"] == "Buy."
+
+
+def test_longest_label_wins():
+    result = parse_sections("Recommendations: Buy.\nFinal Recommendations: Hold.", SECTIONS)
+    
+    assert result["recommendations"] == "Buy."
+    assert result["final_recommendations"] == "Hold."
+
+
+def test_repeated_header_continues_its_section():
+    result = parse_sections("Market Analysis: AAPL up.\nMarket Analysis: MSFT flat.", SECTIONS)
+    
+    assert result["market_analysis"] == "AAPL up.\n\nMSFT flat."
+
+
+def test_text_without_headers_goes_to_first_field():
+    result = parse_sections("  Just a plain answer.  ", SECTIONS)
+    
+    assert result["market_analysis"] == "Just a plain answer."
+    assert result["recommendations"] == ""
@@ -0,0 +1,60 @@
+"""Tests for splitting and merging Phase 1 results per ticker."""
+
+import pytest
+
+from src.agents.stock_analyst import StockAnalystAgent
+from src.api.models.schemas import StockAnalysisResult
+
+FIELDS = ("market_analysis", "financial_metrics", "risk_assessment", "recommendations")
+
+
+def combined(*symbols: str, **overrides: str) -> StockAnalysisResult:
+    fields = {
+        field: "\n\n".join(f"### {symbol}\n{field} of {symbol}" for symbol in symbols)
+        for field in FIELDS
+    }
+    return StockAnalysisResult(company_symbols=", ".join(symbols), **{**fields, **overrides})
+
+
+def test_result_is_split_along_ticker_headings():
+    parts = StockAnalystAgent.split_result(combined("AAPL", "MSFT"), ["AAPL", "MSFT"])
+    
+    assert sorted(parts) == ["AAPL", "MSFT"]
+    assert parts["MSFT"].company_symbols == "MSFT"
+    assert parts["MSFT"].risk_assessment == "risk_assessment of MSFT"
+
+
+def test_split_parts_merge_back_into_the_same_result():
+    result = combined("AAPL", "MSFT")
+    parts = StockAnalystAgent.split_result(result, ["AAPL", "MSFT"])
+    
+    assert StockAnalystAgent.merge_results([parts["AAPL"], parts["MSFT"]]) == result
+
+
+def test_result_missing_a_ticker_in_any_section_is_not_split():
+    result = combined("AAPL", "MSFT", recommendations="### AAPL\nbuy\n\nBoth look fine.")
+    
+    assert StockAnalystAgent.split_result(result, ["AAPL", "MSFT"]) == {}
+    assert StockAnalystAgent.split_result(combined("AAPL"), ["AAPL", "MSFT"]) == {}
+
+
+@pytest.mark.asyncio
+async def test_per_ticker_analysis_streams_to_the_callbacks():
+    agent = StockAnalystAgent()
+    
+    async def analyze_tickers(symbols, message, on_delta=None):
+        for symbol in symbols:
+            on_delta(symbol, f"{symbol} text")
+        return {symbol: combined(symbol) for symbol in symbols}
+    
+    agent.analyze_tickers = analyze_tickers
+    deltas, ticker_deltas = [], []
+    
+    await agent.analyze("AAPL, MSFT", "m", per_ticker=True, on_delta=deltas.append)
+    await agent.analyze(
+        "AAPL, MSFT", "m", per_ticker=True,
+        on_ticker_delta=lambda symbol, delta: ticker_deltas.append(symbol)
+    )
+    
+    assert deltas == ["AAPL text", "MSFT text"]
+    assert ticker_deltas == ["AAPL", "MSFT"]